@@ -1,4 +1,5 @@
 # contains algorithms that are used to manipulate/transform the calibration parameters
+# note: frames with identical calibration files share one calibration dictionary (see calib/file_io.py), so copy current_calib_data before modifying it
 
 from gui.logger_gui import Logger
 
@@ -2,6 +2,8 @@
 
 import numpy as np
 from gui.logger_gui import Logger
+from calib import utils as calib_utils
+from algo import utils as algo_utils
 
 def project_point_cloud_points(data_dict: dict, cfg_dict: dict):
     """
@@ -30,47 +32,162 @@ def project_point_cloud_points(data_dict: dict, cfg_dict: dict):
         logger.log('[algo->camera.pyproject_point_cloud_points]: current_calib_data not found in data_dict', Logger.ERROR)
         return
     
-    # Extract required calibration data
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
+    # Extract required calibration data, float32 P2 @ R0_rect @ Tr_velo_to_cam is computed once per calibration (R0_rect is identity if absent)
+    Tr_velo_to_pixel = calib_utils.add_derived_matrices(data_dict['current_calib_data'])['Tr_velo_to_pixel_f32']
+    pcd = data_dict['current_point_cloud_numpy']
+    img_np = data_dict['current_image_numpy']
     
-    if 'R0_rect' in data_dict['current_calib_data']:
-        R0_rect = data_dict['current_calib_data']['R0_rect']
-    else:
-        R0_rect = np.eye(4,4)
+    # Project lidar points onto the image plane, invalid points are behind the camera or outside the image boundaries
+    pixels, _, valid = algo_utils.project_points_with_buffers(data_dict, pcd, Tr_velo_to_pixel, img_np.shape)
+    valid_indices = np.flatnonzero(valid)
+    pixel_coords_valid = pixels[valid_indices]
     
-    P2 = data_dict['current_calib_data']['P2']
+    # Compute lidar depths of the valid points and adjust them for visualization
+    lidar_depths = np.linalg.norm(pcd[valid_indices, :3], axis=1)
+    pixel_depths_valid = (255.0 - np.clip(lidar_depths * 6.0, 0, 255)).astype(np.uint8)
     
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
+    # write the farthest points first so that the nearest point of each pixel wins
+    order = np.argsort(-lidar_depths, kind='stable')
+    pixel_coords_valid, pixel_depths_valid = pixel_coords_valid[order], pixel_depths_valid[order]
     
-    # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
-    
-    # Compute lidar depths
-    lidar_depths = np.linalg.norm(lidar_coords_Nx4[:, :3], axis=1)
+    # Update a copy of the image with the projected lidar points, the image read by the FileIO is cached and must not be modified in place
+    img_np = img_np.copy()
+    img_np[pixel_coords_valid[:, 1], pixel_coords_valid[:, 0]] = np.column_stack((pixel_depths_valid, np.zeros_like(pixel_depths_valid), np.zeros_like(pixel_depths_valid)))
+    data_dict['current_image_numpy'] = img_np
+
+def create_depth_image(data_dict: dict, cfg_dict: dict):
+    """
+    Creates a sparse float32 depth image (depth along the optical axis, 0 where no point projects) from the point cloud, keeping the nearest point for each pixel (z-buffer).
+    Optionally also creates an index image mapping each pixel to its point (-1 where no point projects) and overlays the dilated, colorized depth on a copy of the image for visualization.
+
+    Args:
+        data_dict (dict): A dictionary containing the required data.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->camera.py->create_depth_image][CRITICAL]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
     
-    # Filter out points that are behind the camera
-    front_pixel_coords = pixel_coords[:, pixel_coords[2] > 0]
-    front_lidar_depths = lidar_depths[pixel_coords[2] > 0]
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->camera.py->create_depth_image]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    if "current_image_numpy" not in data_dict:
+        logger.log('[algo->camera.py->create_depth_image]: current_image_numpy not found in data_dict', Logger.ERROR)
+        return
+    if 'current_calib_data' not in data_dict:
+        logger.log('[algo->camera.py->create_depth_image]: current_calib_data not found in data_dict', Logger.ERROR)
+        return
     
-    # Normalize pixel coordinates
-    front_pixel_coords = front_pixel_coords[:2] / front_pixel_coords[2]
-    front_pixel_coords = front_pixel_coords.T
+    # imports
+    import cv2
     
-    # Adjust lidar depths for visualization
-    front_lidar_depths = front_lidar_depths * 6.0
-    front_lidar_depths = 255.0 - np.clip(front_lidar_depths, 0, 255)
+    # Get required data and parameters
+    params = cfg_dict['proc']['camera']['create_depth_image']
+    Tr_velo_to_pixel = calib_utils.add_derived_matrices(data_dict['current_calib_data'])['Tr_velo_to_pixel_f32']
+    pcd = data_dict['current_point_cloud_numpy']
+    img_np = data_dict['current_image_numpy']
+    height, width = img_np.shape[:2]
     
-    # Convert pixel coordinates and lidar depths to the appropriate data types
-    front_pixel_coords = front_pixel_coords.astype(int)
-    front_lidar_depths = front_lidar_depths.astype(np.uint8)
+    # Project lidar points onto the image plane
+    pixels, depths, valid = algo_utils.project_points_with_buffers(data_dict, pcd, Tr_velo_to_pixel, img_np.shape)
+    point_indices = np.flatnonzero(valid)
+    flat_pixels = pixels[point_indices, 1] * width + pixels[point_indices, 0]
+    point_depths = depths[point_indices]
+    
+    # z-buffer: sort by pixel then by depth, the first point of each pixel is the nearest one
+    order = np.lexsort((point_depths, flat_pixels))
+    flat_pixels, point_depths, point_indices = flat_pixels[order], point_depths[order], point_indices[order]
+    nearest = np.ones(flat_pixels.shape[0], dtype=bool)
+    np.not_equal(flat_pixels[1:], flat_pixels[:-1], out=nearest[1:])
+    
+    depth_image = np.zeros(height * width, dtype=np.float32)
+    depth_image[flat_pixels[nearest]] = point_depths[nearest]
+    data_dict['current_depth_image'] = depth_image.reshape(height, width)
+    if params.get('index_image', False):
+        index_image = np.full(height * width, -1, dtype=np.int32)
+        index_image[flat_pixels[nearest]] = point_indices[nearest]
+        data_dict['current_depth_index_image'] = index_image.reshape(height, width)
+    
+    # overlay the depth on a copy of the image, the image read by the FileIO is cached and must not be modified in place
+    if params.get('visualize', False):
+        depth_image = data_dict['current_depth_image']
+        max_depth = params.get('max_depth', 80.0)
+        # inverse depth, so that dilation (a maximum filter) keeps the nearest depth
+        inverse_depth = np.zeros_like(depth_image)
+        np.divide(1.0, depth_image, out=inverse_depth, where=depth_image > 0)
+        dilation = params.get('dilation', 0)
+        if dilation > 1: inverse_depth = cv2.dilate(inverse_depth, np.ones((dilation, dilation), dtype=np.uint8))
+        has_depth = inverse_depth > 0
+        normalized = np.zeros(inverse_depth.shape, dtype=np.uint8)
+        normalized[has_depth] = np.clip(255.0 * (1.0 - 1.0 / (inverse_depth[has_depth] * max_depth)), 0, 255)
+        colorized = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
+        if not algo_utils.is_bgr_image(cfg_dict): colorized = colorized[..., ::-1] # BGR to RGB, unless the image itself is in BGR order
+        img_np = img_np.copy()
+        img_np[has_depth] = colorized[has_depth]
+        data_dict['current_image_numpy'] = img_np
+
+def undistort_image(data_dict: dict, cfg_dict: dict):
+    """
+    Undistorts the image with the camera matrix (K) and distortion coefficients (D) of sensors:camera. K is calibrated for full resolution images, so it is scaled by data:camera:preview_scale when the images are read from disk. The remap tables of cv2.initUndistortRectifyMap are computed once per (K, D, image size, alpha) and kept in data_dict, so each frame costs a single cv2.remap.
+    Optionally writes a copy of current_calib_data with P2 updated to the new camera matrix, so that projections onto the undistorted image stay consistent.
+
+    Args:
+        data_dict (dict): A dictionary containing the required data.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->camera.py->undistort_image][CRITICAL]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
     
-    # Filter out coordinates that are outside the image boundaries
-    valid_coords = (front_pixel_coords[:, 0] >= 0) & (front_pixel_coords[:, 0] < data_dict['current_image_numpy'].shape[1]) & (front_pixel_coords[:, 1] >= 0) & (front_pixel_coords[:, 1] < data_dict['current_image_numpy'].shape[0])
+    # Check if required data is present in data_dict
+    if "current_image_numpy" not in data_dict:
+        logger.log('[algo->camera.py->undistort_image]: current_image_numpy not found in data_dict', Logger.ERROR)
+        return
     
-    # Select valid pixel coordinates and corresponding lidar depths
-    pixel_coords_valid = front_pixel_coords[valid_coords]
-    pixel_depths_valid = front_lidar_depths[valid_coords]
+    # imports
+    import cv2
+    
+    # Get required data and parameters
+    params = cfg_dict['proc']['camera']['undistort_image']
+    camera_cfg = cfg_dict['sensors']['camera']
+    camera_matrix = np.asarray(camera_cfg['camera_matrix'], dtype=np.float64).reshape(3, 3)
+    distortion_coeffs = np.asarray(camera_cfg['distortion_coeffs'], dtype=np.float64).ravel()
+    img_np = data_dict['current_image_numpy']
+    height, width = img_np.shape[:2]
+    alpha = params.get('alpha', 0.0)
+    
+    # images read from disk are decoded at 1/preview_scale resolution, K is scaled the same way as P2 in the calib FileIO
+    preview_scale = cfg_dict['data']['camera'].get('preview_scale', 1) if cfg_dict['data']['camera']['enabled'] else 1
+    camera_matrix[:2] /= preview_scale
+    # the principal point lies within the calibrated image, otherwise the image size does not match the calibrated size
+    if not (0 <= camera_matrix[0, 2] < width and 0 <= camera_matrix[1, 2] < height):
+        logger.log(f'[algo->camera.py->undistort_image]: principal point ({camera_matrix[0, 2]:.1f}, {camera_matrix[1, 2]:.1f}) of sensors:camera:camera_matrix scaled by 1/{preview_scale} lies outside the {width}x{height} image, the camera matrix does not match the image size', Logger.ERROR)
+        return
     
-    # Update the image with the projected lidar points
-    data_dict['current_image_numpy'][pixel_coords_valid[:, 1], pixel_coords_valid[:, 0]] = np.column_stack((pixel_depths_valid, np.zeros_like(pixel_depths_valid), np.zeros_like(pixel_depths_valid)))
+    # the remap tables (fixed-point, faster to remap with) are computed only when K, D, the image size, or alpha change
+    key = (camera_matrix.tobytes(), distortion_coeffs.tobytes(), width, height, alpha)
+    state = data_dict.get('undistort_maps', None)
+    if state is None or state['key'] != key:
+        new_camera_matrix, _ = cv2.getOptimalNewCameraMatrix(camera_matrix, distortion_coeffs, (width, height), alpha, (width, height))
+        map1, map2 = cv2.initUndistortRectifyMap(camera_matrix, distortion_coeffs, None, new_camera_matrix, (width, height), cv2.CV_16SC2)
+        state = {'key': key, 'map1': map1, 'map2': map2, 'new_camera_matrix': new_camera_matrix, 'calib_source': None, 'calib': None}
+        data_dict['undistort_maps'] = state
+    
+    # remap into a new array, or into a buffer reused across frames if enabled
+    if params.get('reuse_buffers', False): undistorted = algo_utils.get_buffer(data_dict, 'undistort_output', img_np.shape, img_np.dtype)
+    else: undistorted = np.empty_like(img_np)
+    cv2.remap(img_np, state['map1'], state['map2'], cv2.INTER_LINEAR, dst=undistorted)
+    data_dict['current_image_numpy'] = undistorted
+    
+    # the updated calibration is a copy, made once per calibration dictionary (the calib FileIO shares one among the frames with identical files)
+    if params.get('update_calib', True) and data_dict.get('current_calib_data', None) is not None:
+        calib = data_dict['current_calib_data']
+        if state['calib_source'] is not calib and state['calib'] is not calib:
+            state['calib_source'] = calib
+            state['calib'] = calib_utils.update_camera_matrix(calib, camera_matrix, state['new_camera_matrix'])
+        data_dict['current_calib_data'] = state['calib']
@@ -7,9 +7,12 @@ from gui.logger_gui import Logger
 from typing import Dict, List
 import numpy as np
 
+from lbl.label_list import LabelList
+from algo import utils as algo_utils
+
 def remove_out_of_bound_labels(data_dict: Dict[str, any], cfg_dict: Dict[str, any]):
     """
-    Remove labels that are out of the specified bounding box.
+    Remove labels whose centers are out of the crop region of the point cloud (see proc:lidar:crop).
 
     Args:
         data_dict (Dict[str, any]): A dictionary containing data and logger.
@@ -29,21 +32,115 @@ def remove_out_of_bound_labels(data_dict: Dict[str, any], cfg_dict: Dict[str, an
     
     # Get label list and bounding box limits
     lbl_list = data_dict['current_label_list']
-    min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
-    max_xyz = cfg_dict['proc']['lidar']['crop']['max_xyz']
-    output = []
-
-    for lbl_dict in lbl_list:
-        if 'lidar_bbox' not in lbl_dict: continue
-        bbox_center = lbl_dict['lidar_bbox']['lidar_xyz_center']
-        # Check if the bounding box center is within the specified limits
-        x_condition = np.logical_and(min_xyz[0] <= bbox_center[0], bbox_center[0] <= max_xyz[0])
-        y_condition = np.logical_and(min_xyz[1] <= bbox_center[1], bbox_center[1] <= max_xyz[1])
-        z_condition = np.logical_and(min_xyz[2] <= bbox_center[2], bbox_center[2] <= max_xyz[2])
-        # If the bounding box center is within the limits, add the label to the output list
-        if x_condition and y_condition and z_condition:
-            output.append(lbl_dict)
+    crop_cfg = cfg_dict['proc']['lidar']['crop']
+
+    # the check is done on the center columns of all the labels at once, with the same crop region (box, oriented_box, or cylinder) as the point cloud
+    # labels without lidar_bbox are dropped
+    lbl_list = LabelList.from_labels(lbl_list)
+    in_bound = algo_utils.crop_mask(lbl_list.centers, crop_cfg)
+    in_bound &= lbl_list.has_lidar_bbox
         
     # Update the label list in data_dict
-    data_dict['current_label_list'] = output
+    data_dict['current_label_list'] = lbl_list.select(in_bound)
+
+def track(data_dict: Dict[str, any], cfg_dict: Dict[str, any]):
+    """
+    Tracks the lidar bounding boxes of current_label_list across consecutive frames and replaces it with copies of the labels holding a persistent `track_id` for each tracked label, the original label dictionaries are not modified.
+    All the tracks are constant-velocity Kalman filters held in stacked NumPy arrays (data_dict['tracker']), predicted and updated together; the boxes are associated to the tracks with a gated cost matrix (center distance or bird's-eye-view IoU of the axis-aligned enclosing rectangles) and the Hungarian algorithm.
+
+    Args:
+        data_dict (Dict[str, any]): A dictionary containing data and logger.
+        cfg_dict (Dict[str, any]): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->label.py->track]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
 
+    # Check if required data is present in data_dict
+    if "current_label_list" not in data_dict:
+        logger.log('[algo->label.py->track]: current_label_list not found in data_dict', Logger.ERROR)
+        return
+    if "current_frame_index" not in data_dict:
+        logger.log('[algo->label.py->track]: current_frame_index not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get tracking parameters
+    track_cfg = cfg_dict['proc']['label']['track']
+    cost_metric = track_cfg.get('cost', 'distance')
+    measurement_noise = track_cfg.get('measurement_noise', 0.1)
+    process_noise = track_cfg.get('process_noise', 1.0)
+    if cost_metric not in ['distance', 'aabb_iou']:
+        logger.log(f'[algo->label.py->track]: cost {cost_metric} not supported, supported costs: distance, aabb_iou', Logger.ERROR)
+        return
+    
+    # the tracks are kept only across consecutive frames
+    frame_index = data_dict['current_frame_index']
+    tracker = data_dict.get('tracker', None)
+    if tracker is None or frame_index != tracker['frame_index'] + 1:
+        if tracker is not None: logger.log(f'[algo->label.py->track]: frame {frame_index} does not follow frame {tracker["frame_index"]}, restarting the tracks', Logger.DEBUG)
+        tracker = {'x': np.zeros((0, 6)), 'P': np.zeros((0, 6, 6)), 'extents': np.zeros((0, 3)), 'euler_angles': np.zeros((0, 3)), 'class_names': np.zeros(0, dtype=str), 'track_ids': np.zeros(0, dtype=np.int64), 'misses': np.zeros(0, dtype=np.int64), 'next_track_id': 0 if tracker is None else tracker['next_track_id']}
+        data_dict['tracker'] = tracker
+    tracker['frame_index'] = frame_index
+    
+    # predict all the tracks one frame ahead, the state is [x, y, z, vx, vy, vz]
+    F = np.eye(6)
+    F[:3, 3:] = np.eye(3)
+    Q = process_noise * np.block([[np.eye(3) / 3.0, np.eye(3) / 2.0], [np.eye(3) / 2.0, np.eye(3)]])
+    x = tracker['x'] @ F.T
+    P = F @ tracker['P'] @ F.T + Q
+    
+    # boxes of the current frame
+    label_list = LabelList.from_labels(data_dict['current_label_list'])
+    detection_indices = np.flatnonzero(label_list.has_lidar_bbox)
+    centers = label_list.centers[detection_indices].astype(np.float64)
+    extents = label_list.extents[detection_indices].astype(np.float64)
+    euler_angles = label_list.euler_angles[detection_indices].astype(np.float64)
+    class_names = label_list.get_class_names()[detection_indices]
+    
+    # gated cost of all the (track, box) pairs
+    if cost_metric == 'distance':
+        cost = np.linalg.norm(x[:, None, :2] - centers[None, :, :2], axis=2)
+        cost[cost > track_cfg.get('max_distance', 2.0)] = np.inf
+    else:
+        cost = 1.0 - algo_utils.get_bev_aabb_iou_matrix(x[:, :2], tracker['extents'], tracker['euler_angles'][:, 2], centers[:, :2], extents, euler_angles[:, 2])
+        cost[cost > 1.0 - track_cfg.get('min_aabb_iou', 0.1)] = np.inf
+    if track_cfg.get('match_class', True): cost[tracker['class_names'][:, None] != class_names[None, :]] = np.inf
+    track_rows, detection_cols = algo_utils.linear_assignment(cost)
+    
+    # update the assigned tracks with the measured box centers
+    H_P = P[track_rows, :3, :] # H @ P with H = [I 0]
+    S = H_P[:, :, :3] + measurement_noise * np.eye(3)
+    K = np.linalg.solve(S, H_P).transpose(0, 2, 1) # P @ H^T @ S^-1, S and P are symmetric
+    innovation = centers[detection_cols] - x[track_rows, :3]
+    x[track_rows] += (K @ innovation[:, :, None])[:, :, 0]
+    P[track_rows] -= K @ H_P
+    misses = tracker['misses'] + 1
+    misses[track_rows] = 0
+    extents_tracks, euler_angles_tracks = tracker['extents'].copy(), tracker['euler_angles'].copy()
+    extents_tracks[track_rows], euler_angles_tracks[track_rows] = extents[detection_cols], euler_angles[detection_cols]
+    
+    # drop the tracks missed for too long and start new tracks from the unassigned boxes
+    keep = misses <= track_cfg.get('max_misses', 3)
+    new_cols = np.setdiff1d(np.arange(len(detection_indices)), detection_cols)
+    num_new = new_cols.shape[0]
+    new_track_ids = tracker['next_track_id'] + np.arange(num_new, dtype=np.int64)
+    new_x = np.hstack([centers[new_cols], np.zeros((num_new, 3))])
+    new_P = np.broadcast_to(np.diag([measurement_noise] * 3 + [track_cfg.get('initial_velocity_variance', 10.0)] * 3), (num_new, 6, 6))
+    tracker['x'] = np.concatenate([x[keep], new_x])
+    tracker['P'] = np.concatenate([P[keep], new_P])
+    tracker['extents'] = np.concatenate([extents_tracks[keep], extents[new_cols]])
+    tracker['euler_angles'] = np.concatenate([euler_angles_tracks[keep], euler_angles[new_cols]])
+    tracker['class_names'] = np.concatenate([tracker['class_names'][keep], class_names[new_cols]])
+    tracker['misses'] = np.concatenate([misses[keep], np.zeros(num_new, dtype=np.int64)])
+    track_ids = tracker['track_ids']
+    tracker['track_ids'] = np.concatenate([track_ids[keep], new_track_ids])
+    tracker['next_track_id'] += num_new
+    
+    # write the track ids to copies of the labels, the label FileIO caches the dictionaries and ids of an earlier run must not stick to them
+    tracked_label_list = LabelList([dict(label) for label in label_list])
+    for col, track_id in zip(detection_cols.tolist() + new_cols.tolist(), track_ids[track_rows].tolist() + new_track_ids.tolist()):
+        tracked_label_list[detection_indices[col]]['track_id'] = track_id
+    data_dict['current_label_list'] = tracked_label_list
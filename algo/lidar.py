@@ -1,8 +1,12 @@
 # contains point-cloud processing algorithms
 
 import numpy as np
+import open3d as o3d
 
 from gui.logger_gui import Logger
+from calib import utils as calib_utils
+from algo import utils as algo_utils
+from lbl.label_list import LabelList
 
 def crop(data_dict: dict, cfg_dict: dict):
     """
@@ -25,20 +29,589 @@ def crop(data_dict: dict, cfg_dict: dict):
         logger.log('[algo->lidar.py->crop]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
         return
     
-    # Get point cloud and crop limits
+    # Get point cloud and crop parameters
     pcd = data_dict['current_point_cloud_numpy']
-    min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
-    max_xyz = cfg_dict['proc']['lidar']['crop']['max_xyz']
+    crop_cfg = cfg_dict['proc']['lidar']['crop']
+    reuse_buffers = crop_cfg.get('reuse_buffers', False)
+    num_points = pcd.shape[0]
     
-    # create conditions for cropping
-    x_condition = np.logical_and(min_xyz[0] <= pcd[:, 0], pcd[:, 0] <= max_xyz[0])
-    y_condition = np.logical_and(min_xyz[1] <= pcd[:, 1], pcd[:, 1] <= max_xyz[1])
-    z_condition = np.logical_and(min_xyz[2] <= pcd[:, 2], pcd[:, 2] <= max_xyz[2])
+    # compute the crop mask in a reusable buffer, without per-axis temporaries
+    mask = algo_utils.get_buffer(data_dict, 'crop_mask', (num_points,), bool)
+    bool_work = algo_utils.get_buffer(data_dict, 'crop_bool_work', (num_points,), bool)
+    work = algo_utils.get_buffer(data_dict, 'crop_work', (4 * num_points,), pcd.dtype).reshape(4, num_points) if crop_cfg.get('mode', 'box') != 'box' else None
+    algo_utils.crop_mask(pcd, crop_cfg, out=mask, work=work, bool_work=bool_work)
+    indices = np.flatnonzero(mask)
+    num_cropped = indices.shape[0]
     
     # Update the point cloud in data_dict
-    data_dict['current_point_cloud_numpy'] = pcd[x_condition & y_condition & z_condition]
-    data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32)
+    if reuse_buffers:
+        # the cropped points and colors are written to buffers reused across frames, so they are only valid for the current frame
+        cropped_pcd = algo_utils.get_buffer(data_dict, f'crop_output_{pcd.shape[1]}', (num_cropped, pcd.shape[1]), pcd.dtype)
+        np.take(pcd, indices, axis=0, out=cropped_pcd)
+        colors = algo_utils.get_buffer(data_dict, 'crop_colors', (num_cropped, 3), np.float32)
+        colors.fill(1)
+    else:
+        cropped_pcd = pcd[indices]
+        colors = np.ones((num_cropped, 3), dtype=np.float32)
+    data_dict['current_point_cloud_numpy'] = cropped_pcd
+    data_dict['current_point_cloud_point_colors'] = colors
+    algo_utils.select_range_image_points(data_dict, num_points, indices)
     
+    # keep the mask and indices (into the uncropped point cloud) for later stages
+    if crop_cfg.get('keep_mask', False):
+        data_dict['current_point_cloud_crop_mask'] = mask if reuse_buffers else mask.copy()
+        data_dict['current_point_cloud_crop_indices'] = indices
+    
+def learn_background(data_dict: dict, cfg_dict: dict):
+    """
+    Learns a voxel occupancy background model of a static lidar from the first num_frames frames, to be used by remove_background. The model is kept in data_dict as background_model and is updated incrementally, one frame at a time, so the frames are not kept.
+    The model stores the sorted keys of the occupied voxels only (not a dense grid of the whole region), and is relearned if the region (min_xyz, max_xyz) or voxel_size change.
+    A voxel is background if it is occupied in at least min_occupancy of the learned frames; the background is dilated by dilation voxels to absorb sensor noise.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->learn_background]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->learn_background]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    if "current_frame_index" not in data_dict:
+        logger.log('[algo->lidar.py->learn_background]: current_frame_index not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get background parameters
+    background_cfg = cfg_dict['proc']['lidar']['learn_background']
+    min_xyz, max_xyz, voxel_size = background_cfg['min_xyz'], background_cfg['max_xyz'], background_cfg.get('voxel_size', 0.2)
+    
+    # create the model, the sorted keys (flat indices in the voxel grid of the region) of the voxels occupied so far with the number of frames each was occupied in,
+    # the model only grows with the occupied voxels instead of the whole region; it is rebuilt if the region or voxel_size change
+    grid_params = {'min_xyz': [float(value) for value in min_xyz], 'max_xyz': [float(value) for value in max_xyz], 'voxel_size': np.broadcast_to(voxel_size, (3,)).astype(float).tolist()}
+    if 'background_model' in data_dict and data_dict['background_model']['grid_params'] != grid_params:
+        logger.log('[algo->lidar.py->learn_background]: region or voxel_size changed, relearning the background model', Logger.INFO)
+        data_dict.pop('background_model')
+    if 'background_model' not in data_dict:
+        grid_shape = tuple(int(np.ceil((max_xyz[axis] - min_xyz[axis]) / grid_params['voxel_size'][axis])) for axis in range(3))
+        data_dict['background_model'] = {'grid_params': grid_params, 'min_xyz': grid_params['min_xyz'], 'voxel_size': grid_params['voxel_size'], 'grid_shape': grid_shape, 'keys': np.zeros(0, dtype=np.int64), 'counts': np.zeros(0, dtype=np.uint32), 'learned_frames': set(), 'background_keys': None}
+    model = data_dict['background_model']
+    if model['background_keys'] is not None: return # already learned
+    if data_dict['current_frame_index'] in model['learned_frames']: return # each frame is learned once
+    
+    # count each occupied voxel once per frame, the keys of the frame are merged into the sorted keys of the model
+    indices = algo_utils.get_voxel_grid_indices(data_dict['current_point_cloud_numpy'], model['min_xyz'], model['voxel_size'], model['grid_shape'])
+    frame_keys = np.unique(indices[indices >= 0])
+    model['keys'], inverse = np.unique(np.concatenate([model['keys'], frame_keys]), return_inverse=True)
+    model['counts'] = np.bincount(inverse, weights=np.concatenate([model['counts'], np.ones(len(frame_keys), dtype=np.uint32)]), minlength=len(model['keys'])).astype(np.uint32)
+    model['learned_frames'].add(data_dict['current_frame_index'])
+    num_learned = len(model['learned_frames'])
+    
+    # the background is the voxels occupied often enough
+    num_frames = background_cfg.get('num_frames', 50)
+    if num_learned >= num_frames:
+        background_keys = model['keys'][model['counts'] >= max(1, int(np.ceil(background_cfg.get('min_occupancy', 0.5) * num_learned)))]
+        grid_shape = np.asarray(model['grid_shape'], dtype=np.int64)
+        for _ in range(background_cfg.get('dilation', 1)):
+            # add the face neighbors of the background voxels that fall inside the grid
+            coords = np.stack(np.unravel_index(background_keys, model['grid_shape']), axis=1)
+            neighbor_keys = [background_keys]
+            for axis in range(3):
+                for step in [-1, 1]:
+                    neighbor_coords = coords.copy()
+                    neighbor_coords[:, axis] += step
+                    in_grid = (neighbor_coords[:, axis] >= 0) & (neighbor_coords[:, axis] < grid_shape[axis])
+                    neighbor_keys.append(np.ravel_multi_index(tuple(neighbor_coords[in_grid].T), model['grid_shape']))
+            background_keys = np.unique(np.concatenate(neighbor_keys))
+        model['background_keys'] = background_keys
+        model['keys'], model['counts'] = None, None
+        logger.log(f'[algo->lidar.py->learn_background]: background model learned from {num_learned} frames, {len(background_keys)} background voxels', Logger.INFO)
+    else: logger.log(f'[algo->lidar.py->learn_background]: learned {num_learned}/{num_frames} frames', Logger.DEBUG)
+
+def remove_background(data_dict: dict, cfg_dict: dict):
+    """
+    Removes the points falling in background voxels of the model learned by learn_background, with a binary search of the voxel of each point in the sorted background keys. The point cloud is left unchanged until the model is learned.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->remove_background]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->remove_background]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    if "background_model" not in data_dict or data_dict['background_model']['background_keys'] is None:
+        logger.log('[algo->lidar.py->remove_background]: background model is not learned yet, please enable proc:lidar:learn_background', Logger.DEBUG)
+        return
+    
+    # look up the voxel of each point in the background mask
+    pcd = data_dict['current_point_cloud_numpy']
+    model = data_dict['background_model']
+    indices = algo_utils.get_voxel_grid_indices(pcd, model['min_xyz'], model['voxel_size'], model['grid_shape'])
+    background_keys = model['background_keys']
+    if len(background_keys) == 0: background_mask = np.zeros(len(pcd), dtype=bool)
+    else: background_mask = background_keys[np.minimum(np.searchsorted(background_keys, indices), len(background_keys) - 1)] == indices # points outside the grid (index -1) never match
+    foreground_indices = np.flatnonzero(~background_mask)
+    
+    # Update the point cloud in data_dict
+    data_dict['current_point_cloud_numpy'] = pcd[foreground_indices]
+    colors = data_dict.get('current_point_cloud_point_colors', None)
+    data_dict['current_point_cloud_point_colors'] = colors[foreground_indices] if colors is not None and len(colors) == len(pcd) else np.ones((len(foreground_indices), 3), dtype=np.float32)
+    algo_utils.select_range_image_points(data_dict, len(pcd), foreground_indices)
+    if cfg_dict['proc']['lidar']['remove_background'].get('keep_mask', False): data_dict['current_point_cloud_background_mask'] = background_mask
+    
+def remove_outliers(data_dict: dict, cfg_dict: dict):
+    """
+    Removes outlier points (e.g. rain and dust speckle) with statistical outlier removal (mean distance to the neighbors far above the average) or radius outlier removal (too few neighbors within a radius), see `algo.utils.statistical_outlier_mask` and `algo.utils.radius_outlier_mask`.
+    The neighbors come from the shared KD-tree of the point cloud, or in O(1) per point from the range image created by create_range_image (for organized sensors), see `algo.utils.get_neighbor_distances`.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->remove_outliers]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->remove_outliers]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and outlier removal parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    outlier_cfg = cfg_dict['proc']['lidar']['remove_outliers']
+    method = outlier_cfg.get('method', 'statistical')
+    backend = outlier_cfg.get('backend', 'kdtree')
+    min_neighbors = outlier_cfg.get('min_neighbors', 2)
+    if method not in ['statistical', 'radius']:
+        logger.log(f'[algo->lidar.py->remove_outliers]: method {method} not supported, supported methods: statistical, radius', Logger.ERROR)
+        return
+    if backend not in ['kdtree', 'range_image']:
+        logger.log(f'[algo->lidar.py->remove_outliers]: backend {backend} not supported, supported backends: kdtree, range_image', Logger.ERROR)
+        return
+    if backend == 'range_image' and ('current_point_cloud_pixels' not in data_dict or len(data_dict['current_point_cloud_pixels']) != len(pcd)):
+        logger.log('[algo->lidar.py->remove_outliers]: range image of the point cloud not found in data_dict, please enable proc:lidar:create_range_image with a lower priority', Logger.ERROR)
+        return
+    
+    # for radius outlier removal, a point has min_neighbors within the radius if its min_neighbors-th nearest neighbor is within the radius
+    k = outlier_cfg.get('num_neighbors', 8) if method == 'statistical' else min_neighbors
+    neighbor_distances = algo_utils.get_neighbor_distances(data_dict, k, backend, outlier_cfg.get('kernel_size', 3))
+    if method == 'statistical': outlier_mask = algo_utils.statistical_outlier_mask(neighbor_distances, outlier_cfg.get('std_ratio', 2.0))
+    else: outlier_mask = algo_utils.radius_outlier_mask(neighbor_distances, outlier_cfg.get('radius', 0.5), min_neighbors)
+    
+    # Update the point cloud in data_dict, or only color the outliers
+    colors = data_dict.get('current_point_cloud_point_colors', None)
+    if colors is None or len(colors) != len(pcd): colors = np.ones((len(pcd), 3), dtype=np.float32)
+    if outlier_cfg.get('remove', True):
+        inlier_indices = np.flatnonzero(~outlier_mask)
+        data_dict['current_point_cloud_numpy'] = pcd[inlier_indices]
+        data_dict['current_point_cloud_point_colors'] = colors[inlier_indices]
+        algo_utils.select_range_image_points(data_dict, len(pcd), inlier_indices)
+    else:
+        colors = colors.copy()
+        colors[outlier_mask] = outlier_cfg.get('outlier_color', [1, 0, 0])
+        data_dict['current_point_cloud_point_colors'] = colors
+    if outlier_cfg.get('keep_mask', False) or not outlier_cfg.get('remove', True): data_dict['current_point_cloud_outlier_mask'] = outlier_mask
+
+def voxel_downsample(data_dict: dict, cfg_dict: dict):
+    """
+    Downsamples the point cloud to one point per voxel, see `algo.utils.voxel_downsample` for the aggregation modes.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->voxel_downsample]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->voxel_downsample]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and downsample parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    voxel_cfg = cfg_dict['proc']['lidar']['voxel_downsample']
+    mode = voxel_cfg.get('mode', 'centroid')
+    
+    try: voxel_pcd, point_voxel_ids, voxel_point_indices = algo_utils.voxel_downsample(pcd, voxel_cfg['voxel_size'], mode)
+    except (NotImplementedError, ValueError) as e:
+        logger.log(f'[algo->lidar.py->voxel_downsample]: {e}', Logger.ERROR)
+        return
+    
+    # aggregate the point colors the same way as the points
+    colors = data_dict.get('current_point_cloud_point_colors', None)
+    if colors is not None and len(colors) == len(pcd):
+        if mode == 'centroid':
+            counts = np.bincount(point_voxel_ids, minlength=len(voxel_pcd))
+            colors = np.stack([np.bincount(point_voxel_ids, weights=channel, minlength=len(voxel_pcd)) for channel in colors.T], axis=1) / counts[:, None]
+            colors = colors.astype(np.float32)
+        else: colors = colors[voxel_point_indices]
+    else: colors = np.ones((len(voxel_pcd), 3), dtype=np.float32)
+    
+    # Update the point cloud in data_dict
+    data_dict['current_point_cloud_numpy'] = voxel_pcd
+    data_dict['current_point_cloud_point_colors'] = colors
+    algo_utils.select_range_image_points(data_dict, len(pcd), voxel_point_indices) # each voxel keeps the pixel of its first (or max-intensity) point
+    
+    # keep the map from the points before downsampling to the voxels (rows of current_point_cloud_numpy)
+    if voxel_cfg.get('keep_map', False): data_dict['current_point_cloud_voxel_ids'] = point_voxel_ids
+    
+def segment_ground(data_dict: dict, cfg_dict: dict):
+    """
+    Segments the ground points of the point cloud, with a polar-grid slope method or a batched RANSAC plane fit, see `algo.utils.ground_mask_polar` and `algo.utils.ground_mask_ransac`.
+    The point cloud is not modified, the ground mask is written to data_dict as current_point_cloud_ground_mask (and the plane as current_ground_plane for RANSAC).
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->segment_ground]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->segment_ground]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and ground segmentation parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    ground_cfg = cfg_dict['proc']['lidar']['segment_ground']
+    method = ground_cfg.get('method', 'polar')
+    
+    if method == 'polar':
+        data_dict['current_point_cloud_ground_mask'] = algo_utils.ground_mask_polar(pcd, ground_cfg.get('sensor_height', 1.73), ground_cfg.get('height_threshold', 0.2), ground_cfg.get('max_range', 80.0), ground_cfg.get('num_sectors', 360), ground_cfg.get('bin_size', 1.0), ground_cfg.get('max_slope', 0.15))
+    elif method == 'ransac':
+        mask, plane = algo_utils.ground_mask_ransac(pcd, ground_cfg.get('height_threshold', 0.2), ground_cfg.get('num_iterations', 100), ground_cfg.get('max_angle', 15.0), ground_cfg.get('num_samples', 2048))
+        if plane is None: logger.log('[algo->lidar.py->segment_ground]: no ground plane found', Logger.WARNING)
+        data_dict['current_point_cloud_ground_mask'] = mask
+        data_dict['current_ground_plane'] = plane
+    else:
+        logger.log(f'[algo->lidar.py->segment_ground]: method {method} not supported, supported methods: polar, ransac', Logger.ERROR)
+        return
+    
+def cluster(data_dict: dict, cfg_dict: dict):
+    """
+    Clusters the point cloud by Euclidean proximity and appends a label with a `lidar_cluster` (the point indices) and a fitted `lidar_bbox` for each cluster to current_label_list, see `algo.utils.cluster_points` for the methods.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->cluster]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->cluster]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and clustering parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    cluster_cfg = cfg_dict['proc']['lidar']['cluster']
+    
+    # the ground points (see proc:lidar:segment_ground) would connect all the objects standing on it
+    point_indices = np.arange(pcd.shape[0])
+    if cluster_cfg.get('exclude_ground', True) and 'current_point_cloud_ground_mask' in data_dict:
+        ground_mask = data_dict['current_point_cloud_ground_mask']
+        if len(ground_mask) == len(pcd): point_indices = np.flatnonzero(~ground_mask)
+        else: logger.log('[algo->lidar.py->cluster]: current_point_cloud_ground_mask does not match the point cloud, clustering all the points', Logger.WARNING)
+    
+    try: point_cluster_ids = algo_utils.cluster_points(pcd[point_indices], cluster_cfg.get('tolerance', 0.5), cluster_cfg.get('min_points', 10), cluster_cfg.get('method', 'grid'), cluster_cfg.get('min_samples', 1))
+    except (NotImplementedError, ValueError, ImportError) as e:
+        logger.log(f'[algo->lidar.py->cluster]: {e}', Logger.ERROR)
+        return
+    
+    # drop the clusters larger than max_points, e.g. walls and vegetation
+    num_clusters = int(point_cluster_ids.max()) + 1 if point_cluster_ids.shape[0] else 0
+    counts = np.bincount(point_cluster_ids[point_cluster_ids >= 0], minlength=num_clusters)
+    if 'max_points' in cluster_cfg and np.any(counts > cluster_cfg['max_points']):
+        new_ids = np.full(num_clusters + 1, -1, dtype=np.int64) # the last entry maps -1 to -1
+        keep = counts <= cluster_cfg['max_points']
+        new_ids[:num_clusters][keep] = np.arange(np.count_nonzero(keep))
+        point_cluster_ids = new_ids[point_cluster_ids]
+        num_clusters = int(np.count_nonzero(keep))
+    
+    # point indices (into the point cloud) and fitted bounding box of each cluster
+    clustered = np.flatnonzero(point_cluster_ids >= 0)
+    order = clustered[np.argsort(point_cluster_ids[clustered], kind='stable')]
+    cluster_point_indices = np.split(point_indices[order], np.cumsum(np.bincount(point_cluster_ids[clustered], minlength=num_clusters))[:-1]) if num_clusters else []
+    centers, extents, yaws = algo_utils.fit_cluster_bboxes(pcd[point_indices], point_cluster_ids, num_clusters)
+    euler_angles = np.zeros((num_clusters, 3), dtype=np.float32)
+    euler_angles[:, 2] = yaws
+    cluster_labels = LabelList.from_columns(centers, extents, euler_angles, np.tile(np.asarray(cluster_cfg.get('bbox_color', [1, 1, 0]), dtype=np.float32), (num_clusters, 1)), [cluster_cfg.get('class_name', 'Cluster')] * num_clusters, predicted=True, labels=[{'lidar_cluster': {'point_indices': indices}} for indices in cluster_point_indices])
+    
+    # Update the label list in data_dict
+    label_list = LabelList(data_dict['current_label_list']) if 'current_label_list' in data_dict else LabelList()
+    label_list.extend(cluster_labels)
+    data_dict['current_label_list'] = label_list
+    
+def register_frames(data_dict: dict, cfg_dict: dict):
+    """
+    Registers consecutive frames with point-to-plane ICP on voxel-downsampled point clouds, warm-started with the motion of the previous frame (constant velocity).
+    In scan_to_scan mode each frame is aligned to the previous one, in scan_to_map mode to a voxelized map of the registered frames kept around the sensor.
+    The pose (4x4 transform from the current point cloud to the first frame) is written to data_dict as current_pose, all the poses as registration_poses (by frame index), and the map (if enabled) as registration_map.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->register_frames]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->register_frames]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    if "current_frame_index" not in data_dict:
+        logger.log('[algo->lidar.py->register_frames]: current_frame_index not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get registration parameters
+    reg_cfg = cfg_dict['proc']['lidar']['register_frames']
+    mode = reg_cfg.get('mode', 'scan_to_scan')
+    voxel_size = reg_cfg.get('voxel_size', 0.8)
+    build_map = reg_cfg.get('build_map', True) or mode == 'scan_to_map'
+    if mode not in ['scan_to_scan', 'scan_to_map']:
+        logger.log(f'[algo->lidar.py->register_frames]: mode {mode} not supported, supported modes: scan_to_scan, scan_to_map', Logger.ERROR)
+        return
+    
+    # registration state kept across frames
+    state = data_dict.setdefault('registration', {'poses': dict(), 'pose': None, 'motion': np.eye(4), 'target': None, 'map': None})
+    data_dict['registration_poses'] = state['poses']
+    frame_index = data_dict['current_frame_index']
+    if frame_index in state['poses']: # already registered, e.g. when going back to a frame
+        data_dict['current_pose'] = state['poses'][frame_index]
+        return
+    
+    # downsampled source with normals, the normals are needed when it becomes the target of the next frame or is inserted into the map
+    # the normals come from the covariances of the downsampled points in coarser voxels, which is several times faster than the neighbour searches of open3d
+    source_points = algo_utils.voxel_downsample(data_dict['current_point_cloud_numpy'][:, :3], voxel_size, 'centroid')[0]
+    source_normals, has_normal = algo_utils.estimate_normals(source_points, voxel_size * reg_cfg.get('normal_voxel_scale', 3.0), min_points=4)
+    source_points, source_normals = source_points[has_normal], source_normals[has_normal]
+    source = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(source_points.astype(np.float64)))
+    source.normals = o3d.utility.Vector3dVector(source_normals.astype(np.float64))
+    
+    if state['pose'] is None: pose = np.eye(4)
+    else:
+        criteria = o3d.pipelines.registration.ICPConvergenceCriteria(relative_fitness=1e-4, relative_rmse=1e-4, max_iteration=reg_cfg.get('max_iterations', 30))
+        estimation = o3d.pipelines.registration.TransformationEstimationPointToPlane()
+        max_correspondence_distance = reg_cfg.get('max_correspondence_distance', voxel_size * 2.0)
+        if mode == 'scan_to_scan':
+            result = o3d.pipelines.registration.registration_icp(source, state['target'], max_correspondence_distance, state['motion'], estimation, criteria)
+            pose = state['pose'] @ result.transformation
+        else:
+            target = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(state['map'][:, :3].astype(np.float64)))
+            target.normals = o3d.utility.Vector3dVector(state['map'][:, 3:6].astype(np.float64))
+            result = o3d.pipelines.registration.registration_icp(source, target, max_correspondence_distance, state['pose'] @ state['motion'], estimation, criteria)
+            pose = result.transformation
+        if result.fitness < reg_cfg.get('min_fitness', 0.3):
+            logger.log(f'[algo->lidar.py->register_frames]: low registration fitness {result.fitness:.2f} at frame {frame_index}, using the constant velocity prediction', Logger.WARNING)
+            pose = state['pose'] @ state['motion']
+        state['motion'] = np.linalg.inv(state['pose']) @ pose
+    
+    # Update the registration state and data_dict
+    pose = np.asarray(pose)
+    state['pose'] = pose
+    state['poses'][frame_index] = pose
+    state['target'] = source
+    data_dict['current_pose'] = pose
+    if build_map:
+        world_points = np.hstack([source_points @ pose[:3, :3].T.astype(np.float32) + pose[:3, 3].astype(np.float32), source_normals @ pose[:3, :3].T.astype(np.float32)])
+        state['map'] = algo_utils.update_voxel_map(state['map'], world_points, reg_cfg.get('map_voxel_size', voxel_size), pose[:3, 3], reg_cfg.get('map_range', 100.0))
+        data_dict['registration_map'] = state['map'][:, :3]
+    
+def deskew(data_dict: dict, cfg_dict: dict):
+    """
+    Removes the motion distortion of spinning lidar scans captured while moving, using the per-point time in the fifth column of the point cloud (see data:lidar:point_time and sensors:lidar:point_time) and the motion of the sensor over the scan, see `algo.utils.deskew_points`.
+    The motion comes from register_frames (the motion of the current frame if it is registered first, otherwise of the previous frame as a constant velocity prediction) or from a poses file in KITTI odometry format (one 3x4 pose per frame).
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->deskew]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->deskew]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    # the fifth column is the time only if enabled, e.g. the sensor_id column of multiple lidars comes last otherwise
+    point_time = cfg_dict.get('data', {}).get('lidar', {}).get('point_time', False) or cfg_dict.get('sensors', {}).get('lidar', {}).get('point_time', False)
+    if not point_time or data_dict['current_point_cloud_numpy'].shape[1] < 5:
+        logger.log('[algo->lidar.py->deskew]: point cloud has no time column, please enable data:lidar:point_time or sensors:lidar:point_time', Logger.ERROR)
+        return
+    
+    # Get point cloud and deskew parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    deskew_cfg = cfg_dict['proc']['lidar']['deskew']
+    source = deskew_cfg.get('source', 'registration')
+    
+    # motion from the sensor frame at the end of the scan to the sensor frame at its start
+    if source == 'registration':
+        if 'registration' not in data_dict or data_dict['registration']['pose'] is None:
+            logger.log('[algo->lidar.py->deskew]: no registration motion yet, please enable proc:lidar:register_frames', Logger.DEBUG)
+            return
+        motion = data_dict['registration']['motion']
+    elif source == 'poses_file':
+        if "current_frame_index" not in data_dict:
+            logger.log('[algo->lidar.py->deskew]: current_frame_index not found in data_dict', Logger.ERROR)
+            return
+        poses_path = deskew_cfg.get('poses_path', '')
+        if data_dict.get('deskew_poses', {}).get('path', None) != poses_path:
+            try: poses = np.loadtxt(poses_path, ndmin=2).reshape(-1, 3, 4)
+            except Exception as e:
+                logger.log(f'[algo->lidar.py->deskew]: could not read poses from {poses_path}: {e}', Logger.ERROR)
+                return
+            data_dict['deskew_poses'] = {'path': poses_path, 'poses': np.concatenate([poses, np.tile([[[0.0, 0.0, 0.0, 1.0]]], (len(poses), 1, 1))], axis=1)}
+        poses = data_dict['deskew_poses']['poses']
+        frame_index = data_dict['current_frame_index']
+        if len(poses) < 2 or frame_index >= len(poses):
+            logger.log(f'[algo->lidar.py->deskew]: no pose for frame {frame_index} in {poses_path}', Logger.ERROR)
+            return
+        # the first frame uses the motion of the second one
+        previous_index = frame_index - 1 if frame_index > 0 else 0
+        motion = np.linalg.inv(poses[previous_index]) @ poses[previous_index + 1]
+    else:
+        logger.log(f'[algo->lidar.py->deskew]: source {source} not supported, supported sources: registration, poses_file', Logger.ERROR)
+        return
+    
+    data_dict['current_point_cloud_numpy'] = algo_utils.deskew_points(pcd, pcd[:, 4], motion, deskew_cfg.get('scan_period', 0.1))
+
+def create_range_image(data_dict: dict, cfg_dict: dict):
+    """
+    Creates an organized range image of the point cloud with maps between its pixels and the points, so that the neighbors of a point can be looked up in O(1) (see `algo.utils.get_range_image_neighbors`).
+    If the sensor streams organized point clouds (current_point_cloud_organized_shape in data_dict, e.g. Ouster) and no point has been removed, the sensor layout is kept as is; otherwise the points are projected spherically, see `algo.utils.spherical_projection`.
+    The point cloud is not modified, current_range_image (range, 0 for empty pixels), current_range_index_image (pixel to point, -1 for empty pixels), and current_point_cloud_pixels (point to pixel row and column, -1 for points not in the image) are written to data_dict.
+    The processes that remove points (crop, remove_background, remove_outliers, voxel_downsample) keep these maps consistent with the point cloud, see `algo.utils.select_range_image_points`, so the range image is created first, on the full scan.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->create_range_image]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->create_range_image]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and range image parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    range_cfg = cfg_dict['proc']['lidar']['create_range_image']
+    min_range = range_cfg.get('min_range', 0.1)
+    organized_shape = data_dict.get('current_point_cloud_organized_shape', None)
+    
+    if range_cfg.get('use_sensor_layout', True) and organized_shape is not None and organized_shape[0] * organized_shape[1] == pcd.shape[0]:
+        # the points are the pixels in row-major order, only the pixels without a return are empty
+        height, width = organized_shape
+        ranges = np.linalg.norm(pcd[:, :3], axis=1)
+        valid = ranges >= min_range
+        range_image = np.where(valid, ranges, 0.0).astype(np.float32).reshape(height, width)
+        index_image = np.where(valid, np.arange(pcd.shape[0]), -1).reshape(height, width)
+        rows, cols = np.divmod(np.arange(pcd.shape[0]), width)
+        rows[~valid] = -1
+        cols[~valid] = -1
+    else:
+        if organized_shape is not None: logger.log('[algo->lidar.py->create_range_image]: point cloud does not match the sensor layout (points removed by a previous process), projecting spherically', Logger.DEBUG)
+        range_image, index_image, rows, cols = algo_utils.spherical_projection(pcd, range_cfg.get('height', 64), range_cfg.get('width', 1024), range_cfg.get('fov_up', 22.5), range_cfg.get('fov_down', -22.5), min_range)
+    
+    data_dict['current_range_image'] = range_image
+    data_dict['current_range_index_image'] = index_image
+    data_dict['current_point_cloud_pixels'] = np.column_stack((rows, cols))
+
+def create_bev_grids(data_dict: dict, cfg_dict: dict):
+    """
+    Rasterizes the point cloud into bird's-eye-view grids (occupancy, max_height, min_height, intensity, density), see `algo.utils.rasterize_bev`.
+    The point cloud is not modified, the grids are written to data_dict as current_bev_grids with shape (len(grids), X, Y) and their names as current_bev_grid_names.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+    
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->create_bev_grids]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->create_bev_grids]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+    
+    # Get point cloud and grid parameters
+    pcd = data_dict['current_point_cloud_numpy']
+    bev_cfg = cfg_dict['proc']['lidar']['create_bev_grids']
+    min_xyz, max_xyz = bev_cfg.get('min_xyz', [-40.0, -40.0, -4.0]), bev_cfg.get('max_xyz', [40.0, 40.0, 2.0])
+    cell_size = bev_cfg.get('cell_size', 0.1)
+    grids = bev_cfg.get('grids', algo_utils.bev_grid_names)
+    unsupported = [grid for grid in grids if grid not in algo_utils.bev_grid_names]
+    if len(unsupported) > 0:
+        logger.log(f'[algo->lidar.py->create_bev_grids]: grids {", ".join(unsupported)} not supported, supported grids: {", ".join(algo_utils.bev_grid_names)}', Logger.ERROR)
+        return
+    
+    # the grids are written into a buffer reused across frames if enabled
+    out = None
+    if bev_cfg.get('reuse_buffers', False):
+        grid_shape = tuple(int(np.ceil((max_xyz[axis] - min_xyz[axis]) / cell_size)) for axis in range(2))
+        out = algo_utils.get_buffer(data_dict, 'bev_grids', (len(grids),) + grid_shape, np.float32)
+    data_dict['current_bev_grids'] = algo_utils.rasterize_bev(pcd, min_xyz, max_xyz, cell_size, grids, bev_cfg.get('density_normalization', 64.0), out)
+    data_dict['current_bev_grid_names'] = list(grids)
+
 def project_image_pixel_colors(data_dict: dict, cfg_dict: dict):
     """
     Projects the colors of image pixels onto the point cloud.
@@ -68,24 +641,17 @@ def project_image_pixel_colors(data_dict: dict, cfg_dict: dict):
     
     # Extract required data
     img_np = data_dict['current_image_numpy']
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
-    R0_rect = data_dict['current_calib_data']['R0_rect']
-    P2 = data_dict['current_calib_data']['P2']
-    
-    data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32) # N X 3(RGB)
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
-    
-    # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
+    pcd = data_dict['current_point_cloud_numpy']
+    # float32 P2 @ R0_rect @ Tr_velo_to_cam, computed once per calibration
+    Tr_velo_to_pixel = calib_utils.add_derived_matrices(data_dict['current_calib_data'])['Tr_velo_to_pixel_f32']
     
-    # Normalize pixel coordinates
-    normalized_pixel_coords_2d = pixel_coords[:2] / (pixel_coords[2] + 1e-8)
-    normalized_pixel_coords_2d = normalized_pixel_coords_2d.T
-    normalized_pixel_coords_2d = normalized_pixel_coords_2d.astype(int)
+    # Project lidar points onto the image plane, invalid points are behind the camera or outside the image boundaries
+    pixels, _, valid = algo_utils.project_points_with_buffers(data_dict, pcd, Tr_velo_to_pixel, img_np.shape)
+    valid_indices = np.flatnonzero(valid)
     
-    # Filter out coordinates that are outside the image boundaries
-    valid_coords = np.logical_and.reduce((pixel_coords[2,:] > 0, normalized_pixel_coords_2d[:, 0] >= 0, normalized_pixel_coords_2d[:, 0] < img_np.shape[1], normalized_pixel_coords_2d[:, 1] >= 0, normalized_pixel_coords_2d[:, 1] < img_np.shape[0]))
     # Update the point cloud colors in data_dict corresponding to the valid pixel coordinates
-    data_dict['current_point_cloud_point_colors'][valid_coords] = img_np[normalized_pixel_coords_2d[valid_coords][:, 1], normalized_pixel_coords_2d[valid_coords][:, 0]] / 255.0
-    
\ No newline at end of file
+    colors = np.ones((pcd.shape[0], 3), dtype=np.float32) # N X 3(RGB)
+    valid_pixels = pixels[valid_indices]
+    colors[valid_indices] = img_np[valid_pixels[:, 1], valid_pixels[:, 0], :3] * np.float32(1.0 / 255.0)
+    if algo_utils.is_bgr_image(cfg_dict): colors[valid_indices] = colors[valid_indices][:, ::-1] # BGR to RGB
+    data_dict['current_point_cloud_point_colors'] = colors
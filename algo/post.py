@@ -1,6 +1,7 @@
 # contains more generic post-processing algorithms for the data
 
 from gui.logger_gui import Logger
+from algo import utils as algo_utils
 
 def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     """
@@ -31,7 +32,7 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     # imports
     import os
     import numpy as np
-    import open3d as o3d
+    from lbl.label_list import LabelList, get_points_in_bboxes
     
     # Get required data from data_dict
     current_point_cloud_numpy = data_dict['current_point_cloud_numpy']
@@ -46,27 +47,23 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     lbl_output_dir = os.path.join(output_path, 'label')
     os.makedirs(lbl_output_dir, exist_ok=True)
     
-    for idx, label_dict in enumerate(current_label_list):
-        if 'lidar_bbox' not in label_dict: continue
+    # Get points within all the bounding boxes at once
+    current_label_list = LabelList.from_labels(current_label_list)
+    _, bbox_point_indices = get_points_in_bboxes(current_point_cloud_numpy, current_label_list.centers, current_label_list.extents, current_label_list.euler_angles)
+    class_names = current_label_list.get_class_names()
+    
+    for idx in np.flatnonzero(current_label_list.has_lidar_bbox):
         # Get bounding box center, extent, and euler angles
-        bbox_center = label_dict['lidar_bbox']['lidar_xyz_center'].copy()
-        bbox_extent = label_dict['lidar_bbox']['lidar_xyz_extent']
-        bbox_euler_angles = label_dict['lidar_bbox']['lidar_xyz_euler_angles']
-        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(bbox_euler_angles)
-        
-        # Create an oriented bounding box
-        try: rotated_bbox = o3d.geometry.OrientedBoundingBox(bbox_center, R, bbox_extent)
-        except:
-            logger.log(f'[algo->post.py->create_per_object_pcdet_dataset]: failed to create an OrientedBoundingBox, skipping ...', Logger.WARNING)
-            continue
-        # Get points within the bounding box
-        inside_points = rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(current_point_cloud_numpy[:, :3]))
-        object_point_cloud = current_point_cloud_numpy[inside_points]
+        bbox_center = current_label_list.centers[idx].copy()
+        bbox_extent = current_label_list.extents[idx]
+        bbox_euler_angles = current_label_list.euler_angles[idx]
+        object_point_cloud = current_point_cloud_numpy[bbox_point_indices[idx]]
         
         # Center the point cloud
-        point_cloud_mean = np.mean(object_point_cloud[:, :3], axis=0)
-        bbox_center -= point_cloud_mean
-        object_point_cloud[:, :3] -= point_cloud_mean
+        if len(object_point_cloud) > 0:
+            point_cloud_mean = np.mean(object_point_cloud[:, :3], axis=0)
+            bbox_center -= point_cloud_mean
+            object_point_cloud[:, :3] -= point_cloud_mean
         
         # Save the point cloud and label
         npy_path = os.path.join(pcd_output_dir, os.path.basename(current_label_path).replace('.txt', f'{str(idx).zfill(4)}.npy'))
@@ -79,8 +76,7 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
             lbl_str += str(bbox_center[0]) + ' ' + str(bbox_center[1]) + ' ' + str(bbox_center[2]) + ' '
             lbl_str += str(bbox_extent[0]) + ' ' + str(bbox_extent[1]) + ' ' + str(bbox_extent[2]) + ' '
             lbl_str += str(bbox_euler_angles[2]) + ' '
-            if 'class' in label_dict: lbl_str += label_dict['class']
-            else: lbl_str += 'Unknown'
+            lbl_str += class_names[idx]
             f.write(lbl_str)
 
 def create_pcdet_dataset(data_dict: dict, cfg_dict: dict):
@@ -102,6 +98,7 @@ def create_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     # imports
     import os
     import numpy as np
+    from lbl.label_list import LabelList
 
     # Get required data from data_dict
     current_point_cloud_numpy = data_dict['current_point_cloud_numpy']
@@ -120,20 +117,105 @@ def create_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     npy_path = os.path.join(pcd_output_dir, os.path.basename(current_label_path).replace('.txt', '.npy'))
     np.save(npy_path, current_point_cloud_numpy)
     
-    lbl_str = ''
-    for label_dict in current_label_list:
-        if 'lidar_bbox' not in label_dict: continue
-        # Get bounding box center, extent, and euler angles
-        bbox_center = label_dict['lidar_bbox']['lidar_xyz_center'].copy()
-        bbox_extent = label_dict['lidar_bbox']['lidar_xyz_extent']
-        bbox_euler_angles = label_dict['lidar_bbox']['lidar_xyz_euler_angles']
-        lbl_str += str(bbox_center[0]) + ' ' + str(bbox_center[1]) + ' ' + str(bbox_center[2]) + ' '
-        lbl_str += str(bbox_extent[0]) + ' ' + str(bbox_extent[1]) + ' ' + str(bbox_extent[2]) + ' '
-        lbl_str += str(bbox_euler_angles[2]) + ' '
-        if 'class' in label_dict: lbl_str += label_dict['class']
-        else: lbl_str += 'Unknown'
-        lbl_str += '\n'
+    # format all the boxes at once from the label columns: x y z dx dy dz heading class
+    current_label_list = LabelList.from_labels(current_label_list)
+    has_lidar_bbox = current_label_list.has_lidar_bbox
+    bbox_values = np.column_stack((current_label_list.centers, current_label_list.extents, current_label_list.yaws))[has_lidar_bbox]
+    bbox_strs = np.char.mod('%.7g', bbox_values).tolist()
+    class_names = current_label_list.get_class_names()[has_lidar_bbox].tolist()
+    lbl_str = ''.join(' '.join(bbox_str) + ' ' + class_name + '\n' for bbox_str, class_name in zip(bbox_strs, class_names))
 
     # Save the label
     lbl_path = os.path.join(lbl_output_dir, os.path.basename(current_label_path))
-    with open(lbl_path, 'w') as f: f.write(lbl_str)
\ No newline at end of file
+    with open(lbl_path, 'w') as f: f.write(lbl_str)
+
+def create_depth_dataset(data_dict: dict, cfg_dict: dict):
+    """
+    Saves the depth image created by `camera:create_depth_image` as a 16-bit PNG in KITTI depth format (depth in meters * 256, 0 for no depth), and the index image as .npy if present, both named after the image file of the frame.
+
+    Args:
+        data_dict (dict): A dictionary containing the required data.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->post.py->create_depth_dataset][CRITICAL]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if 'current_depth_image' not in data_dict:
+        logger.log('[algo->post.py->create_depth_dataset]: current_depth_image not found in data_dict, please enable proc:camera:create_depth_image', Logger.ERROR)
+        return
+    if 'current_frame_index' not in data_dict:
+        logger.log('[algo->post.py->create_depth_dataset]: current_frame_index not found in data_dict', Logger.ERROR)
+        return
+    
+    # imports
+    import os
+    import cv2
+    import numpy as np
+    
+    # Create output directories if they do not exist
+    output_path = os.path.join(cfg_dict['data']['path'], 'output', 'post', 'depth_dataset')
+    depth_output_dir = os.path.join(output_path, 'depth')
+    os.makedirs(depth_output_dir, exist_ok=True)
+    file_basename = algo_utils.get_frame_basename(data_dict, ['current_image_path', 'current_point_cloud_path'])
+    
+    # Save the depth image
+    depth_image = np.clip(np.round(data_dict['current_depth_image'] * 256.0), 0, 65535).astype(np.uint16)
+    cv2.imwrite(os.path.join(depth_output_dir, file_basename + '.png'), depth_image)
+    
+    # Save the index image
+    if 'current_depth_index_image' in data_dict:
+        index_output_dir = os.path.join(output_path, 'index')
+        os.makedirs(index_output_dir, exist_ok=True)
+        np.save(os.path.join(index_output_dir, file_basename + '.npy'), data_dict['current_depth_index_image'])
+
+def create_bev_dataset(data_dict: dict, cfg_dict: dict):
+    """
+    Saves the bird's-eye-view grids created by `lidar:create_bev_grids` of each frame as a single .npy with shape (len(grids), X, Y) named after the point cloud file of the frame, and the grid names as grid_names.txt (rewritten if the grids change).
+
+    Args:
+        data_dict (dict): A dictionary containing the required data.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+    # Get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->post.py->create_bev_dataset][CRITICAL]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # Check if required data is present in data_dict
+    if 'current_bev_grids' not in data_dict:
+        logger.log('[algo->post.py->create_bev_dataset]: current_bev_grids not found in data_dict, please enable proc:lidar:create_bev_grids', Logger.ERROR)
+        return
+    if 'current_frame_index' not in data_dict:
+        logger.log('[algo->post.py->create_bev_dataset]: current_frame_index not found in data_dict', Logger.ERROR)
+        return
+    
+    # imports
+    import os
+    import numpy as np
+    
+    # Create output directories if they do not exist
+    output_path = os.path.join(cfg_dict['data']['path'], 'output', 'post', 'bev_dataset')
+    bev_output_dir = os.path.join(output_path, 'bev')
+    os.makedirs(bev_output_dir, exist_ok=True)
+    
+    # Save the grid names, unless the same names were already saved
+    grid_names_path = os.path.join(output_path, 'grid_names.txt')
+    grid_names_str = '\n'.join(data_dict['current_bev_grid_names']) + '\n'
+    saved_grid_names_str = None
+    if os.path.exists(grid_names_path):
+        with open(grid_names_path, 'r') as f: saved_grid_names_str = f.read()
+    if saved_grid_names_str != grid_names_str:
+        with open(grid_names_path, 'w') as f: f.write(grid_names_str)
+    
+    # Save all the grids of the frame at once, as float16 if enabled
+    bev_grids = data_dict['current_bev_grids']
+    if cfg_dict['proc']['post']['create_bev_dataset'].get('float16', False): bev_grids = bev_grids.astype(np.float16)
+    file_basename = algo_utils.get_frame_basename(data_dict, ['current_point_cloud_path', 'current_image_path'])
+    np.save(os.path.join(bev_output_dir, file_basename + '.npy'), bev_grids)
@@ -2,11 +2,151 @@
 This file contains utility functions that are used by the algorithms in the pipeline.
 '''
 
+import numpy as np
+from collections import deque
+
 from gui.logger_gui import Logger
 
-def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, global_index_key: str = None):
+class PointCloudGather:
     """
-    Gathers point clouds until a specified count is reached.
+    Stores gathered point clouds in one growable contiguous buffer with the row offsets of the frames, so that all the gathered points are available as a single array without concatenating, and the gathered frame indices are looked up in O(1).
+    With max_frames, the gather is a sliding window keeping the last max_frames point clouds; the oldest rows are dropped by moving the window start and compacted only when the buffer is full.
+    
+    Args:
+        max_frames (int, optional): Maximum number of point clouds to keep, older ones are dropped. Unbounded if None.
+        capacity (int): Initial capacity of the buffer in points.
+    
+    Usage:
+        gather = PointCloudGather(max_frames=10)
+        gather.append(points, frame_index)
+        all_points = gather.points # (N, C) view, no copy
+        frame_points = gather[-1] # view of the last point cloud
+    """
+    def __init__(self, max_frames: int = None, capacity: int = 0):
+        self.max_frames = max_frames
+        self.__capacity__ = capacity
+        self.__buffer__ = None
+        # absolute (start, end) rows of the frames in the buffer, and their frame indices
+        self.__starts__ = deque()
+        self.__ends__ = deque()
+        self.__frame_indices__ = deque()
+        self.__frame_index_set__ = dict() # insertion ordered set, frame indices may repeat when frame_index is None
+        self.__start__ = 0
+        self.__end__ = 0
+    
+    def __len__(self) -> int:
+        return len(self.__starts__)
+    
+    def __contains__(self, frame_index) -> bool:
+        return frame_index in self.__frame_index_set__
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice): return [self[i] for i in range(*index.indices(len(self)))]
+        return self.__buffer__[self.__starts__[index]:self.__ends__[index]]
+    
+    def __iter__(self):
+        for start, end in zip(self.__starts__, self.__ends__): yield self.__buffer__[start:end]
+    
+    @property
+    def points(self) -> np.ndarray:
+        """
+        All the gathered points as one (N, C) array, a view into the buffer that is valid until the next append.
+        """
+        if self.__buffer__ is None: return np.zeros((0, 0), dtype=np.float32)
+        return self.__buffer__[self.__start__:self.__end__]
+    
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        Row offsets of the point clouds in points, with shape (len + 1,); point cloud i is points[offsets[i]:offsets[i + 1]].
+        """
+        return np.asarray(list(self.__starts__) + [self.__end__], dtype=np.int64) - self.__start__
+    
+    @property
+    def frame_indices(self) -> list:
+        """
+        Frame indices of the gathered point clouds, oldest first.
+        """
+        return list(self.__frame_indices__)
+    
+    def __reserve__(self, num_points: int, num_columns: int, dtype):
+        """
+        Makes room for num_points more rows after the last frame, compacting the live rows to the start of the buffer or growing it.
+        
+        """
+        if self.__buffer__ is None:
+            self.__buffer__ = np.empty((max(self.__capacity__, num_points), num_columns), dtype=dtype)
+            return
+        if self.__buffer__.shape[1] != num_columns: raise ValueError(f'Cannot gather a point cloud with {num_columns} columns with point clouds of {self.__buffer__.shape[1]} columns.')
+        if self.__end__ + num_points <= self.__buffer__.shape[0]: return
+        num_live = self.__end__ - self.__start__
+        if num_live + num_points <= self.__buffer__.shape[0] // 2: buffer = self.__buffer__ # compact in place when the live rows fill at most half of the buffer, otherwise grow
+        else: buffer = np.empty((max(2 * self.__buffer__.shape[0], num_live + num_points), num_columns), dtype=self.__buffer__.dtype)
+        buffer[:num_live] = self.__buffer__[self.__start__:self.__end__]
+        shift = self.__start__
+        self.__starts__ = deque(start - shift for start in self.__starts__)
+        self.__ends__ = deque(end - shift for end in self.__ends__)
+        self.__buffer__, self.__start__, self.__end__ = buffer, 0, num_live
+    
+    def append(self, points: np.ndarray, frame_index = None):
+        """
+        Copies a point cloud to the end of the gather, dropping the oldest one if max_frames is exceeded.
+        
+        Args:
+            points (np.ndarray): Point cloud with shape (N, C), C must be the same for all the point clouds.
+            frame_index (int, optional): Frame index of the point cloud.
+        """
+        self.__reserve__(points.shape[0], points.shape[1], points.dtype)
+        self.__buffer__[self.__end__:self.__end__ + points.shape[0]] = points
+        self.__starts__.append(self.__end__)
+        self.__end__ += points.shape[0]
+        self.__ends__.append(self.__end__)
+        self.__frame_indices__.append(frame_index)
+        self.__frame_index_set__[frame_index] = self.__frame_index_set__.get(frame_index, 0) + 1
+        if self.max_frames is not None:
+            while len(self) > self.max_frames: self.popleft()
+    
+    def extend(self, other):
+        """
+        Appends all the point clouds of another gather (or an iterable of point clouds) with one copy per gather.
+        
+        Args:
+            other (PointCloudGather or list): The point clouds to append.
+        """
+        if not isinstance(other, PointCloudGather):
+            for points in other: self.append(points)
+            return
+        if len(other) == 0: return
+        other_points = other.points
+        self.__reserve__(other_points.shape[0], other_points.shape[1], other_points.dtype)
+        shift = self.__end__ - other.__start__
+        self.__buffer__[self.__end__:self.__end__ + other_points.shape[0]] = other_points
+        self.__end__ += other_points.shape[0]
+        self.__starts__.extend(start + shift for start in other.__starts__)
+        self.__ends__.extend(end + shift for end in other.__ends__)
+        for frame_index in other.__frame_indices__:
+            self.__frame_indices__.append(frame_index)
+            self.__frame_index_set__[frame_index] = self.__frame_index_set__.get(frame_index, 0) + 1
+        if self.max_frames is not None:
+            while len(self) > self.max_frames: self.popleft()
+    
+    def popleft(self) -> np.ndarray:
+        """
+        Drops the oldest point cloud.
+        
+        Returns:
+            np.ndarray: View of the dropped point cloud, valid until the next append.
+        """
+        start, end = self.__starts__.popleft(), self.__ends__.popleft()
+        frame_index = self.__frame_indices__.popleft()
+        self.__frame_index_set__[frame_index] -= 1
+        if self.__frame_index_set__[frame_index] == 0: del self.__frame_index_set__[frame_index]
+        self.__start__ = self.__starts__[0] if len(self.__starts__) else self.__end__
+        return self.__buffer__[start:end]
+
+def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, global_index_key: str = None, sliding_window: bool = False):
+    """
+    Gathers point clouds until a specified count is reached. The point clouds are stored in a PointCloudGather at data_dict[key].
     
     Args:
         data_dict (dict): The dictionary containing the data.
@@ -14,6 +154,7 @@ def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, g
         key (str): The key to store the gathered point clouds in the data dictionary.
         count (int): The desired count of point clouds to gather.
         global_index_key (str, optional): The key to store the indices of the gathered frames in the data dictionary. Defaults to None.
+        sliding_window (bool, optional): If True, novel point clouds keep being gathered after count is reached and the oldest ones are dropped, so the gather holds the last count point clouds. Defaults to False.
     
     Returns:
         bool: True if the gathering is completed, False otherwise.
@@ -22,23 +163,23 @@ def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, g
     
     gathering_not_started = key not in data_dict
     if gathering_not_started:
-        data_dict[key] = []
+        data_dict[key] = PointCloudGather(max_frames=count if sliding_window else None)
         logger.log(f'[algo->utils.py->gather_point_clouds[{key}]]: Gathering {count} point clouds', Logger.INFO)
     
     if global_index_key is None:
         global_index_key = f'{key}_gathered_frames_indices'
     if global_index_key not in data_dict:
-        data_dict[global_index_key] = []
+        data_dict[global_index_key] = dict() # insertion ordered set of the frame indices
     
     # Check if gathering is completed
-    gathering_completed = len(data_dict[key]) >= count
+    gathering_completed = len(data_dict[key]) >= count and not sliding_window
     point_cloud_is_present = 'current_point_cloud_numpy' in data_dict
     point_cloud_is_novel = data_dict['current_frame_index'] not in data_dict[global_index_key]
     
     # Gather the point cloud if gathering is not completed and the point cloud is present and novel
     if not gathering_completed and point_cloud_is_present and point_cloud_is_novel:
-        data_dict[key].append(data_dict['current_point_cloud_numpy'])
-        data_dict[global_index_key].append(data_dict['current_frame_index'])
+        data_dict[key].append(data_dict['current_point_cloud_numpy'], data_dict['current_frame_index'])
+        data_dict[global_index_key][data_dict['current_frame_index']] = None
     
     gathering_completed = len(data_dict[key]) >= count
     return gathering_completed
@@ -60,7 +201,7 @@ def combine_gathers(data_dict: dict, cfg_dict: dict, key: str, gather_keys: list
     # Check if combining has started
     combining_not_started = key not in data_dict
     if combining_not_started:
-        data_dict[key] = []
+        data_dict[key] = PointCloudGather(capacity=sum(len(data_dict[gather_key].points) if isinstance(data_dict[gather_key], PointCloudGather) else 0 for gather_key in gather_keys))
         logger.log(f'[algo->utils.py->combine_gathers[{key}]]: Combining {len(gather_keys)} gathers', Logger.INFO)
         for gather_key in gather_keys:
             data_dict[key].extend(data_dict[gather_key])
@@ -92,7 +233,7 @@ def skip_frames(data_dict: dict, cfg_dict: dict, key: str, skip: int, global_ind
     if global_index_key is None:
         global_index_key = f'{key}_skipped_frames_indices'
     if global_index_key not in data_dict:
-        data_dict[global_index_key] = []
+        data_dict[global_index_key] = dict() # insertion ordered set of the frame indices
     
     # Check if skipping is completed
     skipping_completed = data_dict[key] >= skip
@@ -102,7 +243,982 @@ def skip_frames(data_dict: dict, cfg_dict: dict, key: str, skip: int, global_ind
     # Skip the frame if skipping is not completed and the point cloud is present and novel
     if not skipping_completed and point_cloud_is_present and point_cloud_is_novel:
         data_dict[key] += 1
-        data_dict[global_index_key].append(data_dict['current_frame_index'])
+        data_dict[global_index_key][data_dict['current_frame_index']] = None
         
     skipping_completed = data_dict[key] >= skip
-    return skipping_completed
\ No newline at end of file
+    return skipping_completed
+
+def get_buffer(data_dict: dict, name: str, shape: tuple, dtype) -> np.ndarray:
+    """
+    Returns a reusable array kept in data_dict across frames, so that per-frame algorithms do not allocate their scratch and output arrays on every call.
+    The buffer grows (with some headroom) when a larger size is requested; the returned array is a view of its first shape[0] rows and its content is undefined.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        name (str): Name of the buffer, unique per algorithm and purpose.
+        shape (tuple): Shape of the requested array.
+        dtype: Data type of the requested array.
+    
+    Returns:
+        np.ndarray: The array, valid until the next call with the same name.
+    """
+    buffers = data_dict.setdefault('reusable_buffers', dict())
+    shape = tuple(shape)
+    buffer = buffers.get(name)
+    if buffer is None or buffer.dtype != np.dtype(dtype) or buffer.shape[1:] != shape[1:] or buffer.shape[0] < shape[0]:
+        capacity = shape[0] if buffer is None else max(shape[0], int(buffer.shape[0] * 1.25))
+        buffer = np.empty((capacity,) + shape[1:], dtype=dtype)
+        buffers[name] = buffer
+    return buffer[:shape[0]]
+
+def get_frame_basename(data_dict: dict, path_keys: list = ['current_image_path', 'current_point_cloud_path', 'current_label_path']) -> str:
+    """
+    Returns the file basename (without extension) of the current frame, used to name the outputs of a frame after its source file.
+    The basename is taken from the first path in path_keys present in data_dict; video frames (`<video>#<frame number>`) are named `<video>_<frame number>`, and frames streamed from sensors (no path) fall back to the zero-padded current_frame_index.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        path_keys (list): Keys of the source file paths in data_dict, in order of preference.
+    
+    Returns:
+        str: The file basename of the current frame.
+    """
+    import os
+    for path_key in path_keys:
+        path = data_dict.get(path_key, None)
+        if path is None: continue
+        path, _, video_frame_number = str(path).partition('#')
+        file_basename = os.path.splitext(os.path.basename(path))[0]
+        return file_basename + '_' + video_frame_number if video_frame_number else file_basename
+    return str(data_dict['current_frame_index']).zfill(6)
+
+def is_bgr_image(cfg_dict: dict) -> bool:
+    """
+    Returns True if current_image_numpy holds BGR frames, i.e. the images are read from disk with data:camera:color_order set to 'bgr', so that consumers of the image colors can swap the channels.
+    
+    Args:
+        cfg_dict (dict): The dictionary containing the configuration.
+    
+    Returns:
+        bool: True if the images are in BGR order, False if they are in RGB order.
+    """
+    camera_cfg = cfg_dict.get('data', {}).get('camera', {})
+    return camera_cfg.get('enabled', False) and str(camera_cfg.get('color_order', 'rgb')).lower() == 'bgr'
+
+def crop_mask(points: np.ndarray, crop_cfg: dict, out: np.ndarray = None, work: np.ndarray = None, bool_work: np.ndarray = None) -> np.ndarray:
+    """
+    Computes which points lie inside a crop region, comparing the xyz columns in place so that no temporary arrays are allocated when out and work are given.
+    
+    Supported crop modes (crop_cfg['mode']):
+        - 'box' (default): axis-aligned box between min_xyz and max_xyz.
+        - 'oriented_box': the same box rotated by crop_cfg['yaw'] radians around its center.
+        - 'cylinder': points with min_range <= sqrt(x^2 + y^2) <= max_range, and z between min_xyz[2] and max_xyz[2].
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        crop_cfg (dict): The crop parameters, e.g. cfg_dict['proc']['lidar']['crop'].
+        out (np.ndarray, optional): Boolean array with shape (N,) to write the mask to.
+        work (np.ndarray, optional): Scratch array with shape (4, N) and the dtype of points, used by the oriented_box and cylinder modes.
+        bool_work (np.ndarray, optional): Boolean scratch array with shape (N,).
+    
+    Returns:
+        np.ndarray: Boolean mask with shape (N,), True for points inside the crop region.
+    """
+    n = points.shape[0]
+    mask = np.empty(n, dtype=bool) if out is None else out
+    mode = crop_cfg.get('mode', 'box')
+    min_xyz, max_xyz = crop_cfg['min_xyz'], crop_cfg['max_xyz']
+    if mode not in ['box', 'oriented_box', 'cylinder']: raise NotImplementedError(f'Crop mode {mode} not supported. Supported crop modes: box, oriented_box, cylinder.')
+    if mode != 'box' and work is None: work = np.empty((4, n), dtype=points.dtype)
+    # the comparison results of each column are accumulated into mask
+    tmp = np.empty(n, dtype=bool) if bool_work is None else bool_work
+
+    def clip(values, low, high, first=False):
+        if first: np.greater_equal(values, low, out=mask)
+        else:
+            np.greater_equal(values, low, out=tmp)
+            np.logical_and(mask, tmp, out=mask)
+        np.less_equal(values, high, out=tmp)
+        np.logical_and(mask, tmp, out=mask)
+    
+    # z range is common to all modes
+    clip(points[:, 2], min_xyz[2], max_xyz[2], first=True)
+    if mode == 'box':
+        clip(points[:, 0], min_xyz[0], max_xyz[0])
+        clip(points[:, 1], min_xyz[1], max_xyz[1])
+    elif mode == 'oriented_box':
+        center_x, center_y = (min_xyz[0] + max_xyz[0]) / 2.0, (min_xyz[1] + max_xyz[1]) / 2.0
+        half_x, half_y = (max_xyz[0] - min_xyz[0]) / 2.0, (max_xyz[1] - min_xyz[1]) / 2.0
+        cos_yaw, sin_yaw = np.cos(crop_cfg.get('yaw', 0.0)), np.sin(crop_cfg.get('yaw', 0.0))
+        dx, dy, local_x, local_y = work
+        np.subtract(points[:, 0], center_x, out=dx)
+        np.subtract(points[:, 1], center_y, out=dy)
+        # rotate to the box frame, local = R(-yaw) @ (p - c)
+        np.multiply(dx, cos_yaw, out=local_x)
+        np.multiply(dy, sin_yaw, out=local_y)
+        local_x += local_y
+        np.multiply(dy, cos_yaw, out=local_y)
+        dx *= sin_yaw
+        local_y -= dx
+        clip(local_x, -half_x, half_x)
+        clip(local_y, -half_y, half_y)
+    else:
+        range_squared, y_squared = work[0], work[1]
+        np.multiply(points[:, 0], points[:, 0], out=range_squared)
+        np.multiply(points[:, 1], points[:, 1], out=y_squared)
+        range_squared += y_squared
+        clip(range_squared, crop_cfg.get('min_range', 0.0) ** 2, crop_cfg['max_range'] ** 2)
+    return mask
+
+
+def project_points(points: np.ndarray, Tr_velo_to_pixel: np.ndarray, image_shape: tuple, out_pixels: np.ndarray = None, out_depths: np.ndarray = None, out_valid: np.ndarray = None, work: np.ndarray = None, bool_work: np.ndarray = None):
+    """
+    Projects lidar points to image pixels in float32 with a precomposed 3x4 matrix (e.g. calib_data['Tr_velo_to_pixel_f32']), working on the xyz columns directly instead of building homogeneous coordinates.
+    When the output and work arrays are given (see `get_buffer`), no N-sized temporaries are allocated.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        Tr_velo_to_pixel (np.ndarray): Projection matrix with shape (3, 4).
+        image_shape (tuple): Shape of the image, (height, width, ...).
+        out_pixels (np.ndarray, optional): int32 array with shape (N, 2) for the (column, row) pixel coordinates.
+        out_depths (np.ndarray, optional): float32 array with shape (N,) for the depths along the optical axis.
+        out_valid (np.ndarray, optional): bool array with shape (N,) for the validity mask.
+        work (np.ndarray, optional): float32 scratch array with shape (3, N).
+        bool_work (np.ndarray, optional): bool scratch array with shape (N,).
+    
+    Returns:
+        tuple: (pixels, depths, valid), valid is True for points in front of the camera that fall inside the image; pixels of invalid points are set to 0.
+    """
+    n = points.shape[0]
+    pixels = np.empty((n, 2), dtype=np.int32) if out_pixels is None else out_pixels
+    depths = np.empty(n, dtype=np.float32) if out_depths is None else out_depths
+    valid = np.empty(n, dtype=bool) if out_valid is None else out_valid
+    work = np.empty((3, n), dtype=np.float32) if work is None else work
+    tmp = np.empty(n, dtype=bool) if bool_work is None else bool_work
+    Tr_velo_to_pixel = np.asarray(Tr_velo_to_pixel, dtype=np.float32)
+    
+    # homogeneous pixel coordinates, M[:, :3] @ xyz + M[:, 3], laid out as contiguous rows
+    np.matmul(Tr_velo_to_pixel[:, :3], points[:, :3].T, out=work)
+    work += Tr_velo_to_pixel[:, 3:4]
+    u, v, w = work
+    np.copyto(depths, w)
+    
+    # points in front of the camera, normalized by their depth
+    np.greater(w, 0, out=valid)
+    # clamping avoids a masked division, the clamped points are invalid anyway
+    np.maximum(w, 1e-6, out=w)
+    np.reciprocal(w, out=w)
+    u *= w
+    v *= w
+    # points inside the image boundaries
+    for coords, size in ((u, image_shape[1]), (v, image_shape[0])):
+        np.greater_equal(coords, 0, out=tmp)
+        valid &= tmp
+        np.less(coords, size, out=tmp)
+        valid &= tmp
+    
+    # zero the invalid coordinates so that the cast is well-defined
+    u *= valid
+    v *= valid
+    np.copyto(pixels[:, 0], u, casting='unsafe')
+    np.copyto(pixels[:, 1], v, casting='unsafe')
+    return pixels, depths, valid
+
+def project_points_with_buffers(data_dict: dict, points: np.ndarray, Tr_velo_to_pixel: np.ndarray, image_shape: tuple):
+    """
+    Calls `project_points` with output and work arrays reused across frames (see `get_buffer`), the results are only valid until the next call.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        points (np.ndarray): Points with shape (N, >=3).
+        Tr_velo_to_pixel (np.ndarray): Projection matrix with shape (3, 4).
+        image_shape (tuple): Shape of the image, (height, width, ...).
+    
+    Returns:
+        tuple: (pixels, depths, valid), see `project_points`.
+    """
+    n = points.shape[0]
+    return project_points(points, Tr_velo_to_pixel, image_shape,
+                          out_pixels=get_buffer(data_dict, 'projection_pixels', (n, 2), np.int32),
+                          out_depths=get_buffer(data_dict, 'projection_depths', (n,), np.float32),
+                          out_valid=get_buffer(data_dict, 'projection_valid', (n,), bool),
+                          work=get_buffer(data_dict, 'projection_work', (3 * n,), np.float32).reshape(3, n),
+                          bool_work=get_buffer(data_dict, 'projection_bool_work', (n,), bool))
+
+def voxel_downsample(points: np.ndarray, voxel_size, mode: str = 'centroid'):
+    """
+    Downsamples a point cloud to one point per occupied voxel. The voxel coordinates are packed into 64-bit keys (21 bits per axis) and grouped with a single sort, then aggregated per voxel without python loops.
+    
+    Supported aggregation modes:
+        - 'centroid' (default): mean of xyz and intensity (columns 0-3) of the points in the voxel, the other columns (e.g. time, sensor_id) are taken from the first point in the voxel.
+        - 'first': the first point (in point cloud order) in the voxel.
+        - 'max_intensity': the point with the highest intensity (column 3) in the voxel.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3), or (N, >=4) for the max_intensity mode.
+        voxel_size (float or list): Voxel side length, or side lengths along x, y, and z.
+        mode (str): Aggregation mode.
+    
+    Returns:
+        tuple: (voxel_points, point_voxel_ids, voxel_point_indices), where voxel_points (V, C) are the downsampled points sorted by voxel key, point_voxel_ids (N,) int64 maps each input point to its voxel (so voxel values can be propagated back with values[point_voxel_ids]), and voxel_point_indices (V,) int64 are the indices of the first (or max-intensity) point of each voxel.
+    """
+    if mode not in ['centroid', 'first', 'max_intensity']: raise NotImplementedError(f'Voxel downsample mode {mode} not supported. Supported modes: centroid, first, max_intensity.')
+    n = points.shape[0]
+    if n == 0: return points[:0].copy(), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    
+    # quantize and pack the voxel coordinates, offset to be non-negative, into one key per point
+    coords = np.floor(points[:, :3] / np.asarray(voxel_size, dtype=points.dtype)).astype(np.int64)
+    coords -= coords.min(axis=0)
+    if coords.max() >= 1 << 21: raise ValueError(f'The point cloud spans more than {1 << 21} voxels along an axis, increase voxel_size.')
+    keys = (coords[:, 0] << 42) | (coords[:, 1] << 21) | coords[:, 2]
+    
+    # group the points by voxel, the first point of each group is the representative of the voxel
+    if mode == 'max_intensity': order = np.lexsort((-points[:, 3], keys))
+    else: order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    is_start = np.empty(n, dtype=bool)
+    is_start[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    point_voxel_ids = np.empty(n, dtype=np.int64)
+    point_voxel_ids[order] = np.cumsum(is_start) - 1
+    voxel_point_indices = order[starts]
+    
+    # aggregate
+    if mode == 'centroid':
+        # averaging ids or timestamps makes no sense, only xyz and intensity are averaged
+        voxel_points = points[voxel_point_indices]
+        num_mean_columns = min(points.shape[1], 4)
+        counts = np.diff(np.append(starts, n))
+        voxel_points[:, :num_mean_columns] = np.add.reduceat(points[order, :num_mean_columns], starts, axis=0, dtype=np.float64) / counts[:, None]
+    else: voxel_points = points[voxel_point_indices]
+    return voxel_points, point_voxel_ids, voxel_point_indices
+
+def ground_mask_polar(points: np.ndarray, sensor_height: float = 1.73, height_threshold: float = 0.2, max_range: float = 80.0, num_sectors: int = 360, bin_size: float = 1.0, max_slope: float = 0.15) -> np.ndarray:
+    """
+    Segments the ground with a polar-grid slope method. The points are binned into angular sectors and range bins, the lowest point of each cell is found in one pass, and the ground height is tracked outwards from the sensor along all sectors at once: a cell continues the ground if its lowest point is within the allowed slope of the last ground cell of its sector, otherwise (e.g. under a car) the ground height of the sector is carried over.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3) in sensor coordinates, z up.
+        sensor_height (float): Height of the sensor above the ground, the ground starts at z = -sensor_height.
+        height_threshold (float): Maximum height of a ground point above the ground height of its cell, half of it is tolerated as noise in the ground step between cells.
+        max_range (float): Points farther than max_range (in xy) are not ground.
+        num_sectors (int): Number of angular sectors.
+        bin_size (float): Length of the range bins in meters.
+        max_slope (float): Maximum ground slope (rise over run) between cells.
+    
+    Returns:
+        np.ndarray: Boolean mask with shape (N,), True for ground points.
+    """
+    num_bins = int(np.ceil(max_range / bin_size))
+    num_cells = num_sectors * num_bins
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    
+    # polar cell of each point, points out of range go to an extra cell that is never ground
+    sectors = np.arctan2(y, x)
+    sectors += np.pi
+    sectors *= num_sectors / (2.0 * np.pi)
+    sectors = np.minimum(sectors.astype(np.int64), num_sectors - 1)
+    bins = np.hypot(x, y)
+    bins *= 1.0 / bin_size
+    bins = bins.astype(np.int64)
+    cells = sectors * num_bins + bins
+    cells[bins >= num_bins] = num_cells
+    
+    # lowest point of each cell
+    min_z = np.full(num_cells + 1, np.inf, dtype=np.float32)
+    np.minimum.at(min_z, cells, z)
+    min_z = min_z[:num_cells].reshape(num_sectors, num_bins)
+    
+    # track the ground height outwards, all the sectors at once
+    ground_z = np.empty((num_sectors, num_bins + 1), dtype=np.float32)
+    ground_z[:, num_bins] = -np.inf
+    ground = np.full(num_sectors, -sensor_height, dtype=np.float32)
+    ground_range = np.zeros(num_sectors, dtype=np.float32)
+    for b in range(num_bins):
+        cell_z = min_z[:, b]
+        cell_range = (b + 0.5) * bin_size
+        is_ground = np.abs(cell_z - ground) <= max_slope * (cell_range - ground_range) + height_threshold / 2.0
+        ground = np.where(is_ground, cell_z, ground)
+        ground_range = np.where(is_ground, cell_range, ground_range)
+        ground_z[:, b] = ground
+    
+    # points close above the ground height of their cell are ground
+    point_ground_z = ground_z[:, :num_bins].ravel()
+    point_ground_z = np.append(point_ground_z, -np.inf)[cells]
+    point_ground_z += height_threshold
+    return z <= point_ground_z
+
+def ground_mask_ransac(points: np.ndarray, height_threshold: float = 0.2, num_iterations: int = 100, max_angle: float = 15.0, num_samples: int = 2048, seed: int = None):
+    """
+    Segments the ground with a batched RANSAC plane fit. All the candidate planes are sampled at once and scored together against a random subset of the points, then the best plane is refined by a least-squares fit to its inliers in the whole point cloud.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3) in sensor coordinates, z up.
+        height_threshold (float): Maximum distance of a ground point from the plane.
+        num_iterations (int): Number of candidate planes.
+        max_angle (float): Maximum angle between the plane normal and the z-axis in degrees.
+        num_samples (int): Number of points the candidate planes are scored against.
+        seed (int, optional): Seed of the random sampling.
+    
+    Returns:
+        tuple: (mask, plane), where mask (N,) is True for ground points and plane (4,) holds the coefficients a, b, c, d of ax + by + cz + d = 0 with a unit normal pointing up, or None if no plane was found.
+    """
+    n = points.shape[0]
+    if n < 3: return np.zeros(n, dtype=bool), None
+    rng = np.random.default_rng(seed)
+    xyz = points[:, :3].astype(np.float32, copy=False)
+    samples = xyz[rng.integers(0, n, num_samples)]
+    
+    # candidate planes through random triplets of the samples
+    triplets = samples[rng.integers(0, samples.shape[0], (num_iterations, 3))]
+    normals = np.cross(triplets[:, 1] - triplets[:, 0], triplets[:, 2] - triplets[:, 0])
+    norms = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(norms, 1e-9)[:, None]
+    normals *= np.where(normals[:, 2] < 0, -1.0, 1.0).astype(np.float32)[:, None]
+    offsets = -np.einsum('ij,ij->i', normals, triplets[:, 0])
+    is_candidate = (norms > 1e-6) & (normals[:, 2] >= np.cos(np.deg2rad(max_angle)))
+    if not np.any(is_candidate): return np.zeros(n, dtype=bool), None
+    
+    # score all the candidates at once, (samples, candidates) distances
+    distances = np.abs(samples @ normals[is_candidate].T + offsets[is_candidate])
+    best = np.argmax(np.count_nonzero(distances <= height_threshold, axis=0))
+    normal, offset = normals[is_candidate][best], offsets[is_candidate][best]
+    
+    # refine with a least-squares fit to (an evenly strided subset of at most 16 * num_samples of) the inliers in the whole point cloud
+    inlier_indices = np.flatnonzero(np.abs(xyz @ normal + offset) <= height_threshold)
+    inliers = xyz[inlier_indices[::max(1, inlier_indices.shape[0] // (16 * num_samples))]]
+    if inliers.shape[0] >= 3:
+        centroid = np.ones(inliers.shape[0], dtype=np.float32) @ inliers / inliers.shape[0] # a matrix product is much faster than mean(axis=0) here
+        centered = inliers - centroid
+        _, eigenvectors = np.linalg.eigh((centered.T @ centered).astype(np.float64))
+        refined = eigenvectors[:, 0] if eigenvectors[2, 0] >= 0 else -eigenvectors[:, 0]
+        if refined[2] >= np.cos(np.deg2rad(max_angle)): normal, offset = refined.astype(np.float32), np.float32(-refined @ centroid.astype(np.float64))
+    mask = np.abs(xyz @ normal + offset) <= height_threshold
+    return mask, np.append(normal, offset).astype(np.float64)
+
+def cluster_points(points: np.ndarray, tolerance: float, min_points: int = 1, method: str = 'grid', min_samples: int = 1) -> np.ndarray:
+    """
+    Clusters points by Euclidean proximity, with a cost close to linear in the number of points.
+    
+    Supported methods:
+        - 'grid' (default): connected components of the occupied voxels of side tolerance and their 26 neighbours, found with a vectorized union-find. Points closer than tolerance always share a cluster; points up to 2 * sqrt(3) * tolerance apart may be joined.
+        - 'dbscan': exact DBSCAN with eps = tolerance and min_samples, from the `dbscan` package.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        tolerance (float): Neighbour distance (voxel side length for the grid method).
+        min_points (int): Clusters with fewer points are discarded.
+        method (str): Clustering method.
+        min_samples (int): dbscan only, minimum number of neighbours of a core point.
+    
+    Returns:
+        np.ndarray: Cluster id of each point with shape (N,) int64, numbered from 0 in order of the first point of each cluster, -1 for discarded points.
+    """
+    n = points.shape[0]
+    if n == 0: return np.zeros(0, dtype=np.int64)
+    if method == 'dbscan':
+        from dbscan import DBSCAN
+        point_labels = DBSCAN(np.ascontiguousarray(points[:, :3], dtype=np.float64), eps=tolerance, min_samples=min_samples)[0].astype(np.int64)
+    elif method == 'grid':
+        # occupied voxels sorted by their packed keys, the voxel coordinates are offset by one so that the neighbours of the border voxels have non-negative coordinates too
+        _, point_voxel_ids, voxel_point_indices = voxel_downsample(points[:, :3], tolerance, 'first')
+        coords = np.floor(points[voxel_point_indices, :3] / np.asarray(tolerance, dtype=points.dtype)).astype(np.int64)
+        coords -= coords.min(axis=0) - 1
+        pack = lambda coords: (coords[:, 0] << 42) | (coords[:, 1] << 21) | coords[:, 2]
+        keys = pack(coords)
+        num_voxels = keys.shape[0]
+        
+        # edges to the occupied neighbours, half of the 26 neighbourhood is enough as edges are undirected
+        offsets = np.array([(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)], dtype=np.int64)
+        edges_from, edges_to = [], []
+        for offset in offsets:
+            neighbour_keys = pack(coords + offset)
+            positions = np.minimum(np.searchsorted(keys, neighbour_keys), num_voxels - 1)
+            found = np.flatnonzero(keys[positions] == neighbour_keys)
+            edges_from.append(found)
+            edges_to.append(positions[found])
+        edges_from, edges_to = np.concatenate(edges_from), np.concatenate(edges_to)
+        
+        # union-find: hook the roots of both ends of every edge to the smaller one, then compress the paths, until all the edges are within a component
+        roots = np.arange(num_voxels, dtype=np.int64)
+        while True:
+            roots_from, roots_to = roots[edges_from], roots[edges_to]
+            if np.array_equal(roots_from, roots_to): break
+            smaller = np.minimum(roots_from, roots_to)
+            np.minimum.at(roots, roots_from, smaller)
+            np.minimum.at(roots, roots_to, smaller)
+            while True:
+                compressed = roots[roots]
+                if np.array_equal(compressed, roots): break
+                roots = compressed
+        point_labels = roots[point_voxel_ids]
+    else: raise NotImplementedError(f'Clustering method {method} not supported. Supported methods: grid, dbscan.')
+    
+    # renumber the clusters by their first point and discard the small ones
+    is_clustered = point_labels >= 0
+    unique_labels, first_indices, inverse, counts = np.unique(point_labels[is_clustered], return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first_indices, kind='stable')
+    keep = counts[order] >= min_points
+    new_ids = np.full(unique_labels.shape[0], -1, dtype=np.int64)
+    new_ids[order[keep]] = np.arange(np.count_nonzero(keep))
+    point_cluster_ids = np.full(n, -1, dtype=np.int64)
+    point_cluster_ids[is_clustered] = new_ids[inverse]
+    return point_cluster_ids
+
+def fit_cluster_bboxes(points: np.ndarray, point_cluster_ids: np.ndarray, num_clusters: int):
+    """
+    Fits an oriented (around z) bounding box to each cluster at once. The yaw is the principal axis of the bird's-eye-view covariance of the cluster, and the box spans the extreme points along it.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        point_cluster_ids (np.ndarray): Cluster id of each point with shape (N,), -1 for points in no cluster.
+        num_clusters (int): Number of clusters.
+    
+    Returns:
+        tuple: (centers, extents, yaws) with shapes (K, 3), (K, 3), and (K,), float32.
+    """
+    is_clustered = point_cluster_ids >= 0
+    ids = point_cluster_ids[is_clustered]
+    xyz = points[is_clustered, :3].astype(np.float64)
+    
+    # bird's-eye-view covariance of each cluster from per-cluster sums
+    counts = np.maximum(np.bincount(ids, minlength=num_clusters), 1)
+    mean_x = np.bincount(ids, weights=xyz[:, 0], minlength=num_clusters) / counts
+    mean_y = np.bincount(ids, weights=xyz[:, 1], minlength=num_clusters) / counts
+    dx, dy = xyz[:, 0] - mean_x[ids], xyz[:, 1] - mean_y[ids]
+    cov_xx = np.bincount(ids, weights=dx * dx, minlength=num_clusters)
+    cov_xy = np.bincount(ids, weights=dx * dy, minlength=num_clusters)
+    cov_yy = np.bincount(ids, weights=dy * dy, minlength=num_clusters)
+    yaws = 0.5 * np.arctan2(2.0 * cov_xy, cov_xx - cov_yy)
+    
+    # extreme points in the rotated frames
+    cos_yaw, sin_yaw = np.cos(yaws)[ids], np.sin(yaws)[ids]
+    local = np.stack([dx * cos_yaw + dy * sin_yaw, -dx * sin_yaw + dy * cos_yaw, xyz[:, 2]], axis=1)
+    local_min = np.full((num_clusters, 3), np.inf)
+    local_max = np.full((num_clusters, 3), -np.inf)
+    for axis in range(3): # one dimensional ufunc.at is much faster than two dimensional
+        np.minimum.at(local_min[:, axis], ids, local[:, axis])
+        np.maximum.at(local_max[:, axis], ids, local[:, axis])
+    local_center = (local_min + local_max) / 2.0
+    cos_yaw, sin_yaw = np.cos(yaws), np.sin(yaws)
+    centers = np.stack([mean_x + local_center[:, 0] * cos_yaw - local_center[:, 1] * sin_yaw, mean_y + local_center[:, 0] * sin_yaw + local_center[:, 1] * cos_yaw, local_center[:, 2]], axis=1)
+    return centers.astype(np.float32), (local_max - local_min).astype(np.float32), yaws.astype(np.float32)
+
+def get_voxel_grid_indices(points: np.ndarray, min_xyz, voxel_size, grid_shape) -> np.ndarray:
+    """
+    Returns the flat index of the voxel of each point in a dense voxel grid, in O(N).
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        min_xyz (list): Minimum corner of the grid.
+        voxel_size (float or list): Voxel side length, or side lengths along x, y, and z.
+        grid_shape (tuple): Number of voxels along x, y, and z.
+    
+    Returns:
+        np.ndarray: Flat voxel indices with shape (N,) int64, -1 for points outside the grid.
+    """
+    voxel_size = np.broadcast_to(np.asarray(voxel_size, dtype=np.float64), (3,))
+    indices = np.zeros(points.shape[0], dtype=np.int64)
+    in_grid = np.ones(points.shape[0], dtype=bool)
+    for axis in range(3):
+        coords = np.floor((points[:, axis] - min_xyz[axis]) / voxel_size[axis]).astype(np.int64)
+        in_grid &= (coords >= 0) & (coords < grid_shape[axis])
+        indices *= grid_shape[axis]
+        indices += coords
+    indices[~in_grid] = -1
+    return indices
+
+def update_voxel_map(map_points: np.ndarray, points: np.ndarray, voxel_size: float, center, max_range: float) -> np.ndarray:
+    """
+    Inserts points into a voxelized map keeping at most one point per voxel, the existing map points win over the new ones. Memory is bounded by dropping the map points farther than max_range (in xy) from center.
+    
+    Args:
+        map_points (np.ndarray): Map points with shape (M, C), or None for an empty map.
+        points (np.ndarray): New points with shape (N, C) in the map frame.
+        voxel_size (float): Voxel side length of the map.
+        center (list): Center (x, y, ...) of the region kept in the map, e.g. the current sensor position.
+        max_range (float): Radius of the region kept in the map.
+    
+    Returns:
+        np.ndarray: The updated map points with shape (M', C).
+    """
+    if map_points is not None and map_points.shape[0] > 0: points = np.concatenate([map_points, points])
+    in_range = np.hypot(points[:, 0] - center[0], points[:, 1] - center[1]) <= max_range
+    return voxel_downsample(points[in_range], voxel_size, 'first')[0]
+
+def estimate_normals(points: np.ndarray, voxel_size: float, min_points: int = 5):
+    """
+    Estimates the surface normal of each point from the covariance of the points in its voxel, for all the voxels at once. Much faster than per-point neighbour searches, at the cost of one normal per voxel.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        voxel_size (float): Side length of the voxels the covariances are computed in, a few times the point spacing.
+        min_points (int): Voxels with fewer points have no normal.
+    
+    Returns:
+        tuple: (normals, valid), where normals (N, 3) float32 are unit normals (the eigenvector of the smallest covariance eigenvalue, orientation is arbitrary) and valid (N,) is False for the points whose voxel has fewer than min_points points.
+    """
+    _, point_voxel_ids, voxel_point_indices = voxel_downsample(points[:, :3], voxel_size, 'first')
+    num_voxels = voxel_point_indices.shape[0]
+    counts = np.bincount(point_voxel_ids, minlength=num_voxels)
+    
+    # per-voxel covariance from the centered points, one bincount per entry
+    means = np.stack([np.bincount(point_voxel_ids, weights=points[:, axis], minlength=num_voxels) for axis in range(3)], axis=1) / np.maximum(counts, 1)[:, None]
+    centered = points[:, :3] - means[point_voxel_ids]
+    covariances = np.empty((num_voxels, 3, 3))
+    for i, j in [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]:
+        covariances[:, i, j] = covariances[:, j, i] = np.bincount(point_voxel_ids, weights=centered[:, i] * centered[:, j], minlength=num_voxels)
+    
+    # the normal is the direction of least variance
+    voxel_normals = np.linalg.eigh(covariances)[1][:, :, 0].astype(np.float32)
+    return voxel_normals[point_voxel_ids], (counts >= min_points)[point_voxel_ids]
+
+def linear_assignment(cost: np.ndarray):
+    """
+    Solves the assignment problem of a cost matrix, pairs with infinite cost are never assigned. Uses the Hungarian algorithm of scipy if it is installed, otherwise a greedy assignment in order of increasing cost.
+    
+    Args:
+        cost (np.ndarray): Cost matrix with shape (R, C), np.inf for forbidden pairs.
+    
+    Returns:
+        tuple: (rows, cols), int64 arrays of the assigned pairs.
+    """
+    if cost.size == 0: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    finite = np.isfinite(cost)
+    try:
+        from scipy.optimize import linear_sum_assignment
+        # forbidden pairs get a cost higher than any assignment of allowed pairs, and are removed afterwards
+        large = (np.abs(cost[finite]).sum() + 1.0) if np.any(finite) else 1.0
+        rows, cols = linear_sum_assignment(np.where(finite, cost, large))
+    except ImportError:
+        rows, cols = np.nonzero(finite)
+        order = np.argsort(cost[rows, cols], kind='stable')
+        used_rows, used_cols = np.zeros(cost.shape[0], dtype=bool), np.zeros(cost.shape[1], dtype=bool)
+        keep = []
+        for i in order.tolist():
+            if used_rows[rows[i]] or used_cols[cols[i]]: continue
+            used_rows[rows[i]] = used_cols[cols[i]] = True
+            keep.append(i)
+        rows, cols = rows[keep], cols[keep]
+    assigned = finite[rows, cols]
+    return rows[assigned].astype(np.int64), cols[assigned].astype(np.int64)
+
+def get_bev_aabb_iou_matrix(centers_a: np.ndarray, extents_a: np.ndarray, yaws_a: np.ndarray, centers_b: np.ndarray, extents_b: np.ndarray, yaws_b: np.ndarray) -> np.ndarray:
+    """
+    Computes the bird's-eye-view IoU of the axis-aligned enclosing rectangles of all the pairs of two sets of boxes at once. This is not the IoU of the rotated boxes: it is exact for axis-aligned boxes only, and a fast proxy for association otherwise.
+    
+    Args:
+        centers_a (np.ndarray): Centers of the first boxes with shape (A, >=2).
+        extents_a (np.ndarray): Extents of the first boxes with shape (A, >=2).
+        yaws_a (np.ndarray): Yaws of the first boxes with shape (A,).
+        centers_b (np.ndarray): Centers of the second boxes with shape (B, >=2).
+        extents_b (np.ndarray): Extents of the second boxes with shape (B, >=2).
+        yaws_b (np.ndarray): Yaws of the second boxes with shape (B,).
+    
+    Returns:
+        np.ndarray: Axis-aligned IoU matrix with shape (A, B).
+    """
+    def get_rectangles(centers, extents, yaws):
+        cos_yaw, sin_yaw = np.abs(np.cos(yaws)), np.abs(np.sin(yaws))
+        half_x = (extents[:, 0] * cos_yaw + extents[:, 1] * sin_yaw) / 2.0
+        half_y = (extents[:, 0] * sin_yaw + extents[:, 1] * cos_yaw) / 2.0
+        return centers[:, 0] - half_x, centers[:, 1] - half_y, centers[:, 0] + half_x, centers[:, 1] + half_y
+    min_x_a, min_y_a, max_x_a, max_y_a = get_rectangles(centers_a, extents_a, yaws_a)
+    min_x_b, min_y_b, max_x_b, max_y_b = get_rectangles(centers_b, extents_b, yaws_b)
+    overlap_x = np.clip(np.minimum(max_x_a[:, None], max_x_b[None, :]) - np.maximum(min_x_a[:, None], min_x_b[None, :]), 0, None)
+    overlap_y = np.clip(np.minimum(max_y_a[:, None], max_y_b[None, :]) - np.maximum(min_y_a[:, None], min_y_b[None, :]), 0, None)
+    intersection = overlap_x * overlap_y
+    area_a = (max_x_a - min_x_a) * (max_y_a - min_y_a)
+    area_b = (max_x_b - min_x_b) * (max_y_b - min_y_b)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+def spherical_projection(points: np.ndarray, height: int, width: int, fov_up: float, fov_down: float, min_range: float = 0.1):
+    """
+    Projects points to an organized spherical range image (rows are elevation, columns are azimuth), keeping the nearest point for each pixel (z-buffer).
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3).
+        height (int): Number of rows (laser beams).
+        width (int): Number of columns (azimuth steps per revolution).
+        fov_up (float): Elevation of the top row in degrees.
+        fov_down (float): Elevation of the bottom row in degrees.
+        min_range (float): Points closer than this are not projected.
+    
+    Returns:
+        tuple: Range image with shape (height, width) float32 (0 where no point projects), index image with shape (height, width) int64 mapping each pixel to its point (-1 where no point projects), and pixel rows and columns of each point with shape (N,) int64 (-1 for points that are not projected).
+    """
+    ranges = np.linalg.norm(points[:, :3], axis=1)
+    valid = ranges >= min_range
+    fov_up, fov_down = np.radians(fov_up), np.radians(fov_down)
+    
+    # rows from elevation, columns from azimuth (x-axis at the center column, counter-clockwise to the left)
+    elevation = np.arcsin(np.divide(points[:, 2], ranges, out=np.zeros_like(ranges), where=valid))
+    rows = np.floor((fov_up - elevation) / (fov_up - fov_down) * height).astype(np.int64)
+    cols = np.floor((0.5 - np.arctan2(points[:, 1], points[:, 0]) / (2.0 * np.pi)) * width).astype(np.int64)
+    np.clip(rows, 0, height - 1, out=rows)
+    cols %= width
+    rows[~valid] = -1
+    cols[~valid] = -1
+    
+    # z-buffer: sort by pixel then by range, the first point of each pixel is the nearest one
+    point_indices = np.flatnonzero(valid)
+    flat_pixels = rows[point_indices] * width + cols[point_indices]
+    order = np.lexsort((ranges[point_indices], flat_pixels))
+    flat_pixels, point_indices = flat_pixels[order], point_indices[order]
+    nearest = np.ones(flat_pixels.shape[0], dtype=bool)
+    nearest[1:] = flat_pixels[1:] != flat_pixels[:-1]
+    
+    range_image = np.zeros(height * width, dtype=np.float32)
+    range_image[flat_pixels[nearest]] = ranges[point_indices[nearest]]
+    index_image = np.full(height * width, -1, dtype=np.int64)
+    index_image[flat_pixels[nearest]] = point_indices[nearest]
+    return range_image.reshape(height, width), index_image.reshape(height, width), rows, cols
+
+def get_range_image_neighbors(index_image: np.ndarray, rows: np.ndarray, cols: np.ndarray, kernel_size: int = 3) -> np.ndarray:
+    """
+    Returns the points in the kernel_size x kernel_size pixel window around each given pixel of an organized range image in O(1) per pixel, wrapping around horizontally (azimuth).
+    
+    Args:
+        index_image (np.ndarray): Index image with shape (H, W) int64, -1 where there is no point.
+        rows (np.ndarray): Pixel rows with shape (N,) int64.
+        cols (np.ndarray): Pixel columns with shape (N,) int64.
+        kernel_size (int): Odd side length of the window.
+    
+    Returns:
+        np.ndarray: Neighbor point indices with shape (N, kernel_size * kernel_size) int64, -1 for empty pixels or pixels outside the image.
+    """
+    height, width = index_image.shape
+    offsets = np.arange(kernel_size) - kernel_size // 2
+    neighbor_rows = (rows[:, None, None] + offsets[None, :, None]).repeat(kernel_size, axis=2).reshape(-1, kernel_size * kernel_size)
+    neighbor_cols = ((cols[:, None, None] + offsets[None, None, :]) % width).repeat(kernel_size, axis=1).reshape(-1, kernel_size * kernel_size)
+    in_image = (neighbor_rows >= 0) & (neighbor_rows < height)
+    neighbors = index_image[np.clip(neighbor_rows, 0, height - 1), neighbor_cols]
+    neighbors[~in_image] = -1
+    return neighbors
+
+bev_grid_names = ['occupancy', 'max_height', 'min_height', 'intensity', 'density']
+
+def select_range_image_points(data_dict: dict, num_points: int, indices: np.ndarray):
+    """
+    Keeps the range image of create_range_image (current_range_image, current_range_index_image, and current_point_cloud_pixels) consistent with the point cloud when a process keeps only some of its points, e.g. crop or remove_background.
+    The pixels of the removed points become empty; nothing is done if data_dict has no range image of the point cloud.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        num_points (int): Number of points before the removal.
+        indices (np.ndarray): Indices of the kept points, in their order in the new point cloud.
+    """
+    pixels = data_dict.get('current_point_cloud_pixels', None)
+    if pixels is None or len(pixels) != num_points: return
+    # map the old point indices to the new ones, the extra last entry maps the empty pixels (-1) to -1
+    old_to_new = np.full(num_points + 1, -1, dtype=np.int64)
+    old_to_new[indices] = np.arange(len(indices))
+    index_image = old_to_new[data_dict['current_range_index_image']]
+    data_dict['current_range_index_image'] = index_image
+    data_dict['current_range_image'] = np.where(index_image >= 0, data_dict['current_range_image'], 0).astype(data_dict['current_range_image'].dtype)
+    data_dict['current_point_cloud_pixels'] = pixels[indices]
+
+def rasterize_bev(points: np.ndarray, min_xyz, max_xyz, cell_size: float, grids: list = bev_grid_names, density_normalization: float = 64.0, out: np.ndarray = None) -> np.ndarray:
+    """
+    Rasterizes points into bird's-eye-view grids at once, with bincount and ufunc.at on the flat cell ids of the points.
+    The grids are occupancy (1 for cells with points), max_height and min_height (above min_xyz[2]), intensity (mean), and density (min(1, log(1 + count) / log(density_normalization))); empty cells are 0 in all the grids.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=4), the fourth column is the intensity.
+        min_xyz (list): Minimum corner of the rasterized region, points outside the region are left out.
+        max_xyz (list): Maximum corner of the rasterized region.
+        cell_size (float): Side length of the grid cells.
+        grids (list): Names of the grids to rasterize, in the order they are stacked.
+        density_normalization (float): Number of points at which the density saturates to 1.
+        out (np.ndarray): Optional float32 array with shape (len(grids), X, Y) to write the grids into (see `get_buffer`).
+    
+    Returns:
+        np.ndarray: Grids with shape (len(grids), X, Y) float32, the first grid axis is along x and the second along y.
+    """
+    grid_shape = tuple(int(np.ceil((max_xyz[axis] - min_xyz[axis]) / cell_size)) for axis in range(2))
+    num_cells = grid_shape[0] * grid_shape[1]
+    if out is None: out = np.empty((len(grids),) + grid_shape, dtype=np.float32)
+    out_flat = out.reshape(len(grids), num_cells)
+    
+    # flat cell id of each point in the region
+    cells = get_voxel_grid_indices(points, min_xyz, [cell_size, cell_size, max_xyz[2] - min_xyz[2]], grid_shape + (1,))
+    in_region = cells >= 0
+    cells = cells[in_region]
+    heights = points[in_region, 2].astype(np.float32) - np.float32(min_xyz[2])
+    counts = np.bincount(cells, minlength=num_cells)
+    occupied = counts > 0
+    
+    for grid, grid_name in zip(out_flat, grids):
+        if grid_name == 'occupancy': grid[:] = occupied
+        elif grid_name == 'max_height':
+            grid.fill(0)
+            np.maximum.at(grid, cells, heights)
+        elif grid_name == 'min_height':
+            grid.fill(np.inf)
+            np.minimum.at(grid, cells, heights)
+            grid[~occupied] = 0
+        elif grid_name == 'intensity':
+            grid.fill(0)
+            np.divide(np.bincount(cells, weights=points[in_region, 3], minlength=num_cells), counts, out=grid, where=occupied, casting='unsafe')
+        elif grid_name == 'density': np.minimum(1.0, np.log1p(counts) / np.log(density_normalization), out=grid, casting='unsafe')
+        else: raise ValueError(f'grid {grid_name} not supported, supported grids: {", ".join(bev_grid_names)}')
+    return out
+
+class SpatialIndex:
+    """
+    Spatial queries on the points of a point cloud, with a KD-tree and voxel hashes that are built lazily on the first query and reused by the later ones.
+    The KD-tree is the cKDTree of scipy if it is installed (vectorized queries on all the cpu cores), otherwise the KDTreeFlann of open3d (one query at a time).
+    Use `get_spatial_index` to share the index of the current point cloud across algorithms.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3), kept by reference and must not be modified.
+    
+    Usage:
+        index = get_spatial_index(data_dict)
+        distances, indices = index.query_knn(points[:, :3], k=8)
+        counts = index.count_radius(points[:, :3], radius=0.5)
+        voxel_ids = index.query_voxels(points[:, :3], voxel_size=0.5)
+    """
+    def __init__(self, points: np.ndarray):
+        self.source = points
+        self.points = np.ascontiguousarray(points[:, :3], dtype=np.float64)
+        self.__kdtree__ = None
+        self.__voxel_hashes__ = dict()
+    
+    def __len__(self) -> int:
+        return self.points.shape[0]
+    
+    @property
+    def kdtree(self):
+        """
+        The KD-tree of the points, scipy.spatial.cKDTree or open3d.geometry.KDTreeFlann.
+        """
+        if self.__kdtree__ is None:
+            try:
+                from scipy.spatial import cKDTree
+                self.__kdtree__ = cKDTree(self.points)
+            except ImportError:
+                import open3d as o3d
+                self.__kdtree__ = o3d.geometry.KDTreeFlann(o3d.geometry.PointCloud(o3d.utility.Vector3dVector(self.points)))
+        return self.__kdtree__
+    
+    def query_knn(self, queries: np.ndarray, k: int):
+        """
+        Finds the k nearest points of each query.
+        
+        Args:
+            queries (np.ndarray): Query points with shape (M, 3).
+            k (int): Number of neighbors.
+        
+        Returns:
+            tuple: (distances, indices) with shape (M, k), sorted by distance; missing neighbors (fewer than k points) have distance inf and index N.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        kdtree = self.kdtree
+        if not hasattr(kdtree, 'search_knn_vector_3d'):
+            distances, indices = kdtree.query(queries, k=k, workers=-1)
+            return distances.reshape(-1, k), indices.reshape(-1, k).astype(np.int64)
+        distances = np.full((queries.shape[0], k), np.inf)
+        indices = np.full((queries.shape[0], k), len(self), dtype=np.int64)
+        for i, query in enumerate(queries):
+            found, query_indices, query_distances = kdtree.search_knn_vector_3d(query, k)
+            indices[i, :found], distances[i, :found] = np.asarray(query_indices), np.sqrt(np.asarray(query_distances))
+        return distances, indices
+    
+    def query_radius(self, queries: np.ndarray, radius: float) -> list:
+        """
+        Finds the points within radius of each query.
+        
+        Args:
+            queries (np.ndarray): Query points with shape (M, 3).
+            radius (float): Search radius.
+        
+        Returns:
+            list: M int64 arrays of point indices.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        kdtree = self.kdtree
+        if not hasattr(kdtree, 'search_radius_vector_3d'): return [np.asarray(indices, dtype=np.int64) for indices in kdtree.query_ball_point(queries, radius, workers=-1)]
+        return [np.asarray(kdtree.search_radius_vector_3d(query, radius)[1], dtype=np.int64) for query in queries]
+    
+    def count_radius(self, queries: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Counts the points within radius of each query.
+        
+        Args:
+            queries (np.ndarray): Query points with shape (M, 3).
+            radius (float): Search radius.
+        
+        Returns:
+            np.ndarray: Counts with shape (M,) int64.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        kdtree = self.kdtree
+        if not hasattr(kdtree, 'search_radius_vector_3d'): return np.asarray(kdtree.query_ball_point(queries, radius, return_length=True, workers=-1), dtype=np.int64).reshape(-1)
+        return np.array([kdtree.search_radius_vector_3d(query, radius)[0] for query in queries], dtype=np.int64)
+    
+    def get_voxel_hash(self, voxel_size: float):
+        """
+        Groups the points by voxel with a single sort, the voxel coordinates are packed into 64-bit keys (21 bits per axis) as in `voxel_downsample`.
+        
+        Args:
+            voxel_size (float): Voxel side length.
+        
+        Returns:
+            tuple: (voxel_keys, voxel_starts, order, point_voxel_ids), where the points of voxel v are order[voxel_starts[v]:voxel_starts[v + 1]], voxel_keys (V,) are sorted, and point_voxel_ids (N,) maps each point to its voxel.
+        """
+        voxel_size = float(voxel_size)
+        if voxel_size not in self.__voxel_hashes__:
+            origin = np.floor(self.points.min(axis=0) / voxel_size).astype(np.int64) if len(self) > 0 else np.zeros(3, dtype=np.int64)
+            keys = self.__voxel_keys__(self.points, voxel_size, origin)
+            if len(self) > 0 and keys.min() < 0: raise ValueError(f'The point cloud spans more than {1 << 21} voxels along an axis, increase voxel_size.')
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            is_start = np.ones(len(self), dtype=bool)
+            np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+            starts = np.flatnonzero(is_start)
+            point_voxel_ids = np.empty(len(self), dtype=np.int64)
+            point_voxel_ids[order] = np.cumsum(is_start) - 1
+            self.__voxel_hashes__[voxel_size] = (origin, sorted_keys[starts], np.append(starts, len(self)), order, point_voxel_ids)
+        return self.__voxel_hashes__[voxel_size][1:]
+    
+    def query_voxels(self, queries: np.ndarray, voxel_size: float) -> np.ndarray:
+        """
+        Finds the voxel (of `get_voxel_hash`) each query falls in, in O(log V) per query.
+        
+        Args:
+            queries (np.ndarray): Query points with shape (M, 3).
+            voxel_size (float): Voxel side length.
+        
+        Returns:
+            np.ndarray: Voxel ids with shape (M,) int64, -1 for queries in empty voxels.
+        """
+        voxel_keys = self.get_voxel_hash(voxel_size)[0]
+        origin = self.__voxel_hashes__[float(voxel_size)][0]
+        keys = self.__voxel_keys__(np.asarray(queries, dtype=np.float64).reshape(-1, 3), float(voxel_size), origin)
+        voxel_ids = np.minimum(np.searchsorted(voxel_keys, keys), max(len(voxel_keys) - 1, 0))
+        found = (keys >= 0) & (voxel_keys[voxel_ids] == keys) if len(voxel_keys) > 0 else np.zeros(keys.shape[0], dtype=bool)
+        return np.where(found, voxel_ids, -1)
+    
+    @staticmethod
+    def __voxel_keys__(points: np.ndarray, voxel_size: float, origin: np.ndarray) -> np.ndarray:
+        """
+        Packed voxel keys of the points relative to the origin voxel, -1 for points outside the 21-bit range.
+        
+        """
+        coords = np.floor(points / voxel_size).astype(np.int64) - origin
+        outside = np.any((coords < 0) | (coords >= 1 << 21), axis=1)
+        keys = (coords[:, 0] << 42) | (coords[:, 1] << 21) | coords[:, 2]
+        keys[outside] = -1
+        return keys
+
+def get_spatial_index(data_dict: dict) -> SpatialIndex:
+    """
+    Returns the `SpatialIndex` of current_point_cloud_numpy, shared by all the algorithms of a frame.
+    The index is kept in data_dict and rebuilt (lazily, on the first query) when current_point_cloud_numpy is replaced by another array, e.g. by crop or a new frame; algorithms that modify the point cloud in place must not use a previously returned index.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data, with current_point_cloud_numpy.
+    
+    Returns:
+        SpatialIndex: The spatial index of the current point cloud.
+    """
+    points = data_dict['current_point_cloud_numpy']
+    index = data_dict.get('spatial_index', None)
+    if index is None or index.source is not points or index.frame_index != data_dict.get('current_frame_index', None):
+        index = SpatialIndex(points)
+        index.frame_index = data_dict.get('current_frame_index', None)
+        data_dict['spatial_index'] = index
+    return index
+
+def get_neighbor_distances(data_dict: dict, k: int, backend: str = 'kdtree', kernel_size: int = 3) -> np.ndarray:
+    """
+    Returns the distances from each point of current_point_cloud_numpy to its neighbors, excluding the point itself.
+    With the kdtree backend the neighbors are the k nearest points (see `get_spatial_index`); with the range_image backend they are the points in the kernel_size x kernel_size pixel window of the point in the range image created by `lidar:create_range_image`, in O(1) per point.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data, with current_point_cloud_numpy (and current_range_index_image and current_point_cloud_pixels for the range_image backend).
+        k (int): kdtree only, number of neighbors.
+        backend (str): kdtree or range_image.
+        kernel_size (int): range_image only, odd side length of the pixel window.
+    
+    Returns:
+        np.ndarray: Distances with shape (N, k) or (N, kernel_size * kernel_size - 1), inf for missing neighbors.
+    """
+    points = data_dict['current_point_cloud_numpy']
+    if backend == 'kdtree':
+        distances, _ = get_spatial_index(data_dict).query_knn(points[:, :3], k + 1)
+        return distances[:, 1:]
+    if backend != 'range_image': raise ValueError(f'backend {backend} not supported, supported backends: kdtree, range_image')
+    pixels = data_dict['current_point_cloud_pixels']
+    if pixels.shape[0] != points.shape[0]: raise ValueError('current_point_cloud_pixels does not match current_point_cloud_numpy, create the range image before the processes that remove points')
+    neighbors = get_range_image_neighbors(data_dict['current_range_index_image'], pixels[:, 0], pixels[:, 1], kernel_size)
+    neighbors = np.delete(neighbors, kernel_size * kernel_size // 2, axis=1) # the center pixel is the point itself
+    valid = (neighbors >= 0) & (pixels[:, :1] >= 0)
+    distances = np.linalg.norm(points[np.where(valid, neighbors, 0), :3] - points[:, None, :3], axis=2)
+    distances[~valid] = np.inf
+    return distances
+
+def statistical_outlier_mask(neighbor_distances: np.ndarray, std_ratio: float) -> np.ndarray:
+    """
+    Statistical outlier removal: a point is an outlier if the mean distance to its neighbors is more than std_ratio standard deviations above the mean of all the points; points without neighbors are outliers.
+    
+    Args:
+        neighbor_distances (np.ndarray): Distances to the neighbors with shape (N, K), inf for missing neighbors (see `get_neighbor_distances`).
+        std_ratio (float): Number of standard deviations.
+    
+    Returns:
+        np.ndarray: Outlier mask with shape (N,).
+    """
+    valid = np.isfinite(neighbor_distances)
+    counts = valid.sum(axis=1)
+    mean_distances = np.full(neighbor_distances.shape[0], np.inf)
+    np.divide(np.where(valid, neighbor_distances, 0.0).sum(axis=1), counts, out=mean_distances, where=counts > 0)
+    has_neighbors = counts > 0
+    if not np.any(has_neighbors): return ~has_neighbors
+    threshold = mean_distances[has_neighbors].mean() + std_ratio * mean_distances[has_neighbors].std()
+    return mean_distances > threshold
+
+def radius_outlier_mask(neighbor_distances: np.ndarray, radius: float, min_neighbors: int) -> np.ndarray:
+    """
+    Radius outlier removal: a point is an outlier if it has fewer than min_neighbors neighbors within radius.
+    
+    Args:
+        neighbor_distances (np.ndarray): Distances to the neighbors with shape (N, K), inf for missing neighbors (see `get_neighbor_distances`); with K >= min_neighbors.
+        radius (float): Neighborhood radius.
+        min_neighbors (int): Minimum number of neighbors of an inlier.
+    
+    Returns:
+        np.ndarray: Outlier mask with shape (N,).
+    """
+    return np.count_nonzero(neighbor_distances <= radius, axis=1) < min_neighbors
+
+def deskew_points(points: np.ndarray, times: np.ndarray, motion: np.ndarray, scan_period: float) -> np.ndarray:
+    """
+    Removes the motion distortion of a scan in one vectorized pass: the sensor pose at the time of each point is interpolated between the scan start and end (rotation along the axis-angle of the motion, translation linearly), and the point is moved to the sensor frame at the end of the scan.
+    
+    Args:
+        points (np.ndarray): Points with shape (N, >=3), only the first three columns are transformed.
+        times (np.ndarray): Time of each point in seconds since the start of the scan, with shape (N,).
+        motion (np.ndarray): 4x4 transform from the sensor frame at the end of the scan to the sensor frame at its start (e.g. the relative pose of consecutive frames).
+        scan_period (float): Duration of the scan in seconds.
+    
+    Returns:
+        np.ndarray: Deskewed copy of the points.
+    """
+    rotation, translation = motion[:3, :3], motion[:3, 3]
+    fractions = (np.asarray(times, dtype=np.float64) / scan_period)[:, None]
+    
+    # axis-angle of the rotation of the whole scan
+    angle = np.arccos(np.clip((np.trace(rotation) - 1.0) / 2.0, -1.0, 1.0))
+    axis = np.array([rotation[2, 1] - rotation[1, 2], rotation[0, 2] - rotation[2, 0], rotation[1, 0] - rotation[0, 1]])
+    axis = axis / np.linalg.norm(axis) if angle > 1e-9 and np.linalg.norm(axis) > 1e-12 else np.zeros(3)
+    
+    # rotate each point by its fraction of the angle (Rodrigues), translate by its fraction of the translation, then move to the end frame
+    xyz = points[:, :3].astype(np.float64)
+    cos, sin = np.cos(fractions * angle), np.sin(fractions * angle)
+    start_xyz = xyz * cos + np.cross(axis, xyz) * sin + axis * (xyz @ axis)[:, None] * (1.0 - cos) + fractions * translation
+    deskewed = points.copy()
+    deskewed[:, :3] = (start_xyz - translation) @ rotation
+    return deskewed
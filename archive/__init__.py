@@ -0,0 +1,16 @@
+"""
+The archive package lets the file handlers of the `pcd`, `img`, `lbl`, and `calib` packages read datasets directly from `.zip` and (uncompressed) `.tar` archives without extracting them.
+
+### Usage:
+
+Point `data:path` in `config.yml` to the archive instead of a directory, the subdirectories (`lidar_subdir`, `camera_subdir`, etc.) are then looked up inside the archive:
+
+```yaml
+data:
+    path: 'data/kitti.zip' # archive containing lidar/, camera/, label/, and calib/ subdirectories
+```
+
+Paths that pass through an archive look like regular paths, for example `data/kitti.zip/lidar/000000.bin`. The `archive.file_io` module provides drop-in replacements for `glob.glob`, `os.path.exists`, and `open` that understand such paths and fall back to the regular functions otherwise.
+
+The member offsets of an archive are indexed once and the index is cached in memory (and persisted next to the archive as `<archive>.index.json`, which matters most for `.tar` archives since indexing a tar requires reading every member header; the index is not persisted if the location is read-only). Stored (uncompressed) members are served as zero-copy slices of a memory-mapped archive; deflated zip members are inflated straight from the mapped buffer.
+"""
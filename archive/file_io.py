@@ -0,0 +1,283 @@
+import os
+import io
+import json
+import mmap
+import glob as _glob
+import struct
+import fnmatch
+import zipfile
+import tarfile
+import tempfile
+import builtins
+import threading
+import posixpath
+import contextlib
+import zlib
+
+supported_archive_types = ['.zip', '.tar']
+
+class ArchiveIndex:
+    """
+    Index of the member offsets of a .zip or an uncompressed .tar archive, used to read members without extracting them.
+
+    Args:
+        archive_path (str): Path of the archive file.
+
+    Attributes:
+        archive_path (str): Path of the archive file.
+        archive_type (str): Extension of the archive file, either '.zip' or '.tar'.
+        index_path (str): Path of the persisted index file.
+        file (file): The opened archive file.
+        buffer (mmap.mmap): Read-only memory map of the archive file.
+        members (dict): Maps member names to tuples of (data offset, stored size, file size, zip compression type).
+
+    Raises:
+        NotImplementedError: If the archive type is not supported.
+
+    """
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        self.archive_type = os.path.splitext(archive_path)[1].lower()
+        if self.archive_type not in supported_archive_types: raise NotImplementedError("Archive type not supported. Supported archive types: " + ', '.join(supported_archive_types) + ".")
+        self.index_path = archive_path + '.index.json'
+
+        self.file = builtins.open(archive_path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # the stamp invalidates a persisted index if the archive is modified
+        stat = os.stat(archive_path)
+        self.stamp = [stat.st_size, stat.st_mtime_ns]
+        self.members = self.__load_index__()
+        if self.members is None:
+            self.members = self.__build_index__()
+            self.__save_index__()
+
+    def __load_index__(self):
+        """
+        Loads the persisted index if it exists and matches the archive.
+
+        Returns:
+            dict: The members dictionary, or None if no valid index is persisted.
+
+        """
+        if not os.path.exists(self.index_path): return None
+        try:
+            with builtins.open(self.index_path, 'r') as f: index = json.load(f)
+        except: return None
+        if index.get('stamp') != self.stamp: return None
+        return {name: tuple(entry) for name, entry in index['members'].items()}
+
+    def __save_index__(self):
+        """
+        Persists the index next to the archive, skipped if the location is read-only or not writable.
+        The index is written to a temporary file first and renamed, so that a failed write never leaves a truncated index behind.
+
+        """
+        if not os.access(os.path.dirname(os.path.abspath(self.index_path)), os.W_OK): return
+        if os.path.exists(self.index_path) and not os.access(self.index_path, os.W_OK): return
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with builtins.open(tmp_path, 'w') as f: json.dump({'stamp': self.stamp, 'members': self.members}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    def __build_index__(self):
+        """
+        Scans the archive once and records the data offset of every file member.
+
+        Returns:
+            dict: The members dictionary.
+
+        """
+        members = dict()
+        if self.archive_type == '.zip':
+            with zipfile.ZipFile(self.archive_path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir(): continue
+                    # the data starts after the local file header (30 bytes) and its variable length name and extra fields
+                    name_length, extra_length = struct.unpack('<HH', self.buffer[info.header_offset + 26:info.header_offset + 30])
+                    data_offset = info.header_offset + 30 + name_length + extra_length
+                    members[info.filename] = (data_offset, info.compress_size, info.file_size, info.compress_type)
+        else:
+            try: tf = tarfile.open(self.archive_path, 'r:')
+            except tarfile.ReadError: raise NotImplementedError("Compressed tar archives can not be seeked, please use an uncompressed .tar or a .zip archive.")
+            with tf:
+                for info in tf:
+                    if not info.isfile(): continue
+                    name = info.name[2:] if info.name.startswith('./') else info.name
+                    members[name] = (info.offset_data, info.size, info.size, zipfile.ZIP_STORED)
+        return members
+
+    def read(self, member: str):
+        """
+        Reads a member of the archive.
+
+        Args:
+            member (str): Name of the member, with '/' as separator.
+
+        Returns:
+            memoryview or bytes: A zero-copy view into the memory-mapped archive for stored members, the inflated bytes otherwise.
+
+        """
+        data_offset, stored_size, file_size, compress_type = self.members[member]
+        if compress_type == zipfile.ZIP_STORED: return memoryview(self.buffer)[data_offset:data_offset + file_size]
+        if compress_type == zipfile.ZIP_DEFLATED: return zlib.decompress(memoryview(self.buffer)[data_offset:data_offset + stored_size], -zlib.MAX_WBITS, file_size)
+        # other compression methods (bzip2, lzma) go through the zipfile module
+        with zipfile.ZipFile(self.archive_path) as zf: return zf.read(member)
+
+    def close(self):
+        """
+        Unmaps and closes the archive, fails with BufferError if zero-copy views into it are still alive.
+
+        """
+        self.buffer.close()
+        self.file.close()
+
+__indices__ = dict()
+__indices_lock__ = threading.Lock()
+
+def get_index(archive_path: str) -> ArchiveIndex:
+    """
+    Returns the index of an archive, building it on first use and caching it afterwards.
+
+    Args:
+        archive_path (str): Path of the archive file.
+
+    Returns:
+        ArchiveIndex: The index of the archive.
+
+    """
+    archive_path = os.path.abspath(archive_path)
+    with __indices_lock__:
+        if archive_path not in __indices__: __indices__[archive_path] = ArchiveIndex(archive_path)
+        return __indices__[archive_path]
+
+def close_indices():
+    """
+    Closes all cached archive indices, e.g. before deleting or replacing the archives.
+
+    """
+    with __indices_lock__:
+        for index in __indices__.values(): index.close()
+        __indices__.clear()
+
+def split_archive_path(path: str):
+    """
+    Splits a path that passes through an archive into the archive path and the member name.
+
+    Args:
+        path (str): A path such as `data/kitti.zip/lidar/000000.bin`.
+
+    Returns:
+        tuple: Tuple containing the archive path and the member name, or (None, path) if the path does not pass through an archive.
+
+    """
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(1, len(parts)):
+        if os.path.splitext(parts[i - 1])[1].lower() not in supported_archive_types: continue
+        archive_path = os.sep.join(parts[:i])
+        if os.path.isfile(archive_path): return archive_path, '/'.join(parts[i:])
+    return None, path
+
+def is_archive_path(path: str) -> bool:
+    """
+    Checks if a path passes through an archive.
+
+    Args:
+        path (str): The path to check.
+
+    Returns:
+        bool: True if the path passes through an archive.
+
+    """
+    return split_archive_path(path)[0] is not None
+
+def glob(pattern: str) -> list:
+    """
+    Drop-in replacement for `glob.glob` that also lists archive members, wildcards are only supported in the last path component inside archives.
+
+    Args:
+        pattern (str): The glob pattern, for example `data/kitti.zip/lidar/*.bin`.
+
+    Returns:
+        list: List of matching paths.
+
+    """
+    archive_path, member_pattern = split_archive_path(pattern)
+    if archive_path is None: return _glob.glob(pattern)
+    member_dir, member_basename_pattern = posixpath.split(member_pattern)
+    members = get_index(archive_path).members
+    return [os.path.join(archive_path, *member.split('/')) for member in members if posixpath.dirname(member) == member_dir and fnmatch.fnmatchcase(posixpath.basename(member), member_basename_pattern)]
+
+def exists(path: str) -> bool:
+    """
+    Drop-in replacement for `os.path.exists` that also checks archive members.
+
+    Args:
+        path (str): The path to check.
+
+    Returns:
+        bool: True if the file or the archive member exists.
+
+    """
+    archive_path, member = split_archive_path(path)
+    if archive_path is None: return os.path.exists(path)
+    return member in get_index(archive_path).members
+
+def read_buffer(path: str):
+    """
+    Reads the whole content of a file or an archive member.
+
+    Args:
+        path (str): Path of the file or the archive member.
+
+    Returns:
+        memoryview or bytes: The content, zero-copy (and read-only) for stored archive members.
+
+    """
+    archive_path, member = split_archive_path(path)
+    if archive_path is None:
+        with builtins.open(path, 'rb') as f: return f.read()
+    return get_index(archive_path).read(member)
+
+def open(path: str, mode: str = 'r'):
+    """
+    Drop-in replacement for `open` (read modes only for archive members).
+
+    Args:
+        path (str): Path of the file or the archive member.
+        mode (str): 'r' for text or 'rb' for binary mode.
+
+    Returns:
+        file: A file-like object.
+
+    """
+    archive_path, member = split_archive_path(path)
+    if archive_path is None: return builtins.open(path, mode)
+    if 'w' in mode or 'a' in mode or '+' in mode: raise NotImplementedError("Archive members can only be opened for reading.")
+    f = io.BytesIO(get_index(archive_path).read(member))
+    if 'b' in mode: return f
+    return io.TextIOWrapper(f)
+
+@contextlib.contextmanager
+def local_copy(path: str):
+    """
+    Context manager that yields a path on disk for readers that can not read from memory. Archive members are copied to a temporary file which is removed afterwards.
+
+    Args:
+        path (str): Path of the file or the archive member.
+
+    Yields:
+        str: Path of the file on disk.
+
+    """
+    archive_path, member = split_archive_path(path)
+    if archive_path is None:
+        yield path
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix=posixpath.splitext(member)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f: f.write(get_index(archive_path).read(member))
+        yield tmp_path
+    finally: os.remove(tmp_path)
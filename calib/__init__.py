@@ -51,4 +51,6 @@ def Handler(calib_path: str):
     return calib
 ```
 
+To also support datasets read directly from `.zip`/`.tar` archives, use `archive_io.exists` and `archive_io.open` (from `archive import file_io as archive_io`) in place of `os.path.exists` and `open`.
+The calibration FileIO reads each file once to intern identical calibrations, a handler that declares an optional `calib_buffer: bytes = None` argument receives that content and should parse it instead of reading `calib_path` again (see `handler_kitti.py`).
 """
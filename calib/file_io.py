@@ -1,7 +1,12 @@
 import os
-import glob
 import time
+import hashlib
+import inspect
 import threading
+import numpy as np
+
+from archive import file_io as archive_io
+from calib.utils import add_derived_matrices
 
 calib_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -27,15 +32,23 @@ class FileIO:
         self.clb_dir = os.path.join(cfg['data']['path'], cfg['data']['calib_subdir'])
         self.clb_type = cfg['data']['calib']['clb_type']
         self.clb_count = cfg['data']['size']
+        # images decoded at a reduced preview scale are projected onto with P2 scaled by the same factor
+        self.preview_scale = cfg['data']['camera'].get('preview_scale', 1) if cfg['data']['camera']['enabled'] else 1
         
         # Check if the calibration type is supported
         if self.clb_type not in supported_calib_types: raise NotImplementedError("Calib type not supported. Supported file types: " + ', '.join(supported_calib_types) + ".")
         # Import the calibration handler
         h = __import__('calib.handler_'+self.clb_type, fromlist=['calib_file_extension', 'Handler'])
-        self.clb_ext, self.reader = h.calib_file_extension, h.Handler
+        self.clb_ext, self.handler = h.calib_file_extension, h.Handler
+        # handlers that take the already read content parse it instead of reading the file again
+        self.handler_takes_buffer = 'calib_buffer' in inspect.signature(self.handler).parameters
+        self.reader = self.__read_calib__
+        # calibrations interned by content hash, frames with identical calibration files share one dictionary
+        self.interned_calibs = dict()
+        self.interned_calibs_lock = threading.Lock()
         
         # read all the calibration files
-        files = glob.glob(os.path.join(self.clb_dir, '*' + self.clb_ext))
+        files = archive_io.glob(os.path.join(self.clb_dir, '*' + self.clb_ext))
         file_basenames = [os.path.splitext(os.path.basename(file))[0] for file in files]
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[:self.clb_count]
@@ -46,6 +59,28 @@ class FileIO:
         self.stop = threading.Event()
         threading.Thread(target=self.__async_read_fn__).start()
         
+    def __read_calib__(self, clb_abs_path: str):
+        """
+        Reads a calibration file once, returning the already parsed dictionary if a file with identical content was read before, otherwise parsing the content that was read.
+        The derived matrices (see `calib.utils.add_derived_matrices`) are built once per unique calibration, after P2 is scaled to the image preview scale (data:camera:preview_scale), before the dictionary is shared among the frames.
+
+        Args:
+            clb_abs_path (str): Absolute path of the calibration file.
+
+        Returns:
+            dict: The calibration data, or None if the file does not exist.
+        """
+        if not archive_io.exists(clb_abs_path): return None
+        calib_buffer = archive_io.read_buffer(clb_abs_path)
+        content_hash = hashlib.blake2b(calib_buffer, digest_size=16).digest()
+        with self.interned_calibs_lock:
+            if content_hash in self.interned_calibs: return self.interned_calibs[content_hash]
+        calib = self.handler(clb_abs_path, calib_buffer=calib_buffer) if self.handler_takes_buffer else self.handler(clb_abs_path)
+        if calib is not None and self.preview_scale != 1:
+            calib['P2'] = np.asarray(calib['P2'], dtype=np.float64) / np.array([[self.preview_scale], [self.preview_scale], [1]])
+        calib = add_derived_matrices(calib)
+        with self.interned_calibs_lock: return self.interned_calibs.setdefault(content_hash, calib)
+
     def get_abs_path(self, idx: int):
         """
         Get the absolute path of the calibration file at the specified index.
@@ -1,30 +1,33 @@
 import os
 import numpy as np
 
+from archive import file_io as archive_io
+
 calib_file_extension = '.txt'
 
-def Handler(calib_path: str):
+def Handler(calib_path: str, calib_buffer: bytes = None):
     """
     Loads calibration data from the specified file path and returns it as a dictionary.
 
     Args:
         calib_path (str): The path to the calibration file.
+        calib_buffer (bytes): The content of the calibration file if it was already read, otherwise the file is read from calib_path.
 
     Returns:
         dict: A dictionary containing the calibration data.
     """
     # Check if the calibration file exists
-    if os.path.exists(calib_path) == False: return None
+    if calib_buffer is None and archive_io.exists(calib_path) == False: return None
+    if calib_buffer is None: calib_buffer = archive_io.read_buffer(calib_path)
     
     calib = {}
     
-    # Read the calibration file and populate the calib dictionary
-    with open(calib_path) as f:
-        for line in f.readlines():
-            line = line.strip()
-            if len(line) == 0: continue
-            k, v = line.split(':')
-            calib[k] = np.array([float(x) for x in v.split()], dtype=np.float32)
+    # Parse the calibration file content and populate the calib dictionary
+    for line in bytes(calib_buffer).decode().splitlines():
+        line = line.strip()
+        if len(line) == 0: continue
+        k, v = line.split(':')
+        calib[k] = np.array([float(x) for x in v.split()], dtype=np.float32)
 
     # make sure the shapes are correct
     calib['P2'] = calib['P2'].reshape(3, 4) # 3x4
@@ -1,15 +1,18 @@
 import os
 import numpy as np
+
+from archive import file_io as archive_io
 import json
 
 calib_file_extension = '.json'
 
-def Handler(calib_path: str):
+def Handler(calib_path: str, calib_buffer: bytes = None):
     """
     Loads calibration data from a file and returns a dictionary containing the calibration parameters.
 
     Args:
         calib_path (str): The path to the calibration file.
+        calib_buffer (bytes): The content of the calibration file if it was already read, otherwise the file is read from calib_path.
 
     Returns:
         dict: A dictionary containing the calibration parameters.
@@ -19,12 +22,13 @@ def Handler(calib_path: str):
 
     """
 
-    if os.path.exists(calib_path) == False: return None
+    if calib_buffer is None and archive_io.exists(calib_path) == False: return None
+    if calib_buffer is None: calib_buffer = archive_io.read_buffer(calib_path)
     
     calib = {}
 
-    # Read the calibration file and populate the calib dictionary
-    with open(calib_path, 'r') as f: calib = json.load(f)
+    # Parse the calibration file content and populate the calib dictionary
+    calib = json.loads(bytes(calib_buffer))
     extrinsic_matrix  = np.reshape(calib['extrinsic'], [4,4]) # Tr_velo_to_cam
     intrinsic_matrix  = np.reshape(calib['intrinsic'], [3,3]) # P2
     
@@ -0,0 +1,61 @@
+import numpy as np
+
+"""
+The module utils.py contains utility functions for working with calibration data. If you think that a function can be reused in other parts of the framework, you can move it to the utils.py module.
+"""
+
+def add_derived_matrices(calib: dict) -> dict:
+    """
+    Returns a calibration dictionary with the matrices derived from P2, R0_rect, and Tr_velo_to_cam, so that consumers do not recompute them per frame.
+    A dictionary that already holds them is returned as it is, otherwise a copy is returned and the given dictionary is not modified, as it may be shared among the frames.
+    The calib FileIO builds them once per unique calibration, before sharing the dictionary among all the frames having identical calibration files.
+
+    The following keys are added:
+        - Tr_velo_to_pixel (3x4): P2 @ R0_rect @ Tr_velo_to_cam, projects homogeneous lidar coordinates to homogeneous image pixel coordinates.
+        - Tr_cam_to_velo (4x4): inverse of Tr_velo_to_cam.
+        - P2_f32, R0_rect_f32, Tr_velo_to_cam_f32, Tr_velo_to_pixel_f32, Tr_cam_to_velo_f32: contiguous float32 copies.
+
+    Args:
+        calib (dict): Calibration dictionary containing P2, Tr_velo_to_cam, and optionally R0_rect.
+
+    Returns:
+        dict: The calibration dictionary holding the derived matrices, or None if calib is None.
+
+    """
+    if calib is None or 'Tr_velo_to_pixel' in calib: return calib
+    P2 = np.asarray(calib['P2'], dtype=np.float64)
+    R0_rect = np.asarray(calib['R0_rect'], dtype=np.float64) if 'R0_rect' in calib else np.eye(4)
+    Tr_velo_to_cam = np.asarray(calib['Tr_velo_to_cam'], dtype=np.float64)
+    # pad 3x3 rectification and 3x4 extrinsic matrices to 4x4
+    if R0_rect.shape == (3, 3): R0_rect = np.pad(R0_rect, ((0, 1), (0, 1)), mode='constant', constant_values=0); R0_rect[3, 3] = 1
+    if Tr_velo_to_cam.shape == (3, 4): Tr_velo_to_cam = np.vstack((Tr_velo_to_cam, [0, 0, 0, 1]))
+
+    calib = dict(calib)
+    calib['P2_f32'] = np.ascontiguousarray(P2, dtype=np.float32)
+    calib['R0_rect_f32'] = np.ascontiguousarray(R0_rect, dtype=np.float32)
+    calib['Tr_velo_to_cam_f32'] = np.ascontiguousarray(Tr_velo_to_cam, dtype=np.float32)
+    calib['Tr_cam_to_velo'] = np.linalg.inv(Tr_velo_to_cam)
+    calib['Tr_cam_to_velo_f32'] = np.ascontiguousarray(calib['Tr_cam_to_velo'], dtype=np.float32)
+    Tr_velo_to_pixel = P2 @ R0_rect @ Tr_velo_to_cam
+    calib['Tr_velo_to_pixel_f32'] = np.ascontiguousarray(Tr_velo_to_pixel, dtype=np.float32)
+    calib['Tr_velo_to_pixel'] = Tr_velo_to_pixel
+    return calib
+
+def update_camera_matrix(calib: dict, camera_matrix: np.ndarray, new_camera_matrix: np.ndarray) -> dict:
+    """
+    Returns a copy of a calibration dictionary with P2 updated for images resampled from camera_matrix to new_camera_matrix (e.g. undistorted), P2 = new_camera_matrix @ inv(camera_matrix) @ P2.
+    The matrices derived by `add_derived_matrices` are rebuilt for the copy, the calibration dictionary itself is not modified as it is shared among the frames.
+
+    Args:
+        calib (dict): Calibration dictionary containing P2.
+        camera_matrix (np.ndarray): 3x3 intrinsic matrix the images were captured with.
+        new_camera_matrix (np.ndarray): 3x3 intrinsic matrix of the resampled images.
+
+    Returns:
+        dict: The updated copy of the calibration dictionary.
+
+    """
+    derived_keys = ['Tr_velo_to_pixel', 'Tr_cam_to_velo']
+    new_calib = {key: value for key, value in calib.items() if key not in derived_keys and not key.endswith('_f32')}
+    new_calib['P2'] = np.asarray(new_camera_matrix, dtype=np.float64) @ np.linalg.inv(np.asarray(camera_matrix, dtype=np.float64)) @ np.asarray(calib['P2'], dtype=np.float64)
+    return add_derived_matrices(new_calib)
@@ -1,8 +1,16 @@
 import cv2
 import os
-import glob
 import time
+import numpy as np
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from archive import file_io as archive_io
+
+# imread flags for each supported preview scale, reduced decoding is done inside the codec and is much cheaper than a full decode followed by a resize
+preview_imread_flags = {1: cv2.IMREAD_UNCHANGED, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+# video containers that are decoded sequentially with cv2.VideoCapture instead of one image file per frame
+supported_video_types = ['.mp4', '.mkv', '.avi', '.mov']
 
 class FileIO:
     """
@@ -16,6 +24,13 @@ class FileIO:
         img_dir (str): Directory path where the image files are located.
         img_type (str): File extension of the image files.
         img_count (int): Number of image files to read.
+        preview_scale (int): Downscale factor applied while decoding, can be 1 (full resolution), 2, 4, or 8.
+        color_order (str): Channel order of the returned images, can be 'rgb' or 'bgr' ('bgr' skips the color conversion).
+        io_workers (int): Number of threads used to decode images in parallel.
+        is_video (bool): True if `img_type` is a video container, in which case frames are decoded from the video files in `img_dir`.
+        video_paths (list): List of video file paths, played back one after the other (video mode only).
+        video_frame_offsets (list): Global index of the first frame of each video, with the total frame count appended (video mode only).
+        seek_index (dict): Maps decoded frame indices to their timestamps in milliseconds, used to seek back to them (video mode only).
         files_basenames (list): List of file basenames (without extension) of the image files.
         reader (function): Function to read an image file.
         data_lock (threading.Lock): Lock for thread-safe access to the data list.
@@ -25,6 +40,7 @@ class FileIO:
     Methods:
         __init__(self, cfg: dict): Initializes the FileIO object.
         __read_img__(self, file_abs_path: str): Reads an image file and returns the image data.
+        __read_video_frame__(self, idx: int): Seeks to and decodes a single video frame (video mode only).
         get_abs_path(self, idx: int): Returns the absolute path of the image file at the given index.
         __async_read_fn__(self): Asynchronously reads the image files and populates the data list.
         __len__(self): Returns the number of image files.
@@ -38,37 +54,147 @@ class FileIO:
         self.img_dir = os.path.join(cfg['data']['path'], cfg['data']['camera_subdir'])
         self.img_type = cfg['data']['camera']['img_type']
         self.img_count = cfg['data']['size']
-        files = glob.glob(os.path.join(self.img_dir, '*' + self.img_type))
+        self.preview_scale = cfg['data']['camera'].get('preview_scale', 1)
+        self.color_order = cfg['data']['camera'].get('color_order', 'rgb').lower()
+        self.io_workers = max(1, cfg['threads'].get('io_workers', 1))
+        # Check if the preview scale and color order are supported
+        if self.preview_scale not in preview_imread_flags:
+            raise NotImplementedError("Preview scale not supported. Supported preview scales: " + ', '.join([str(s) for s in preview_imread_flags]) + ".")
+        if self.color_order not in ['rgb', 'bgr']:
+            raise NotImplementedError("Color order not supported. Supported color orders: rgb, bgr.")
+        self.imread_flag = preview_imread_flags[self.preview_scale]
+        files = archive_io.glob(os.path.join(self.img_dir, '*' + self.img_type))
+        
+        self.data_lock = threading.Lock()
+        self.data = []
+        self.stop = threading.Event()
+        
+        self.is_video = self.img_type in supported_video_types
+        if self.is_video:
+            if archive_io.is_archive_path(self.img_dir): raise NotImplementedError("Video files can not be decoded from inside an archive, please extract them.")
+            self.__init_video__(sorted(files))
+            # Start the asynchronous decoding thread
+            threading.Thread(target=self.__async_read_video_fn__).start()
+            return
+        
         file_basenames = [os.path.splitext(os.path.basename(file))[0] for file in files]
         # Sort the file basenames based on the numerical part
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[:self.img_count]
         self.reader = self.__read_img__
 
-        self.data_lock = threading.Lock()
-        self.data = []
-        self.stop = threading.Event()
         # Start the asynchronous reading thread
         threading.Thread(target=self.__async_read_fn__).start()
 
+    def __init_video__(self, video_paths: list):
+        """
+        Indexes the video files and opens a separate capture used for random access.
+
+        Args:
+            video_paths (list): Sorted list of video file paths.
+
+        """
+        self.video_paths = []
+        self.video_frame_offsets = [0]
+        for video_path in video_paths:
+            capture = cv2.VideoCapture(video_path)
+            if not capture.isOpened(): raise Exception(f"Unable to open video file: {video_path}")
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+            self.video_paths.append(video_path)
+            self.video_frame_offsets.append(self.video_frame_offsets[-1] + frame_count)
+        self.files_basenames = [str(idx).zfill(6) for idx in range(min(self.video_frame_offsets[-1], self.img_count))]
+        self.reader = self.__read_video_frame__
+        
+        # the seek index is filled by the sequential decoder with the timestamp of every decoded frame
+        self.seek_index = dict()
+        # random access capture, kept open so that forward scrubbing only grabs the frames in between
+        self.seek_lock = threading.Lock()
+        self.seek_video_idx = -1
+        self.seek_capture = None
+        self.seek_next_idx = -1
+
+    def __locate_video_frame__(self, idx: int):
+        """
+        Returns the video number and the local frame index of a global frame index.
+
+        Args:
+            idx (int): Global index of the frame.
+
+        Returns:
+            tuple: Tuple containing the video number and the local frame index within that video.
+
+        """
+        for video_idx in range(len(self.video_paths)):
+            if idx < self.video_frame_offsets[video_idx + 1]: return video_idx, idx - self.video_frame_offsets[video_idx]
+        raise IndexError(f"Frame index {idx} out of range.")
+
+    def __postprocess_frame__(self, img_bgr):
+        """
+        Applies the preview scale and the color order to a decoded video frame.
+
+        Args:
+            img_bgr (numpy.ndarray): Decoded frame in BGR format.
+
+        Returns:
+            numpy.ndarray: Frame in RGB (or BGR) format.
+
+        """
+        if self.preview_scale != 1:
+            img_bgr = cv2.resize(img_bgr, (img_bgr.shape[1] // self.preview_scale, img_bgr.shape[0] // self.preview_scale), interpolation=cv2.INTER_AREA)
+        if self.color_order == 'bgr': return img_bgr
+        return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+
+    def __read_video_frame__(self, idx: int):
+        """
+        Seeks to and decodes a single video frame. Forward seeks within a short distance are served by grabbing the frames in between,
+        frames that were already decoded once are seeked by their timestamp from the seek index, and the rest fall back to frame-number seeking.
+
+        Args:
+            idx (int): Global index of the frame.
+
+        Returns:
+            numpy.ndarray: Frame in RGB (or BGR) format.
+
+        """
+        video_idx, local_idx = self.__locate_video_frame__(idx)
+        with self.seek_lock:
+            if video_idx != self.seek_video_idx:
+                if self.seek_capture is not None: self.seek_capture.release()
+                self.seek_capture = cv2.VideoCapture(self.video_paths[video_idx])
+                self.seek_video_idx, self.seek_next_idx = video_idx, 0
+            # decode forward if the frame is close ahead, otherwise seek
+            distance = local_idx - self.seek_next_idx
+            if distance < 0 or distance > self.cfg['data']['camera'].get('video_seek_distance', 30):
+                if idx in self.seek_index: self.seek_capture.set(cv2.CAP_PROP_POS_MSEC, self.seek_index[idx])
+                else: self.seek_capture.set(cv2.CAP_PROP_POS_FRAMES, local_idx)
+                distance = 0
+            for _ in range(distance): self.seek_capture.grab()
+            ret, img_bgr = self.seek_capture.read()
+            self.seek_next_idx = local_idx + 1
+        if not ret: raise Exception(f"Unable to decode frame {local_idx} of video file: {self.video_paths[video_idx]}")
+        return self.__postprocess_frame__(img_bgr)
+
     def __read_img__(self, file_abs_path: str):
         """
-        Reads an image file and returns the image data in RGB format.
+        Reads an image file, at the configured preview scale, and returns the image data in the configured color order.
 
         Args:
             file_abs_path (str): Absolute path of the image file.
 
         Returns:
-            numpy.ndarray: Image data in RGB format.
+            numpy.ndarray: Image data in RGB (or BGR) format.
 
         """
-        img_bgr = cv2.imread(file_abs_path, cv2.IMREAD_UNCHANGED)
+        if archive_io.is_archive_path(file_abs_path): img_bgr = cv2.imdecode(np.frombuffer(archive_io.read_buffer(file_abs_path), dtype=np.uint8), self.imread_flag)
+        else: img_bgr = cv2.imread(file_abs_path, self.imread_flag)
+        if self.color_order == 'bgr': return img_bgr
         img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
         return img_rgb
 
     def get_abs_path(self, idx: int):
         """
-        Returns the absolute path of the image file at the given index.
+        Returns the absolute path of the image file at the given index. In video mode, the path of the video file suffixed with `#<frame number>` is returned.
 
         Args:
             idx (int): Index of the image file.
@@ -77,22 +203,51 @@ class FileIO:
             str: Absolute path of the image file.
 
         """
+        if self.is_video:
+            video_idx, local_idx = self.__locate_video_frame__(idx)
+            return self.video_paths[video_idx] + '#' + str(local_idx)
         return os.path.join(self.img_dir, self.files_basenames[idx] + self.img_type)
 
     def __async_read_fn__(self):
         """
         Asynchronously reads the image files and populates the data list.
+        Images are decoded in batches of `io_workers` in parallel (OpenCV releases the GIL while decoding) and appended in order.
 
         """
-        for idx in range(len(self.files_basenames)):
-            if self.stop.is_set():
-                break
-            file_abs_path = self.get_abs_path(idx)
-            pcd_np = self.reader(file_abs_path)
-            with self.data_lock:
-                # append the file absolute path and the image data to the data list
-                self.data.append((file_abs_path, pcd_np))
-            time.sleep(self.cfg['threads']['io_sleep'])
+        with ThreadPoolExecutor(max_workers=self.io_workers) as executor:
+            for batch_start in range(0, len(self.files_basenames), self.io_workers):
+                if self.stop.is_set():
+                    break
+                batch_end = min(batch_start + self.io_workers, len(self.files_basenames))
+                file_abs_paths = [self.get_abs_path(idx) for idx in range(batch_start, batch_end)]
+                for file_abs_path, img_np in zip(file_abs_paths, executor.map(self.reader, file_abs_paths)):
+                    with self.data_lock:
+                        # append the file absolute path and the image data to the data list
+                        self.data.append((file_abs_path, img_np))
+                time.sleep(self.cfg['threads']['io_sleep'])
+
+    def __async_read_video_fn__(self):
+        """
+        Asynchronously decodes the video files sequentially, which is far cheaper than seeking, and populates the data list and the seek index.
+
+        """
+        idx = 0
+        for video_idx, video_path in enumerate(self.video_paths):
+            capture = cv2.VideoCapture(video_path)
+            while idx < min(self.video_frame_offsets[video_idx + 1], len(self.files_basenames)) and not self.stop.is_set():
+                ret, img_bgr = capture.read()
+                if not ret: break
+                # timestamp of the frame just decoded
+                timestamp_msec = capture.get(cv2.CAP_PROP_POS_MSEC)
+                img_np = self.__postprocess_frame__(img_bgr)
+                with self.data_lock:
+                    self.seek_index[idx] = timestamp_msec
+                    self.data.append((self.get_abs_path(idx), img_np))
+                idx += 1
+                time.sleep(self.cfg['threads']['io_sleep'])
+            capture.release()
+            # stop if the video holds fewer frames than its header reports, the data list must stay aligned with the frame indices
+            if self.stop.is_set() or idx < self.video_frame_offsets[video_idx + 1]: break
 
     def __len__(self):
         """
@@ -120,12 +275,16 @@ class FileIO:
                 return self.data[idx]
         except:
             file_abs_path = self.get_abs_path(idx)
-            # return the file absolute path and the image data
-            return (file_abs_path, self.reader(file_abs_path))
+            # return the file absolute path and the image data, video frames are read by their index
+            return (file_abs_path, self.reader(idx if self.is_video else file_abs_path))
 
     def close(self):
         """
         Stops the asynchronous reading process.
 
         """
-        self.stop.set()
\ No newline at end of file
+        self.stop.set()
+        if self.is_video:
+            with self.seek_lock:
+                if self.seek_capture is not None: self.seek_capture.release()
+                self.seek_capture, self.seek_video_idx = None, -1
\ No newline at end of file
@@ -3,6 +3,8 @@ import cv2
 import numpy as np
 
 from gui.logger_gui import Logger
+from calib import utils as calib_utils
+from lbl.label_list import get_bbox_corners, bbox_corner_edges, get_track_colors
 
 class ImageVisualizer:
     """
@@ -98,95 +100,65 @@ class ImageVisualizer:
         if "current_image_numpy" not in data_dict:
             logger.log(f'[img->viz.py->ImageVisualizer->update]: current_image_numpy not found in data_dict', Logger.DEBUG)
             return
-        self.img = o3d.geometry.Image(data_dict['current_image_numpy'])
+        img_np = data_dict['current_image_numpy']
+        # images read with data:camera:color_order 'bgr' are converted for display, open3d shows RGB
+        camera_cfg = self.cfg['data']['camera']
+        if camera_cfg['enabled'] and camera_cfg.get('color_order', 'rgb').lower() == 'bgr': img_np = cv2.cvtColor(img_np, cv2.COLOR_BGR2RGB)
+        self.img = o3d.geometry.Image(img_np)
         self.__add_geometry__('image', self.img, False)
         
         if "current_label_list" not in data_dict: return
         if "current_calib_data" not in data_dict: return
         clb = data_dict['current_calib_data']
-        for lbl in data_dict['current_label_list']:
-            self.__add_bbox__(lbl, clb)
+        self.__add_bboxes__(data_dict['current_label_list'], clb)
         
-    def __add_bbox__(self, label_dict, calib_dict):
+    def __add_bboxes__(self, label_list, calib_dict):
         """
-        Adds a bounding box to the visualizer.
+        Adds the bounding boxes of all the labels to the visualizer, the corners of all the boxes are projected at once.
 
         Args:
-            label_dict (dict): A dictionary containing the label information.
+            label_list (list): A list of dictionaries containing the label information.
             calib_dict (dict): A dictionary containing the calibration information.
         """
-        if 'camera_bbox' not in label_dict: return
+        camera_bbox_dicts = [label_dict['camera_bbox'] for label_dict in label_list if 'camera_bbox' in label_dict]
+        if len(camera_bbox_dicts) == 0 or calib_dict is None: return
+        track_ids = np.array([label_dict.get('track_id', -1) for label_dict in label_list if 'camera_bbox' in label_dict], dtype=np.int64)
         # bbox parameters
-        camera_bbox_dict = label_dict['camera_bbox']
-        lidar_xyz_center = camera_bbox_dict['lidar_xyz_center']
-        lidar_xyz_extent = camera_bbox_dict['lidar_xyz_extent']
-        lidar_xyz_euler_angles = camera_bbox_dict['lidar_xyz_euler_angles']
-        if camera_bbox_dict['predicted']:
-            color = camera_bbox_dict['rgb_bbox_color']
-        else:
-            color = camera_bbox_dict['rgb_bbox_color'] * 0.5 # darker color for ground truth
+        lidar_xyz_centers = np.array([camera_bbox_dict['lidar_xyz_center'] for camera_bbox_dict in camera_bbox_dicts], dtype=np.float64).reshape(-1, 3)
+        lidar_xyz_extents = np.array([camera_bbox_dict['lidar_xyz_extent'] for camera_bbox_dict in camera_bbox_dicts], dtype=np.float64).reshape(-1, 3)
+        lidar_xyz_euler_angles = np.array([camera_bbox_dict['lidar_xyz_euler_angles'] for camera_bbox_dict in camera_bbox_dicts], dtype=np.float64).reshape(-1, 3)
+        colors = np.array([camera_bbox_dict['rgb_bbox_color'] for camera_bbox_dict in camera_bbox_dicts], dtype=np.float64).reshape(-1, 3)
+        predicted = np.array([camera_bbox_dict['predicted'] for camera_bbox_dict in camera_bbox_dicts], dtype=bool)
+        colors[track_ids >= 0] = get_track_colors(track_ids[track_ids >= 0]) * 255.0 # tracked boxes keep the color of their track across frames
+        colors[~predicted] *= 0.5 # darker color for ground truth
         
         # calib parameters
-        P2 = calib_dict['P2']
-        if 'R0_rect' in calib_dict: R0_rect = calib_dict['R0_rect']
-        Tr_velo_to_cam = calib_dict['Tr_velo_to_cam']
-        
-        # transforms
-        rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(lidar_xyz_euler_angles)
-        translation_matrix = lidar_xyz_center.reshape([-1,1])
-        Rt = np.concatenate([rotation_matrix,translation_matrix], axis=-1)
-        Rt_4x4 = np.concatenate([Rt, np.array([0,0,0,1], dtype=np.float32).reshape([1,-1])], axis=0)
-        
-        # 3D bbox
-        pt_x = lidar_xyz_extent[0]/2
-        pt_y = lidar_xyz_extent[1]/2
-        pt_z = lidar_xyz_extent[2]/2
-        # define 3D bounding box
-        bbox_in_local_coords = np.array([
-            pt_x, pt_y, -pt_z, 1,   pt_x, -pt_y, -pt_z, 1,  #front-left-bottom, front-right-bottom
-            pt_x, -pt_y, pt_z, 1,   pt_x, pt_y, pt_z, 1,    #front-right-top,   front-left-top
-
-            -pt_x, pt_y, -pt_z, 1,   -pt_x, -pt_y, -pt_z, 1,#rear-left-bottom, rear-right-bottom
-            -pt_x, -pt_y, pt_z, 1,   -pt_x, pt_y, pt_z, 1,  #rear-right-top,   rear-left-top
-            
-            #middle plane
-            #0, y, -z, 1,   0, -y, -z, 1,  #rear-left-bottom, rear-right-bottom
-            #0, -y, z, 1,   0, y, z, 1,    #rear-right-top,   rear-left-top
-        ], dtype=np.float32).reshape((-1,4))
-        
-        # add rotation and translation
-        bbox_in_world_coords = Rt_4x4 @ bbox_in_local_coords.T
-        # project to camera coordinates
-        bbox_pts_in_camera_coords = Tr_velo_to_cam @ bbox_in_world_coords
-        # rect matrix shall be applied here, for kitti
-        if 'R0_rect' in calib_dict: bbox_pts_in_camera_coords = R0_rect @ bbox_pts_in_camera_coords
-        # if any point is behind camera, return
-        if np.any(bbox_pts_in_camera_coords[2] < 0): return None
-        # project to image pixel coordinates
-        bbox_pts_in_image_pixel_coords = P2 @ bbox_pts_in_camera_coords
-        # normalize
-        points_in_image = bbox_pts_in_image_pixel_coords[0:2,:] / bbox_pts_in_image_pixel_coords[2:,:]
+        calib_dict = calib_utils.add_derived_matrices(calib_dict)
+        # P2 is already scaled to the image preview scale by the calib FileIO
+        Tr_velo_to_pixel = calib_dict['Tr_velo_to_pixel']
+        # depth row of the rectified camera coordinates
+        Tr_velo_to_depth = (calib_dict['R0_rect_f32'].astype(np.float64) @ calib_dict['Tr_velo_to_cam_f32'].astype(np.float64))[2]
+        
+        # 3D bbox corners of all the boxes, N x 8 x 3, in homogeneous coordinates
+        corners = get_bbox_corners(lidar_xyz_centers, lidar_xyz_extents, lidar_xyz_euler_angles)
+        corners = np.concatenate([corners, np.ones(corners.shape[:2] + (1,))], axis=-1)
+        # boxes with any corner behind the camera are skipped
+        in_front = np.all(corners @ Tr_velo_to_depth >= 0, axis=1)
+        if not np.any(in_front): return
+        corners, colors = corners[in_front], colors[in_front]
+        # project to image pixel coordinates and normalize
+        bbox_pts_in_image_pixel_coords = corners @ Tr_velo_to_pixel.T
+        points_in_image = bbox_pts_in_image_pixel_coords[..., 0:2] / bbox_pts_in_image_pixel_coords[..., 2:3]
         
         # the image to draw on
         img_np = np.asarray(self.img)
         
-        # draw
-        points_in_image = points_in_image.T
+        # draw, one call per box with the 12 edges as separate line segments
         pts = np.int32(points_in_image)
-        color = color.tolist()
-        cv2.line(img_np,tuple(pts[0]),tuple(pts[1]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[1]),tuple(pts[2]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[2]),tuple(pts[3]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[3]),tuple(pts[0]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        # cv2.fillPoly(img_np, [pts[0:4].reshape((-1,1,2))],color)
-        cv2.line(img_np,tuple(pts[4]),tuple(pts[5]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[5]),tuple(pts[6]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[6]),tuple(pts[7]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[7]),tuple(pts[4]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[0]),tuple(pts[4]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[1]),tuple(pts[5]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[2]),tuple(pts[6]),color,self.cfg['visualization']['camera']['bbox_line_width'])
-        cv2.line(img_np,tuple(pts[3]),tuple(pts[7]),color,self.cfg['visualization']['camera']['bbox_line_width'])
+        edges = np.asarray(bbox_corner_edges)
+        bbox_line_width = self.cfg['visualization']['camera']['bbox_line_width']
+        for box_pts, color in zip(pts, colors.tolist()):
+            cv2.polylines(img_np, list(box_pts[edges]), False, color, bbox_line_width)
         
         # add to visualizer
         self.img = o3d.geometry.Image(img_np)
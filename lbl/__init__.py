@@ -71,4 +71,8 @@ def Handler(label_path: str, calib_data: dict):
 ```
 
 Ensure that the Handler function reads the label file specified by label_path and returns the label data as a list of dictionaries. Each dictionary should contain information about the label, including the bounding box coordinates and object class.
+
+Handlers may also return a `LabelList` (from `lbl.label_list`), a list of the same dictionaries that additionally carries the bounding boxes as NumPy columns (centers, extents, euler angles, colors, class ids, etc.). Building it with `LabelList.from_columns(centers, extents, euler_angles, colors, class_names, labels=output)` adds the `lidar_bbox` dictionaries as views into the columns, so algorithms such as `remove_out_of_bound_labels` and the visualizers can work on all the boxes at once. Plain lists are converted with `LabelList.from_labels` where needed.
+
+To also support datasets read directly from `.zip`/`.tar` archives, use `archive_io.exists` and `archive_io.open` (from `archive import file_io as archive_io`) in place of `os.path.exists` and `open`.
 """
\ No newline at end of file
@@ -1,8 +1,9 @@
 import os
-import glob
 import time
 import threading
 
+from archive import file_io as archive_io
+
 lbl_dir = os.path.dirname(os.path.realpath(__file__))
 
 supported_label_types = [lbl_handler.split('_')[1].replace('.py','') for lbl_handler in os.listdir(lbl_dir) if 'handler' in lbl_handler]
@@ -56,7 +57,7 @@ class FileIO:
         self.clb_reader = calib_reader
         
         # Get all label files in the directory
-        files = glob.glob(os.path.join(self.lbl_dir, '*' + self.lbl_ext))
+        files = archive_io.glob(os.path.join(self.lbl_dir, '*' + self.lbl_ext))
         # Get the basenames of the label files and sort them
         file_basenames = [os.path.splitext(os.path.basename(file))[0] for file in files]
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
@@ -156,7 +157,7 @@ class FileIO:
         self.lbl_ext, self.reader = h.label_file_extension, h.Handler
         self.clb_reader = calib_reader
         
-        files = glob.glob(os.path.join(self.lbl_dir, '*' + self.lbl_ext))
+        files = archive_io.glob(os.path.join(self.lbl_dir, '*' + self.lbl_ext))
         file_basenames = [os.path.splitext(os.path.basename(file))[0] for file in files]
         # Sort the file basenames based on the numbers in the filenames
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
@@ -1,5 +1,11 @@
 import os
 import numpy as np
+from numpy.lib import recfunctions as rfn
+
+from archive import file_io as archive_io
+from calib.utils import add_derived_matrices
+from lbl.label_list import LabelList
+from lbl.utils import read_text_table
 
 colors = {
     'Car': [0, 1, 0],
@@ -14,6 +20,9 @@ colors = {
 }
 label_file_extension = '.txt'
 
+# one record per object, as laid out in the KITTI label files, parsed from the string table with a single astype (occlusion is parsed as a float so that '0.0' is accepted)
+label_dtype = np.dtype([('class', 'U32'), ('truncation', np.float64), ('occlusion', np.float64), ('alpha', np.float64), ('image_0_bbox2d', np.float64, (4,)), ('hwl', np.float64, (3,)), ('image_0_xyz', np.float64, (3,)), ('image_0_ry', np.float64)])
+
 import os
 import numpy as np
 
@@ -26,66 +35,55 @@ def Handler(label_path: str, calib_data: dict):
         calib_data (dict): Calibration data.
 
     Returns:
-        list: List of labels.
+        LabelList: List of labels.
 
     """
-    output = []
+    output = LabelList()
 
     if calib_data is None:
         return output
 
-    transform_from_lidar_to_image_0 = calib_data['Tr_velo_to_cam']
-    transform_from_image_0_to_lidar = np.linalg.inv(transform_from_lidar_to_image_0)
+    # float64 inverse of Tr_velo_to_cam, computed once per calibration
+    transform_from_image_0_to_lidar = add_derived_matrices(calib_data)['Tr_cam_to_velo']
     
     # Read label file
-    if not os.path.exists(label_path):
+    if not archive_io.exists(label_path):
         return output
-    with open(label_path, 'r') as f:
-        lbls = f.readlines()
+    table = read_text_table(label_path, 15)
+    
+    # convert all the columns at once into one record per object
+    # class: [Car, Van, Truck, Pedestrian, Person_sitting, Cyclist, Tram, Misc, DontCare], truncation: truncated pixel ratio [0..1], occlusion: 0 fully visible, 1 partly occluded, 2 fully occluded, 3 unknown,
+    # alpha: object observation angle [-pi..pi], image_0_bbox2d: 0-based 2D bounding box of object in the image, hwl: height, width, length in meters,
+    # image_0_xyz: location of object center in camera coordinates, image_0_ry: rotation around Y-axis in camera coordinates [-pi..pi]
+    lbls = rfn.unstructured_to_structured(table, dtype=label_dtype)
+    height, width, length = lbls['hwl'].T
+    
+    # project all the centers to lidar coordinates with a single float64 matmul, cast to float32 afterwards
+    lidar_xyz_centers = lbls['image_0_xyz'] @ transform_from_image_0_to_lidar[:3, :3].T + transform_from_image_0_to_lidar[:3, 3]
+    # Adjust the height of the bounding box since the origin of the lidar coordinates is at the bottom of the vehicle
+    lidar_xyz_centers[:, 2] += height / 2.0
+    lidar_xyz_centers = lidar_xyz_centers.astype(np.float32)
+    # w l h -> x y z
+    lidar_xyz_extents = np.stack([width, length, height], axis=1)
+    lidar_xyz_euler_angles = np.zeros_like(lidar_xyz_centers)
+    lidar_xyz_euler_angles[:, 2] = -lbls['image_0_ry']
+    class_names = lbls['class'].tolist()
+    lidar_bbox_colors = np.array([colors.get(obj_class, colors['DontCare']) for obj_class in class_names], dtype=np.float32).reshape(-1, 3)
     
-    for line in lbls:
-        parts = line.strip().split(' ')
-        obj_class = parts[0]  # Object class [Car, Van, Truck, Pedestrian, Person_sitting, Cyclist, Tram, Misc, DontCare]
-        truncation = float(parts[1])  # Truncated pixel ratio [0..1]
-        occlusion = int(parts[2])  # 0: fully visible, 1: partly occluded, 2: fully occluded, 3: unknown
-        alpha = float(parts[3])  # Object observation angle [-pi..pi]
-        left, top, right, bottom = np.array([float(x) for x in parts[4:8]], dtype=np.float32)  # 0-based 2D bounding box of object in the image
-        height, width, length = np.array([float(x) for x in parts[8:11]], dtype=np.float32)  # Height, width, length in meters
-        image_0_xyz = np.array([float(x) for x in parts[11:14]], dtype=np.float32)  # Location of object center in camera coordinates
-        image_0_ry = float(parts[14])  # Rotation around Y-axis in camera coordinates [-pi..pi]
-        
+    # per-object dictionaries, kept for algorithms that work on individual labels
+    labels = []
+    for obj_class, truncation, occlusion, alpha, image_0_bbox2d, hwl, image_0_xyz, image_0_ry in zip(class_names, lbls['truncation'].tolist(), lbls['occlusion'].astype(np.int32).tolist(), lbls['alpha'].tolist(), lbls['image_0_bbox2d'].tolist(), lbls['hwl'].tolist(), lbls['image_0_xyz'].astype(np.float32), lbls['image_0_ry'].tolist()):
         label = dict()
         label['class'] = obj_class
         label['truncation'] = truncation
         label['occlusion'] = occlusion
         label['alpha'] = alpha
-        label['image_0_bbox2d'] = [left, top, right, bottom]
-        label['obj_height'] = height
-        label['obj_width'] = width
-        label['obj_length'] = length
+        label['image_0_bbox2d'] = image_0_bbox2d
+        label['obj_height'], label['obj_width'], label['obj_length'] = hwl
         label['image_0_xyz'] = image_0_xyz
         label['image_0_ry'] = image_0_ry
-        
-        # project to lidar coordinates
-        lidar_xyz_center = transform_from_image_0_to_lidar @ np.append(image_0_xyz, 1).reshape(4, 1)
-        lidar_xyz_center = lidar_xyz_center.T[0]
-        lidar_xyz_center = lidar_xyz_center[:3]
-        # Adjust the height of the bounding box since the origin of the lidar coordinates is at the bottom of the vehicle
-        lidar_xyz_center[2] += height / 2.0
-        # w l h -> x y z
-        lidar_xyz_extent = np.array([width, length, height], dtype=np.float32)
-        lidar_xyz_euler_angles = np.array([0, 0, -image_0_ry], dtype=np.float32)
-        lidar_bbox_color = np.array(colors[obj_class], dtype=np.float32)
-        
-        # visualzer expect lidar_bbox to be present in order to visualize the bounding boxes, so we add them here
-        label['lidar_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': lidar_bbox_color, 'predicted': False}
-        
-        # camera colors are in the range 0-255
-        camera_bbox_color = np.array([i * 255.0 for i in colors[obj_class]], dtype=np.uint8)
-        
-        # visualzer expect camera_bbox to be present in order to visualize the bounding boxes, so we add them here
-        label['camera_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': camera_bbox_color, 'predicted': False}
-        
-        output.append(label)
+        labels.append(label)
     
-    return output
\ No newline at end of file
+    # visualzer expect lidar_bbox and camera_bbox to be present in order to visualize the bounding boxes, from_columns adds them as views into the columns
+    # camera colors are in the range 0-255
+    return LabelList.from_columns(lidar_xyz_centers, lidar_xyz_extents, lidar_xyz_euler_angles, lidar_bbox_colors, class_names, predicted=False, labels=labels, camera_colors=lidar_bbox_colors * 255.0)
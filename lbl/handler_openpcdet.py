@@ -1,6 +1,10 @@
 import os
 import numpy as np
 
+from archive import file_io as archive_io
+from lbl.label_list import LabelList
+from lbl.utils import read_text_table
+
 colors = {'Green': [0, 1, 0]}
 label_file_extension = '.txt'
 
@@ -16,48 +20,26 @@ def Handler(label_path: str, calib_data: dict):
         calib_data (dict): Calibration data.
 
     Returns:
-        list: A list of dictionaries representing the labels.
+        LabelList: A list of dictionaries representing the labels.
     """
-    output = []
+    output = LabelList()
     
     # Check if the label file exists
-    if os.path.exists(label_path) == False:
+    if archive_io.exists(label_path) == False:
         return output
     
-    # Read the label file
-    with open(label_path, 'r') as f:
-        lbls = f.readlines()
+    # Read the label file and convert all the columns at once
+    table = read_text_table(label_path, 8)
+    xyz_dxdydz_rz = table[:, 0:7].astype(np.float64)
+    class_names = table[:, 7].tolist()
     
-    for line in lbls:
-        parts = line.strip().split(' ')
-        xyz_dxdydz_rz = np.array([float(i) for i in parts[0:7]], dtype=np.float32)
-        obj_class = parts[7]
-        
-        # Create a dictionary to store the label information
-        label = dict()
-        label['x'] = xyz_dxdydz_rz[0]
-        label['y'] = xyz_dxdydz_rz[1]
-        label['z'] = xyz_dxdydz_rz[2]
-        label['dx'] = xyz_dxdydz_rz[3]
-        label['dy'] = xyz_dxdydz_rz[4]
-        label['dz'] = xyz_dxdydz_rz[5]
-        label['heading_angle'] = xyz_dxdydz_rz[6]
-        label['category_name'] = obj_class
-        
-        lidar_xyz_center = xyz_dxdydz_rz[0:3]
-        lidar_xyz_extent = xyz_dxdydz_rz[3:6]
-        lidar_xyz_euler_angles = np.array([0, 0, xyz_dxdydz_rz[6]], dtype=np.float32)
-        lidar_bbox_color = np.array(colors['Green'], dtype=np.float32)
-        
-        # Create a dictionary to store the lidar bounding box information
-        label['lidar_bbox'] = {
-            'lidar_xyz_center': lidar_xyz_center,
-            'lidar_xyz_extent': lidar_xyz_extent,
-            'lidar_xyz_euler_angles': lidar_xyz_euler_angles,
-            'rgb_bbox_color': lidar_bbox_color,
-            'predicted': False
-        }
-        
-        output.append(label)
+    # Create a dictionary per object to store the label information
+    labels = []
+    for (x, y, z, dx, dy, dz, heading_angle), obj_class in zip(xyz_dxdydz_rz.tolist(), class_names):
+        labels.append({'x': x, 'y': y, 'z': z, 'dx': dx, 'dy': dy, 'dz': dz, 'heading_angle': heading_angle, 'category_name': obj_class})
     
-    return output
\ No newline at end of file
+    # lidar_bbox dictionaries are added by from_columns as views into the columns
+    euler_angles = np.zeros((len(labels), 3), dtype=np.float32)
+    euler_angles[:, 2] = xyz_dxdydz_rz[:, 6]
+    bbox_colors = np.tile(np.array(colors['Green'], dtype=np.float32), (len(labels), 1))
+    return LabelList.from_columns(xyz_dxdydz_rz[:, 0:3], xyz_dxdydz_rz[:, 3:6], euler_angles, bbox_colors, class_names, predicted=False, labels=labels)
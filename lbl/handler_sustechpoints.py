@@ -1,5 +1,8 @@
 import os
 import numpy as np
+
+from archive import file_io as archive_io
+from lbl.label_list import LabelList
 import json
 
 colors = {
@@ -33,16 +36,17 @@ def Handler(label_path: str, calib_data: dict):
         calib_data (dict): Calibration data.
 
     Returns:
-        list: A list of labels.
+        LabelList: A list of labels.
 
     """
-    output = []
+    output = LabelList()
+    centers, extents, euler_angles, camera_bbox_colors, class_names = [], [], [], [], []
         
     # Read label file
-    if os.path.exists(label_path) == False:
+    if archive_io.exists(label_path) == False:
         return output
     
-    with open(label_path, 'r') as f:
+    with archive_io.open(label_path, 'r') as f:
         lbls = json.load(f)
     
     for item in lbls:
@@ -62,40 +66,16 @@ def Handler(label_path: str, calib_data: dict):
         label['obj_type'] = obj_type
         label['psr'] = psr
                   
-        lidar_xyz_center = psr_position_xyz.copy()
-        lidar_xyz_extent = psr_scale_xyz.copy()
-        lidar_xyz_euler_angles = psr_rotation_xyz.copy()
-
-        # create color for the bounding box
-        if obj_type in colors:
-            lidar_bbox_color = np.array([i / 255.0 for i in colors[obj_type]], dtype=np.float32)
-        else:
-            lidar_bbox_color = np.array([0, 0, 0], dtype=np.float32)
-        
-        # Create a dictionary to store the lidar bounding box information
-        label['lidar_bbox'] = {
-            'lidar_xyz_center': lidar_xyz_center,
-            'lidar_xyz_extent': lidar_xyz_extent,
-            'lidar_xyz_euler_angles': lidar_xyz_euler_angles,
-            'rgb_bbox_color': lidar_bbox_color,
-            'predicted': False
-        }
-        
-        if obj_type in colors:
-            camera_bbox_color = np.array(colors[obj_type], dtype=np.uint8)
-        else:
-            camera_bbox_color = np.array([0, 0, 0], dtype=np.uint8)
-        
-        # Create a dictionary to store the camera bounding box information
-        label['camera_bbox'] = {
-            'lidar_xyz_center': lidar_xyz_center,
-            'lidar_xyz_extent': lidar_xyz_extent,
-            'lidar_xyz_euler_angles': lidar_xyz_euler_angles,
-            'rgb_bbox_color': camera_bbox_color,
-            'predicted': False
-        }
+        # create color for the bounding box, camera colors are in the range 0-255
+        camera_bbox_colors.append(colors[obj_type] if obj_type in colors else (0, 0, 0))
         
         # Append the label to the output list
         output.append(label)
+        centers.append(psr_position_xyz)
+        extents.append(psr_scale_xyz)
+        euler_angles.append(psr_rotation_xyz)
+        class_names.append(obj_type)
     
-    return output
\ No newline at end of file
+    # lidar_bbox and camera_bbox dictionaries are added by from_columns as views into the columns
+    camera_bbox_colors = np.array(camera_bbox_colors, dtype=np.float32).reshape(-1, 3)
+    return LabelList.from_columns(centers, extents, euler_angles, camera_bbox_colors / 255.0, class_names, predicted=False, labels=output, camera_colors=camera_bbox_colors)
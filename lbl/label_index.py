@@ -0,0 +1,255 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from archive import file_io as archive_io
+from lbl.label_list import LabelList, count_points_in_bboxes
+
+"""
+The module label_index.py builds a dataset-wide index of all the labels, so questions like "which frames contain a Cyclist within 20 m" are answered without reading every label file again.
+The index is a columnar table with one row per object (frame index, class id, center, extent, yaw, and optionally the number of points inside the box) plus a bird's-eye-view grid over the centers. It is persisted next to the dataset as `<data:path>.<label_subdir>_index.npz`.
+
+### Usage:
+
+```python
+from lbl.file_io import FileIO as LBL_File_IO
+from lbl.label_index import LabelIndex
+
+lbl_io = LBL_File_IO(cfg, clb_io.__getitem__)
+index = LabelIndex.get_or_build(cfg, lbl_io)
+frames = index.query(class_name='Cyclist', radius=20)
+```
+"""
+
+class LabelIndex:
+    """
+    Columnar index of the labels of a dataset with a bird's-eye-view grid over the box centers.
+
+    Args:
+        columns (dict): The columns, see Attributes.
+        class_names (list): Unique class names, indexed by class_ids.
+        frame_names (list): Basenames of the label files, indexed by frame_ids.
+        grid_size (float): Side length of the bird's-eye-view grid cells in meters.
+        file_stamps (np.ndarray, optional): Size and modification time of the label files, see `get_file_stamps`.
+
+    Attributes:
+        frame_ids (np.ndarray): Frame index of each object, (N,) int32.
+        class_ids (np.ndarray): Index into class_names of each object, (N,) int32.
+        centers (np.ndarray): Box centers in lidar coordinates, (N, 3) float32.
+        extents (np.ndarray): Box extents, (N, 3) float32.
+        yaws (np.ndarray): Box rotations around the z-axis, (N,) float32.
+        num_points (np.ndarray): Number of points inside each box, (N,) int32, -1 if not counted.
+        cell_keys (np.ndarray): Sorted keys of the non-empty grid cells; the rows are sorted by cell so the objects of cell_keys[i] are the rows cell_starts[i]:cell_starts[i + 1].
+        cell_starts (np.ndarray): First row of each non-empty grid cell, with the number of rows appended.
+        file_stamps (np.ndarray): Size and modification time in nanoseconds of each label file the index was built from, (num_frames, 2) int64, used to detect edited label files.
+
+    """
+    column_names = ['frame_ids', 'class_ids', 'centers', 'extents', 'yaws', 'num_points']
+    # cell coordinates are offset so that they are non-negative before packing them into one key
+    cell_offset = 1 << 20
+
+    def __init__(self, columns: dict, class_names: list, frame_names: list, grid_size: float = 10.0, file_stamps: np.ndarray = None):
+        self.class_names = list(class_names)
+        self.frame_names = list(frame_names)
+        self.grid_size = float(grid_size)
+        self.file_stamps = np.zeros((0, 2), dtype=np.int64) if file_stamps is None else np.asarray(file_stamps, dtype=np.int64).reshape(-1, 2)
+
+        # sort the rows by grid cell so that each cell is a contiguous row range
+        cell_keys = self.__get_cell_keys__(np.floor(columns['centers'][:, 0] / self.grid_size).astype(np.int64), np.floor(columns['centers'][:, 1] / self.grid_size).astype(np.int64))
+        order = np.argsort(cell_keys, kind='stable')
+        for name in self.column_names: setattr(self, name, np.ascontiguousarray(columns[name][order]))
+        self.cell_keys, cell_starts = np.unique(cell_keys[order], return_index=True)
+        self.cell_starts = np.append(cell_starts, len(order)).astype(np.int64)
+
+    def __get_cell_keys__(self, cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        return ((cell_x + self.cell_offset) << 21) | (cell_y + self.cell_offset)
+
+    def __len__(self) -> int:
+        return len(self.frame_ids)
+
+    @staticmethod
+    def get_index_path(cfg: dict) -> str:
+        """
+        Returns the path the index of a dataset is persisted at, next to the dataset directory (or archive).
+
+        Args:
+            cfg (dict): Configuration dictionary.
+
+        Returns:
+            str: Path of the index file.
+
+        """
+        return os.path.normpath(cfg['data']['path']) + f".{cfg['data']['label_subdir']}_index.npz"
+
+    @staticmethod
+    def get_file_stamps(lbl_io) -> np.ndarray:
+        """
+        Returns the size and modification time of each label file, label files inside an archive are stamped with the archive itself.
+
+        Args:
+            lbl_io (lbl.file_io.FileIO): The label reader of the dataset.
+
+        Returns:
+            np.ndarray: Size and modification time in nanoseconds of each label file, (num_frames, 2) int64, zeros for missing files.
+
+        """
+        file_stamps = np.zeros((len(lbl_io), 2), dtype=np.int64)
+        for idx in range(len(lbl_io)):
+            lbl_abs_path = lbl_io.get_abs_path(idx)
+            archive_path, _ = archive_io.split_archive_path(lbl_abs_path)
+            try: stat = os.stat(archive_path if archive_path is not None else lbl_abs_path)
+            except OSError: continue
+            file_stamps[idx] = stat.st_size, stat.st_mtime_ns
+        return file_stamps
+
+    @classmethod
+    def build(cls, lbl_io, num_workers: int = 4, pcd_io = None, grid_size: float = 10.0):
+        """
+        Reads all the label files of a dataset in parallel and builds the index.
+
+        Args:
+            lbl_io (lbl.file_io.FileIO): The label reader of the dataset.
+            num_workers (int): Number of threads reading the label files.
+            pcd_io (pcd.file_io.FileIO, optional): The point cloud reader of the dataset, if given the points inside each box are counted.
+            grid_size (float): Side length of the bird's-eye-view grid cells in meters.
+
+        Returns:
+            LabelIndex: The index.
+
+        """
+        # stamped before reading, so that files edited while building invalidate the index
+        file_stamps = cls.get_file_stamps(lbl_io)
+        def read_frame(idx):
+            lbl_abs_path = lbl_io.get_abs_path(idx)
+            label_list = LabelList.from_labels(lbl_io.reader(lbl_abs_path, lbl_io.clb_reader(idx)[1] if lbl_io.clb_reader else None))
+            label_list = label_list.select(label_list.has_lidar_bbox)
+            num_points = np.full(len(label_list), -1, dtype=np.int32)
+            if pcd_io is not None and len(label_list) > 0:
+                point_cloud = pcd_io.reader(pcd_io.get_abs_path(idx))
+                num_points = count_points_in_bboxes(point_cloud[:, :3], label_list.centers, label_list.extents, label_list.euler_angles)
+            return label_list, num_points
+
+        # the frames are read in parallel but collected in order
+        with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor: frames = list(executor.map(read_frame, range(len(lbl_io))))
+
+        # map the per-frame class ids to dataset-wide class ids
+        class_names = sorted(set(class_name for label_list, _ in frames for class_name in label_list.class_names))
+        class_name_to_id = {class_name: i for i, class_name in enumerate(class_names)}
+        columns = {name: [] for name in cls.column_names}
+        for frame_id, (label_list, num_points) in enumerate(frames):
+            frame_class_ids = np.array([class_name_to_id[class_name] for class_name in label_list.class_names], dtype=np.int32)
+            columns['frame_ids'].append(np.full(len(label_list), frame_id, dtype=np.int32))
+            columns['class_ids'].append(frame_class_ids[label_list.class_ids] if len(label_list) else np.zeros(0, dtype=np.int32))
+            columns['centers'].append(label_list.centers)
+            columns['extents'].append(label_list.extents)
+            columns['yaws'].append(label_list.yaws)
+            columns['num_points'].append(num_points)
+        empty = {'frame_ids': np.zeros(0, dtype=np.int32), 'class_ids': np.zeros(0, dtype=np.int32), 'centers': np.zeros((0, 3), dtype=np.float32), 'extents': np.zeros((0, 3), dtype=np.float32), 'yaws': np.zeros(0, dtype=np.float32), 'num_points': np.zeros(0, dtype=np.int32)}
+        columns = {name: np.concatenate(column) if len(column) else empty[name] for name, column in columns.items()}
+        return cls(columns, class_names, lbl_io.files_basenames, grid_size, file_stamps)
+
+    def save(self, index_path: str):
+        """
+        Persists the index as an uncompressed .npz file.
+
+        Args:
+            index_path (str): Path of the index file.
+
+        """
+        np.savez(index_path, class_names=np.asarray(self.class_names, dtype=str), frame_names=np.asarray(self.frame_names, dtype=str), grid_size=self.grid_size, file_stamps=self.file_stamps, **{name: getattr(self, name) for name in self.column_names})
+
+    @classmethod
+    def load(cls, index_path: str):
+        """
+        Loads a persisted index.
+
+        Args:
+            index_path (str): Path of the index file.
+
+        Returns:
+            LabelIndex: The index.
+
+        """
+        with np.load(index_path) as f:
+            return cls({name: f[name] for name in cls.column_names}, f['class_names'].tolist(), f['frame_names'].tolist(), float(f['grid_size']), f['file_stamps'] if 'file_stamps' in f.files else None)
+
+    @classmethod
+    def get_or_build(cls, cfg: dict, lbl_io, pcd_io = None, rebuild: bool = False, grid_size: float = 10.0):
+        """
+        Loads the persisted index of a dataset, or builds and persists it if it does not exist, was built for other label files, any label file changed in size or modification time since, or rebuild is True.
+
+        Args:
+            cfg (dict): Configuration dictionary.
+            lbl_io (lbl.file_io.FileIO): The label reader of the dataset.
+            pcd_io (pcd.file_io.FileIO, optional): The point cloud reader of the dataset, if given the points inside each box are counted.
+            rebuild (bool): Set True to rebuild the index, e.g. after the label files were edited.
+            grid_size (float): Side length of the bird's-eye-view grid cells in meters.
+
+        Returns:
+            LabelIndex: The index.
+
+        """
+        index_path = cls.get_index_path(cfg)
+        if not rebuild and os.path.exists(index_path):
+            index = cls.load(index_path)
+            if index.frame_names == list(lbl_io.files_basenames) and np.array_equal(index.file_stamps, cls.get_file_stamps(lbl_io)) and (pcd_io is None or len(index) == 0 or np.all(index.num_points >= 0)): return index
+        index = cls.build(lbl_io, cfg['threads'].get('io_workers', 4), pcd_io, grid_size)
+        try: index.save(index_path)
+        except OSError: pass # read-only dataset location, the index is kept in memory only
+        return index
+
+    def __get_rows_in_radius__(self, center, radius: float) -> np.ndarray:
+        """
+        Returns the rows whose box centers are within a radius (in bird's-eye view) of a point, only the grid cells overlapping the radius are scanned.
+
+        """
+        cell_min = np.floor((np.asarray(center[:2], dtype=np.float64) - radius) / self.grid_size).astype(np.int64)
+        cell_max = np.floor((np.asarray(center[:2], dtype=np.float64) + radius) / self.grid_size).astype(np.int64)
+        num_cells = (cell_max - cell_min + 1).prod()
+        if num_cells >= len(self.cell_keys):
+            rows = np.arange(len(self), dtype=np.int64) # the radius covers more cells than are occupied, scanning all the rows is cheaper
+        else:
+            cell_x, cell_y = np.meshgrid(np.arange(cell_min[0], cell_max[0] + 1), np.arange(cell_min[1], cell_max[1] + 1), indexing='ij')
+            keys = self.__get_cell_keys__(cell_x.ravel(), cell_y.ravel())
+            cells = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+            cells = cells[self.cell_keys[cells] == keys] # keep the occupied cells only
+            rows = np.concatenate([np.arange(self.cell_starts[cell], self.cell_starts[cell + 1]) for cell in cells]) if len(cells) else np.zeros(0, dtype=np.int64)
+        distances = np.linalg.norm(self.centers[rows, :2] - np.asarray(center[:2], dtype=np.float32), axis=1)
+        return rows[distances <= radius]
+
+    def query_rows(self, class_name = None, center = (0, 0), radius: float = None, min_extent = None, max_extent = None, min_points: int = None) -> np.ndarray:
+        """
+        Returns the rows (objects) matching all the given conditions.
+
+        Args:
+            class_name (str or list, optional): Class name(s) the objects must have.
+            center (tuple): Center (x, y) of the radius query in lidar coordinates.
+            radius (float, optional): Maximum bird's-eye-view distance of the box centers from center.
+            min_extent (list, optional): Minimum box extent along x, y, and z.
+            max_extent (list, optional): Maximum box extent along x, y, and z.
+            min_points (int, optional): Minimum number of points inside the box, requires the index to be built with pcd_io.
+
+        Returns:
+            np.ndarray: Row indices into the columns.
+
+        """
+        rows = self.__get_rows_in_radius__(center, radius) if radius is not None else np.arange(len(self), dtype=np.int64)
+        mask = np.ones(len(rows), dtype=bool)
+        if class_name is not None:
+            class_names = [class_name] if isinstance(class_name, str) else list(class_name)
+            class_ids = [self.class_names.index(name) for name in class_names if name in self.class_names]
+            mask &= np.isin(self.class_ids[rows], class_ids)
+        if min_extent is not None: mask &= np.all(self.extents[rows] >= np.asarray(min_extent, dtype=np.float32), axis=1)
+        if max_extent is not None: mask &= np.all(self.extents[rows] <= np.asarray(max_extent, dtype=np.float32), axis=1)
+        if min_points is not None: mask &= self.num_points[rows] >= min_points
+        return rows[mask]
+
+    def query(self, **kwargs) -> np.ndarray:
+        """
+        Returns the frames containing at least one object matching all the given conditions, see `query_rows` for the arguments.
+
+        Returns:
+            np.ndarray: Sorted frame indices, usable as `current_frame_index`; `frame_names` maps them to label file basenames.
+
+        """
+        return np.unique(self.frame_ids[self.query_rows(**kwargs)])
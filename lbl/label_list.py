@@ -0,0 +1,369 @@
+import numpy as np
+
+"""
+The module label_list.py contains the columnar label container returned by the label handlers. A `LabelList` is a regular list of per-object label dictionaries (so existing algorithms keep working) that additionally
+carries the bounding-box parameters of all the objects as NumPy columns (struct of arrays), so that filtering, projection, and export can be vectorized instead of looping over the dictionaries.
+"""
+
+# keys under which the handlers store the class name of an object
+class_name_keys = ['class', 'category_name', 'obj_type']
+
+# pairs of corner indices (see get_bbox_corners) forming the 12 edges of a box
+bbox_corner_edges = [[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6], [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]]
+
+def get_rotation_matrices_from_xyz(euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of `o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz`, i.e., R = Rx @ Ry @ Rz.
+
+    Args:
+        euler_angles (np.ndarray): Euler angles with shape (N, 3).
+
+    Returns:
+        np.ndarray: Rotation matrices with shape (N, 3, 3).
+
+    """
+    euler_angles = np.asarray(euler_angles, dtype=np.float64).reshape(-1, 3)
+    cx, cy, cz = np.cos(euler_angles).T
+    sx, sy, sz = np.sin(euler_angles).T
+    R = np.empty((euler_angles.shape[0], 3, 3), dtype=np.float64)
+    R[:, 0, 0] = cy * cz
+    R[:, 0, 1] = -cy * sz
+    R[:, 0, 2] = sy
+    R[:, 1, 0] = cx * sz + sx * sy * cz
+    R[:, 1, 1] = cx * cz - sx * sy * sz
+    R[:, 1, 2] = -sx * cy
+    R[:, 2, 0] = sx * sz - cx * sy * cz
+    R[:, 2, 1] = sx * cz + cx * sy * sz
+    R[:, 2, 2] = cx * cy
+    return R
+
+def get_bbox_corners(centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Computes the 8 corners of N oriented bounding boxes at once.
+    The corners are ordered as front-left-bottom, front-right-bottom, front-right-top, front-left-top, rear-left-bottom, rear-right-bottom, rear-right-top, and rear-left-top.
+
+    Args:
+        centers (np.ndarray): Box centers with shape (N, 3).
+        extents (np.ndarray): Box extents with shape (N, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (N, 3).
+
+    Returns:
+        np.ndarray: Box corners with shape (N, 8, 3).
+
+    """
+    signs = np.array([[1, 1, -1], [1, -1, -1], [1, -1, 1], [1, 1, 1], [-1, 1, -1], [-1, -1, -1], [-1, -1, 1], [-1, 1, 1]], dtype=np.float64)
+    local_corners = signs[None, :, :] * (np.asarray(extents, dtype=np.float64).reshape(-1, 1, 3) / 2.0) # N x 8 x 3
+    R = get_rotation_matrices_from_xyz(euler_angles)
+    return local_corners @ R.transpose(0, 2, 1) + np.asarray(centers, dtype=np.float64).reshape(-1, 1, 3)
+
+def get_points_in_bboxes(points_xyz: np.ndarray, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray, max_grid_cells: int = 1 << 22):
+    """
+    Assigns the points to all N oriented bounding boxes of a frame at once.
+    Boxes are rasterized by their enclosing squares into a bird's-eye-view grid, so that only (point, box) pairs sharing a grid cell are tested, and those are tested together in the local frames of the boxes.
+
+    Args:
+        points_xyz (np.ndarray): Points with shape (M, >=3).
+        centers (np.ndarray): Box centers with shape (N, 3).
+        extents (np.ndarray): Box extents with shape (N, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (N, 3).
+        max_grid_cells (int): Upper bound of the number of grid cells, the cell size is increased if exceeded.
+
+    Returns:
+        tuple: (point_bbox_ids, bbox_point_indices), where point_bbox_ids (M,) int32 holds the index of the (first) box containing each point or -1, and bbox_point_indices is a list of N sorted int64 arrays holding the indices of the points inside each box (overlapping boxes share points).
+
+    """
+    num_points = points_xyz.shape[0]
+    centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+    num_bboxes = centers.shape[0]
+    point_bbox_ids = np.full(num_points, -1, dtype=np.int32)
+    if num_bboxes == 0 or num_points == 0: return point_bbox_ids, [np.zeros(0, dtype=np.int64) for _ in range(num_bboxes)]
+    half_extents = np.asarray(extents, dtype=np.float32).reshape(-1, 3) / 2.0
+    R = get_rotation_matrices_from_xyz(euler_angles).astype(np.float32)
+    # radius of the sphere enclosing each box, its square encloses the box footprint for any rotation
+    radii = np.linalg.norm(half_extents, axis=1)
+
+    # grid over the enclosing squares of all the boxes, with cells about the size of a typical box
+    region_min = (centers[:, :2] - radii[:, None]).min(axis=0)
+    region_max = (centers[:, :2] + radii[:, None]).max(axis=0)
+    cell_size = max(float(np.median(radii)) * 2.0, 0.5)
+    cell_size = max(cell_size, float(np.sqrt(np.prod(region_max - region_min + cell_size) / max_grid_cells)))
+    grid_shape = np.floor((region_max - region_min) / cell_size).astype(np.int64) + 1
+
+    # (cell, box) pairs of the cells overlapped by each box square, sorted by cell into a compressed row layout
+    cell_min = np.floor((centers[:, :2] - radii[:, None] - region_min) / cell_size).astype(np.int64)
+    cell_max = np.minimum(np.floor((centers[:, :2] + radii[:, None] - region_min) / cell_size).astype(np.int64), grid_shape - 1)
+    cell_span = cell_max - cell_min + 1
+    cells_per_bbox = cell_span[:, 0] * cell_span[:, 1]
+    pair_bbox = np.repeat(np.arange(num_bboxes), cells_per_bbox)
+    pair_offset = np.arange(pair_bbox.shape[0]) - np.repeat(np.cumsum(cells_per_bbox) - cells_per_bbox, cells_per_bbox)
+    pair_cell = (cell_min[pair_bbox, 0] + pair_offset // cell_span[pair_bbox, 1]) * grid_shape[1] + (cell_min[pair_bbox, 1] + pair_offset % cell_span[pair_bbox, 1])
+    order = np.argsort(pair_cell, kind='stable')
+    cell_bboxes = pair_bbox[order]
+    cell_starts = np.zeros(grid_shape[0] * grid_shape[1] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_cell, minlength=grid_shape[0] * grid_shape[1]), out=cell_starts[1:])
+
+    # candidate points are those falling in a cell overlapped by at least one box
+    point_cells = np.floor((points_xyz[:, :2] - region_min) / cell_size).astype(np.int64)
+    in_region = np.all((point_cells >= 0) & (point_cells < grid_shape), axis=1)
+    candidates = np.flatnonzero(in_region)
+    candidate_cells = point_cells[candidates, 0] * grid_shape[1] + point_cells[candidates, 1]
+    bboxes_per_candidate = cell_starts[candidate_cells + 1] - cell_starts[candidate_cells]
+    has_bboxes = bboxes_per_candidate > 0
+    candidates, candidate_cells, bboxes_per_candidate = candidates[has_bboxes], candidate_cells[has_bboxes], bboxes_per_candidate[has_bboxes]
+
+    # expand into (point, box) pairs and test them in the local frames of the boxes, local = R^T (p - c)
+    test_point = np.repeat(candidates, bboxes_per_candidate)
+    test_offset = np.arange(test_point.shape[0]) - np.repeat(np.cumsum(bboxes_per_candidate) - bboxes_per_candidate, bboxes_per_candidate)
+    test_bbox = cell_bboxes[np.repeat(cell_starts[candidate_cells], bboxes_per_candidate) + test_offset]
+    local = np.einsum('ij,ijk->ik', points_xyz[test_point, :3].astype(np.float32) - centers[test_bbox], R[test_bbox])
+    inside = np.all(np.abs(local) <= half_extents[test_bbox], axis=1)
+    inside_point, inside_bbox = test_point[inside], test_bbox[inside]
+
+    # the first box wins for points inside overlapping boxes, assigned in reverse so that the lowest index is written last
+    point_bbox_ids[inside_point[::-1]] = inside_bbox[::-1]
+    # the pairs are ordered by point, a stable sort by box keeps the points of each box sorted
+    order = np.argsort(inside_bbox, kind='stable')
+    splits = np.cumsum(np.bincount(inside_bbox, minlength=num_bboxes))[:-1]
+    return point_bbox_ids, np.split(inside_point[order].astype(np.int64), splits)
+
+def count_points_in_bboxes(points_xyz: np.ndarray, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Counts the points inside each of N oriented bounding boxes, see `get_points_in_bboxes`.
+
+    Args:
+        points_xyz (np.ndarray): Point coordinates with shape (M, >=3).
+        centers (np.ndarray): Box centers with shape (N, 3).
+        extents (np.ndarray): Box extents with shape (N, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (N, 3).
+
+    Returns:
+        np.ndarray: Number of points inside each box, (N,) int32.
+
+    """
+    _, bbox_point_indices = get_points_in_bboxes(points_xyz, centers, extents, euler_angles)
+    return np.array([len(indices) for indices in bbox_point_indices], dtype=np.int32)
+
+def get_track_colors(track_ids: np.ndarray) -> np.ndarray:
+    """
+    Maps track ids to stable, well separated colors (hues spaced by the golden ratio), so that an object keeps its color across frames.
+
+    Args:
+        track_ids (np.ndarray): Track ids with shape (N,).
+
+    Returns:
+        np.ndarray: Colors in 0-1 range with shape (N, 3).
+
+    """
+    hues = (np.asarray(track_ids, dtype=np.float64) * 0.618033988749895) % 1.0 * 6.0
+    # hsv to rgb with saturation 0.8 and value 1
+    channels = np.abs((hues[:, None] + np.array([0.0, 4.0, 2.0])) % 6.0 - 3.0) - 1.0
+    return 1.0 - 0.8 * (1.0 - np.clip(channels, 0.0, 1.0))
+
+class LabelList(list):
+    """
+    A list of per-object label dictionaries with columnar (struct of arrays) views of their bounding boxes.
+
+    The columns are built once, either by the handler through `from_columns` (in which case the arrays in the dictionaries are row views into the columns, so in-place edits stay in sync) or lazily from the dictionaries on first access.
+    They are invalidated whenever the list itself is modified (append, remove, etc.). If the dictionaries of a list built from plain dictionaries (or returned by `select`) are edited in place, call `invalidate` afterwards.
+
+    Args:
+        labels (iterable): Per-object label dictionaries.
+
+    Attributes:
+        centers (np.ndarray): Box centers in lidar coordinates, (N, 3) float32.
+        extents (np.ndarray): Box extents, (N, 3) float32.
+        euler_angles (np.ndarray): Box euler angles, (N, 3) float32.
+        yaws (np.ndarray): Box rotations around the z-axis, (N,) float32 view of euler_angles.
+        colors (np.ndarray): Box colors in 0-1 range, (N, 3) float32.
+        predicted (np.ndarray): True for predicted boxes, False for ground truth, (N,) bool.
+        has_lidar_bbox (np.ndarray): True if the label has a lidar_bbox, (N,) bool; the box columns of the other rows are zeros.
+        class_ids (np.ndarray): Indices into class_names, (N,) int32.
+        class_names (list): Unique class names.
+        track_ids (np.ndarray): Track id of each label (see algo.label.track), (N,) int64, -1 if not tracked.
+
+    """
+    column_names = ['centers', 'extents', 'euler_angles', 'colors', 'predicted', 'has_lidar_bbox', 'class_ids', 'track_ids']
+
+    def __init__(self, labels=()):
+        super().__init__(labels)
+        self.__columns__ = None
+        self.__class_names__ = None
+
+    @classmethod
+    def from_columns(cls, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray, colors: np.ndarray, class_names: list, predicted=False, labels: list = None, camera_colors: np.ndarray = None):
+        """
+        Creates a LabelList from bounding-box columns, the per-object dictionaries get `lidar_bbox` (and `camera_bbox` if camera_colors are given) entries whose arrays are row views into the columns.
+
+        Args:
+            centers (np.ndarray): Box centers with shape (N, 3).
+            extents (np.ndarray): Box extents with shape (N, 3).
+            euler_angles (np.ndarray): Box euler angles with shape (N, 3).
+            colors (np.ndarray): Box colors in 0-1 range with shape (N, 3).
+            class_names (list): Class name of each box.
+            predicted (bool or np.ndarray): True for predicted boxes, either one value for all or one per box.
+            labels (list, optional): Per-object dictionaries holding the remaining (handler specific) fields, new dictionaries are created if None.
+            camera_colors (np.ndarray, optional): Box colors in 0-255 range with shape (N, 3).
+
+        Returns:
+            LabelList: The label list.
+
+        """
+        n = len(class_names)
+        centers = np.ascontiguousarray(np.reshape(centers, (n, 3)), dtype=np.float32)
+        extents = np.ascontiguousarray(np.reshape(extents, (n, 3)), dtype=np.float32)
+        euler_angles = np.ascontiguousarray(np.reshape(euler_angles, (n, 3)), dtype=np.float32)
+        colors = np.ascontiguousarray(np.reshape(colors, (n, 3)), dtype=np.float32)
+        predicted = np.broadcast_to(np.asarray(predicted, dtype=bool), (n,)).copy()
+        if camera_colors is not None: camera_colors = np.ascontiguousarray(np.reshape(camera_colors, (n, 3)), dtype=np.uint8)
+        if labels is None: labels = [dict() for _ in range(n)]
+
+        for i, label in enumerate(labels):
+            label['lidar_bbox'] = {'lidar_xyz_center': centers[i], 'lidar_xyz_extent': extents[i], 'lidar_xyz_euler_angles': euler_angles[i], 'rgb_bbox_color': colors[i], 'predicted': bool(predicted[i])}
+            if camera_colors is not None:
+                label['camera_bbox'] = {'lidar_xyz_center': centers[i], 'lidar_xyz_extent': extents[i], 'lidar_xyz_euler_angles': euler_angles[i], 'rgb_bbox_color': camera_colors[i], 'predicted': bool(predicted[i])}
+
+        label_list = cls(labels)
+        unique_class_names, class_ids = np.unique(np.asarray(class_names, dtype=str), return_inverse=True) if n else (np.array([], dtype=str), np.zeros(0, dtype=np.int64))
+        label_list.__class_names__ = unique_class_names.tolist()
+        label_list.__columns__ = {'centers': centers, 'extents': extents, 'euler_angles': euler_angles, 'colors': colors, 'predicted': predicted, 'has_lidar_bbox': np.ones(n, dtype=bool), 'class_ids': class_ids.astype(np.int32), 'track_ids': np.array([label.get('track_id', -1) for label in labels], dtype=np.int64)}
+        return label_list
+
+    @staticmethod
+    def from_labels(labels):
+        """
+        Returns the given labels as a LabelList, without copying if they already are one.
+
+        Args:
+            labels (list): Per-object label dictionaries or a LabelList.
+
+        Returns:
+            LabelList: The label list.
+
+        """
+        if isinstance(labels, LabelList): return labels
+        return LabelList(labels)
+
+    @staticmethod
+    def get_class_name(label: dict) -> str:
+        """
+        Returns the class name of a label dictionary, irrespective of the handler that created it.
+
+        Args:
+            label (dict): The label dictionary.
+
+        Returns:
+            str: The class name, or 'Unknown'.
+
+        """
+        for key in class_name_keys:
+            if key in label: return label[key]
+        return 'Unknown'
+
+    def __build_columns__(self):
+        """
+        Gathers the columns from the per-object dictionaries, missing entries are filled with zeros.
+
+        """
+        n = len(self)
+        columns = {'centers': np.zeros((n, 3), dtype=np.float32), 'extents': np.zeros((n, 3), dtype=np.float32), 'euler_angles': np.zeros((n, 3), dtype=np.float32), 'colors': np.zeros((n, 3), dtype=np.float32), 'predicted': np.zeros(n, dtype=bool), 'has_lidar_bbox': np.zeros(n, dtype=bool), 'track_ids': np.full(n, -1, dtype=np.int64)}
+        keys = [('centers', 'lidar_xyz_center'), ('extents', 'lidar_xyz_extent'), ('euler_angles', 'lidar_xyz_euler_angles'), ('colors', 'rgb_bbox_color')]
+        for i, label in enumerate(self):
+            if 'track_id' in label: columns['track_ids'][i] = label['track_id']
+            if 'lidar_bbox' not in label: continue
+            lidar_bbox = label['lidar_bbox']
+            columns['has_lidar_bbox'][i] = True
+            columns['predicted'][i] = lidar_bbox.get('predicted', False)
+            for column, key in keys:
+                if key in lidar_bbox: columns[column][i] = lidar_bbox[key]
+        unique_class_names, class_ids = np.unique(np.asarray([LabelList.get_class_name(label) for label in self], dtype=str), return_inverse=True) if n else (np.array([], dtype=str), np.zeros(0, dtype=np.int64))
+        columns['class_ids'] = class_ids.astype(np.int32)
+        self.__class_names__ = unique_class_names.tolist()
+        self.__columns__ = columns
+
+    def __get_column__(self, name: str) -> np.ndarray:
+        if self.__columns__ is None: self.__build_columns__()
+        return self.__columns__[name]
+
+    centers = property(lambda self: self.__get_column__('centers'))
+    extents = property(lambda self: self.__get_column__('extents'))
+    euler_angles = property(lambda self: self.__get_column__('euler_angles'))
+    yaws = property(lambda self: self.__get_column__('euler_angles')[:, 2])
+    colors = property(lambda self: self.__get_column__('colors'))
+    predicted = property(lambda self: self.__get_column__('predicted'))
+    has_lidar_bbox = property(lambda self: self.__get_column__('has_lidar_bbox'))
+    class_ids = property(lambda self: self.__get_column__('class_ids'))
+    track_ids = property(lambda self: self.__get_column__('track_ids'))
+
+    @property
+    def class_names(self) -> list:
+        if self.__columns__ is None: self.__build_columns__()
+        return self.__class_names__
+
+    def get_class_names(self) -> np.ndarray:
+        """
+        Returns the class name of each label.
+
+        Returns:
+            np.ndarray: Class names with shape (N,).
+
+        """
+        return np.asarray(self.class_names, dtype=str)[self.class_ids] if len(self) else np.array([], dtype=str)
+
+    def get_corners(self) -> np.ndarray:
+        """
+        Returns the corners of all the lidar bounding boxes, see `get_bbox_corners`.
+
+        Returns:
+            np.ndarray: Box corners with shape (N, 8, 3).
+
+        """
+        return get_bbox_corners(self.centers, self.extents, self.euler_angles)
+
+    def select(self, selection):
+        """
+        Returns a new LabelList holding a subset of the labels, with the columns sliced accordingly.
+
+        Args:
+            selection (np.ndarray): Boolean mask with shape (N,) or integer indices.
+
+        Returns:
+            LabelList: The selected labels.
+
+        """
+        indices = np.flatnonzero(selection) if np.asarray(selection).dtype == bool else np.asarray(selection, dtype=np.int64).reshape(-1)
+        label_list = LabelList([self[i] for i in indices])
+        if self.__columns__ is not None:
+            label_list.__columns__ = {name: column[indices] for name, column in self.__columns__.items()}
+            label_list.__class_names__ = self.__class_names__
+        return label_list
+
+    def invalidate(self):
+        """
+        Drops the columns, they are rebuilt from the dictionaries on next access.
+
+        """
+        self.__columns__ = None
+        self.__class_names__ = None
+
+    # list mutations invalidate the columns
+    def append(self, *args): super().append(*args); self.invalidate()
+    def extend(self, *args): super().extend(*args); self.invalidate()
+    def insert(self, *args): super().insert(*args); self.invalidate()
+    def remove(self, *args): super().remove(*args); self.invalidate()
+    def clear(self, *args): super().clear(*args); self.invalidate()
+    def sort(self, *args, **kwargs): super().sort(*args, **kwargs); self.invalidate()
+    def reverse(self, *args): super().reverse(*args); self.invalidate()
+    def pop(self, *args):
+        label = super().pop(*args)
+        self.invalidate()
+        return label
+    def __setitem__(self, *args): super().__setitem__(*args); self.invalidate()
+    def __delitem__(self, *args): super().__delitem__(*args); self.invalidate()
+    def __iadd__(self, *args):
+        super().__iadd__(*args)
+        self.invalidate()
+        return self
+    def __imul__(self, *args):
+        super().__imul__(*args)
+        self.invalidate()
+        return self
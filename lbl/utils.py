@@ -0,0 +1,34 @@
+import numpy as np
+
+from archive import file_io as archive_io
+
+"""
+The module utils.py contains utility functions shared by the label handlers. If you think that a function can be reused in other parts of the framework, you can move it to the utils.py module.
+"""
+
+def read_text_table(label_path: str, num_columns: int) -> np.ndarray:
+    """
+    Reads a whitespace separated label file (one object per line) into a 2D string array in one pass, instead of splitting and converting line by line.
+    Extra columns (e.g. a trailing score) are dropped and empty lines are skipped.
+
+    Args:
+        label_path (str): Path to the label file, may pass through an archive.
+        num_columns (int): Number of leading columns to keep.
+
+    Returns:
+        np.ndarray: String array with shape (N, num_columns).
+
+    Raises:
+        ValueError: If a line has fewer than num_columns columns.
+
+    """
+    with archive_io.open(label_path, 'r') as f: text = f.read()
+    rows = [row for row in (line.split() for line in text.splitlines()) if len(row) > 0]
+    if len(rows) == 0: return np.empty((0, num_columns), dtype=str)
+    # the width of every line is checked, a file with a ragged line (e.g. a score on some lines only) must not be reshaped as a whole
+    widths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    if widths.min() < num_columns: raise ValueError(f'{label_path} has lines with less than {num_columns} columns.')
+    # fast path: every line has the same number of columns, so the whole file is converted at once
+    if widths.min() == widths.max(): return np.array(rows, dtype=str)[:, :num_columns]
+    # ragged lines, truncated individually
+    return np.array([row[:num_columns] for row in rows], dtype=str)
@@ -6,6 +6,7 @@ from gui.logger_gui import Logger
 
 from pcd.file_io import FileIO as PCD_File_IO
 from pcd.sensor_io import SensorIO as PCD_Sensor_IO
+from pcd.multi_io import MultiIO as PCD_Multi_IO
 from pcd.viz import PointCloudVisualizer
 
 from img.file_io import FileIO as IMG_File_IO
@@ -122,7 +123,14 @@ class LiGuard:
         # manage pcd reading
         if self.pcd_io != None: self.pcd_io.close()
         # if files are enabled
-        if cfg['data']['lidar']['enabled']:
+        if cfg['data']['lidar']['enabled'] and len(cfg['data']['lidar'].get('sources', [])) > 0:
+            try:
+                self.pcd_io = PCD_Multi_IO(cfg, self.logger)
+                self.logger.log(f'[main.py->LiGuard->reset]: PCD_Multi_IO created', Logger.DEBUG)
+            except Exception as e:
+                self.logger.log(f'[main.py->LiGuard->reset]: PCD_Multi_IO creation failed:\n{e}', Logger.CRITICAL)
+                self.pcd_io = None
+        elif cfg['data']['lidar']['enabled']:
             try:
                 self.pcd_io = PCD_File_IO(cfg)
                 self.logger.log(f'[main.py->LiGuard->reset]: PCD_File_IO created', Logger.DEBUG)
@@ -130,6 +138,13 @@ class LiGuard:
                 self.logger.log(f'[main.py->LiGuard->reset]: PCD_File_IO creation failed:\n{e}', Logger.CRITICAL)
                 self.pcd_io = None
         # if sensors are enabled
+        elif cfg['sensors']['lidar']['enabled'] and len(cfg['sensors']['lidar'].get('sources', [])) > 0:
+            try:
+                self.pcd_io = PCD_Multi_IO(cfg, self.logger)
+                self.logger.log(f'[main.py->LiGuard->reset]: PCD_Multi_IO created', Logger.DEBUG)
+            except Exception as e:
+                self.logger.log(f'[main.py->LiGuard->reset]: PCD_Multi_IO creation failed:\n{e}', Logger.CRITICAL)
+                self.pcd_io = None
         elif cfg['sensors']['lidar']['enabled']:
             try:
                 self.pcd_io = PCD_Sensor_IO(cfg)
@@ -336,6 +351,10 @@ class LiGuard:
                     current_point_cloud_path, current_point_cloud_numpy = self.pcd_io[self.data_dict['current_frame_index']]
                     self.data_dict['current_point_cloud_path'] = current_point_cloud_path
                     self.data_dict['current_point_cloud_numpy'] = current_point_cloud_numpy
+                    # sensors that stream organized point clouds (e.g. Ouster) provide the shape of their range image
+                    organized_shape = getattr(self.pcd_io, 'organized_shape', None)
+                    if organized_shape is not None: self.data_dict['current_point_cloud_organized_shape'] = organized_shape
+                    elif 'current_point_cloud_organized_shape' in self.data_dict: self.data_dict.pop('current_point_cloud_organized_shape')
                 elif 'current_point_cloud_numpy' in self.data_dict:
                     self.logger.log(f'[main.py->LiGuard->start]: current_point_cloud_numpy found in data_dict while pcd_io is None, removing ...', Logger.DEBUG)
                     self.data_dict.pop('current_point_cloud_numpy')
@@ -387,7 +406,8 @@ class LiGuard:
                     for proc in self.calib_processes:
                         try: proc(self.data_dict, cfg)
                         except Exception as e: self.logger.log(f'[main.py->LiGuard->start]: calib_processes failed for {proc}:\n{e}', Logger.ERROR)
-                if self.lbl_io:
+                # labels are read by lbl_io, or created by the lidar processes (e.g. cluster) on unlabeled or live data
+                if self.lbl_io or 'current_label_list' in self.data_dict:
                     for proc in self.label_processes:
                         try: proc(self.data_dict, cfg)
                         except Exception as e: self.logger.log(f'[main.py->LiGuard->start]: label_processes failed for {proc}:\n{e}', Logger.ERROR)
@@ -7,13 +7,16 @@ import threading
 
 supported_file_types = ['.bin', '.npy', '.ply', '.pcd']
 
+import io
 import os
-import glob
 import threading
 import time
 import numpy as np
 import open3d as o3d
 
+from archive import file_io as archive_io
+from pcd.utils import read_pcd_fields, get_point_times
+
 class FileIO:
     """
     Class for reading point cloud data from files.
@@ -31,6 +34,7 @@ class FileIO:
         data_lock (threading.Lock): Lock for thread-safe access to the data list.
         data (list): List of tuples containing the absolute file path and the loaded point cloud data.
         stop (threading.Event): Event to stop the asynchronous reading thread.
+        point_time (bool): Whether to append the per-point time (seconds since the first point of the scan) of .pcd files as a fifth column.
 
     """
 
@@ -39,7 +43,8 @@ class FileIO:
         self.pcd_dir = os.path.join(cfg['data']['path'], cfg['data']['lidar_subdir'])
         self.pcd_type = cfg['data']['lidar']['pcd_type']
         self.pcd_count = cfg['data']['size']
-        files = glob.glob(os.path.join(self.pcd_dir, '*' + self.pcd_type))
+        self.point_time = cfg['data']['lidar'].get('point_time', False)
+        files = archive_io.glob(os.path.join(self.pcd_dir, '*' + self.pcd_type))
         file_basenames = [os.path.splitext(os.path.basename(file))[0] for file in files]
         # Sort the file basenames based on the numerical part
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
@@ -67,6 +72,8 @@ class FileIO:
             numpy.ndarray: Loaded point cloud data as a numpy array.
 
         """
+        # copied out of the archive buffer, the algorithms modify point clouds in place
+        if archive_io.is_archive_path(file_abs_path): return np.frombuffer(archive_io.read_buffer(file_abs_path), dtype=np.float32).reshape(-1,4).copy()
         return np.fromfile(file_abs_path, dtype=np.float32).reshape(-1,4)
 
     def __read_npy__(self, file_abs_path: str):
@@ -80,6 +87,7 @@ class FileIO:
             numpy.ndarray: Loaded point cloud data as a numpy array.
 
         """
+        if archive_io.is_archive_path(file_abs_path): return np.load(io.BytesIO(archive_io.read_buffer(file_abs_path)))
         return np.load(file_abs_path)
 
     def __read_ply__(self, file_abs_path: str):
@@ -93,24 +101,35 @@ class FileIO:
             numpy.ndarray: Loaded point cloud data as a numpy array.
 
         """
-        points = np.asarray(o3d.io.read_point_cloud(file_abs_path).points, dtype=np.float32)
+        with archive_io.local_copy(file_abs_path) as local_path: points = np.asarray(o3d.io.read_point_cloud(local_path).points, dtype=np.float32)
         points = np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
         return points
     
     def __read_pcd__(self, file_abs_path: str):
         """
-        Read point cloud data from a PCD file.
+        Read point cloud data from a PCD file. The fields of ascii and binary files are read directly, so that the intensity (ones if missing) and, with point_time, the per-point time are kept; binary_compressed files are read with open3d.
 
         Args:
             file_abs_path (str): Absolute path of the PCD file.
 
         Returns:
-            numpy.ndarray: Loaded point cloud data as a numpy array.
-
-        """
-        points = np.asarray(o3d.io.read_point_cloud(file_abs_path).points, dtype=np.float32)
-        points = np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
-        return points
+            numpy.ndarray: Loaded point cloud data as a numpy array, x y z intensity (and time if point_time is set).
+
+        """
+        fields = read_pcd_fields(archive_io.read_buffer(file_abs_path))
+        if fields is None:
+            with archive_io.local_copy(file_abs_path) as local_path: points = np.asarray(o3d.io.read_point_cloud(local_path).points, dtype=np.float32)
+            points = np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
+            if self.point_time: points = np.hstack((points, np.zeros((points.shape[0], 1), dtype=np.float32)))
+            return points
+        num_points = len(fields['x'])
+        columns = [fields['x'], fields['y'], fields['z'], fields.get('intensity', np.ones(num_points))]
+        if self.point_time:
+            times = get_point_times(fields)
+            columns.append(times if times is not None else np.zeros(num_points))
+        points = np.column_stack(columns).astype(np.float32)
+        # open3d drops the points with non-finite coordinates
+        return points[np.isfinite(points[:, :3]).all(axis=1)]
         
     def get_abs_path(self, idx: int):
         """
@@ -17,6 +17,8 @@ class Handler:
         stream (ouster.client.Scans): Scans stream object.
         xyz_lut (ouster.client.XYZLut): XYZ lookup table object.
         reader (generator): Generator that yields point cloud data.
+        point_time (bool): Whether to append the per-point time (seconds since the first column of the scan) as a fifth column.
+        organized_shape (tuple): Shape (beams, columns) of the organized range image the yielded point clouds are laid out in.
 
     """
 
@@ -32,6 +34,7 @@ class Handler:
         self.model = self.cfg['sensors']['lidar']['model'].lower().replace('-','')
         self.serial_no = self.cfg['sensors']['lidar']['serial_number']
         self.hostname = self.cfg['sensors']['lidar']['hostname']
+        self.point_time = self.cfg['sensors']['lidar'].get('point_time', False)
         
         self.client = ouster.client
         
@@ -51,6 +54,7 @@ class Handler:
         except Exception as e:
             raise Exception(f"Error connecting to Ouster OS1-64: {e}")
             
+        self.organized_shape = None
         self.reader = self.__get_reader__()
 
     def __get_reader__(self):
@@ -63,9 +67,17 @@ class Handler:
         """
         while True:
             for scan in self.stream:
-                pcd_xyz = self.xyz_lut(scan).reshape(-1, 3)
-                intensity = self.client.destagger(self.stream.metadata, scan.field(self.client.ChanField.REFLECTIVITY)).reshape(-1, 1)
-                pcd_intensity_np = np.hstack((pcd_xyz, intensity))
+                # destagger both the points and the intensities so that the rows of the point cloud are the pixels of the organized (beams x columns) range image in row-major order
+                pcd_xyz = self.client.destagger(self.stream.metadata, self.xyz_lut(scan))
+                intensity = self.client.destagger(self.stream.metadata, scan.field(self.client.ChanField.REFLECTIVITY))
+                self.organized_shape = intensity.shape
+                pcd_intensity_np = np.hstack((pcd_xyz.reshape(-1, 3), intensity.reshape(-1, 1)))
+                if self.point_time:
+                    # each column of the scan has one timestamp in nanoseconds, destaggered like the points
+                    timestamps = scan.timestamp.astype(np.float64)
+                    column_times = ((timestamps - timestamps[timestamps > 0].min()) * 1e-9).astype(np.float32) if np.any(timestamps > 0) else np.zeros_like(timestamps, dtype=np.float32)
+                    point_times = self.client.destagger(self.stream.metadata, np.ascontiguousarray(np.broadcast_to(column_times, intensity.shape)))
+                    pcd_intensity_np = np.hstack((pcd_intensity_np, point_times.reshape(-1, 1)))
                 yield pcd_intensity_np
                 
     def close(self):
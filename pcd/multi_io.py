@@ -0,0 +1,162 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from archive import file_io as archive_io
+from pcd.file_io import FileIO
+from pcd.sensor_io import SensorIO
+from gui.logger_gui import Logger
+
+class MultiIO:
+    """
+    Composite point cloud source that fuses several lidars, read from lidar subdirectories (data:lidar:sources) or streamed from sensors (sensors:lidar:sources), into one point cloud in the reference frame.
+    The sources are read and transformed with their 4x4 extrinsics in parallel, one thread per source, and written into a single preallocated array with a sensor_id column (the index of the source) after the other columns.
+    File sources are time-aligned to the first source by nearest timestamp (timestamps.txt in the subdirectory, or the file basenames if they are numbers in seconds); frames of a source farther than max_time_offset from the reference frame are left out. Sources without timestamps are aligned by index, with a warning. Sensor sources are aligned by reading their latest scans together.
+
+    Args:
+        cfg (dict): Configuration dictionary containing the path and source information.
+        logger (Logger, optional): Logger for the time alignment warnings, printed if None.
+
+    Attributes:
+        cfg (dict): Configuration dictionary containing the path and source information.
+        ios (list): FileIO or SensorIO of each source.
+        extrinsics (list): 4x4 transform from each source to the reference frame.
+        frame_indices (np.ndarray): Frame index of each source (columns) for each reference frame (rows), -1 where the source has no frame close enough in time.
+        files_basenames (list): File basenames of the reference (first) source.
+        executor (ThreadPoolExecutor): Threads that read and transform the sources in parallel.
+
+    """
+
+    def __init__(self, cfg: dict, logger: Logger = None):
+        self.cfg = cfg
+        from_files = cfg['data']['lidar']['enabled']
+        lidar_cfg = cfg['data']['lidar'] if from_files else cfg['sensors']['lidar']
+        sources = lidar_cfg['sources']
+
+        # one FileIO or SensorIO per source, with the subdirectory or the sensor of the source
+        self.ios, self.extrinsics = [], []
+        for source in sources:
+            if from_files:
+                source_cfg = dict(cfg, data=dict(cfg['data'], lidar_subdir=source['subdir'], lidar=dict(cfg['data']['lidar'], pcd_type=source.get('pcd_type', cfg['data']['lidar']['pcd_type']))))
+                self.ios.append(FileIO(source_cfg))
+            else:
+                source_cfg = dict(cfg, sensors=dict(cfg['sensors'], lidar=dict(cfg['sensors']['lidar'], **{key: value for key, value in source.items() if key != 'T_sensor_to_reference'})))
+                self.ios.append(SensorIO(source_cfg))
+            self.extrinsics.append(np.asarray(source.get('T_sensor_to_reference', np.eye(4)), dtype=np.float64).reshape(4, 4))
+        self.files_basenames = getattr(self.ios[0], 'files_basenames', [])
+
+        # frame of each source for each reference frame, by nearest timestamp
+        num_frames = len(self.ios[0])
+        self.frame_indices = np.tile(np.arange(num_frames, dtype=np.int64)[:, None], (1, len(self.ios)))
+        if from_files and lidar_cfg.get('time_align', True):
+            reference_timestamps = self.__get_timestamps__(self.ios[0])
+            for source_index, io in enumerate(self.ios[1:], start=1):
+                timestamps = self.__get_timestamps__(io)
+                if reference_timestamps is None or timestamps is None:
+                    message = f'[pcd->multi_io.py->MultiIO]: no timestamps.txt or numeric file basenames for {sources[0 if reference_timestamps is None else source_index]["subdir"]}, aligning {sources[source_index]["subdir"]} by index'
+                    if logger is not None: logger.log(message, Logger.WARNING)
+                    else: print(message)
+                    continue
+                if len(timestamps) == 0:
+                    self.frame_indices[:, source_index] = -1
+                    continue
+                order = np.argsort(timestamps, kind='stable')
+                sorted_timestamps = timestamps[order]
+                right = np.minimum(np.searchsorted(sorted_timestamps, reference_timestamps), len(sorted_timestamps) - 1)
+                left = np.maximum(right - 1, 0)
+                nearest = np.where(np.abs(sorted_timestamps[left] - reference_timestamps) <= np.abs(sorted_timestamps[right] - reference_timestamps), left, right)
+                offsets = np.abs(sorted_timestamps[nearest] - reference_timestamps)
+                self.frame_indices[:, source_index] = np.where(offsets <= lidar_cfg.get('max_time_offset', 0.05), order[nearest], -1)
+
+        self.executor = ThreadPoolExecutor(max_workers=len(self.ios))
+
+    def __get_timestamps__(self, io: FileIO) -> np.ndarray:
+        """
+        Get the timestamps in seconds of the files of a source, from timestamps.txt in its subdirectory (one timestamp per file in file order, in seconds or as date-times), or from the file basenames if all of them are numbers.
+
+        Args:
+            io (FileIO): FileIO of the source.
+
+        Returns:
+            np.ndarray: Timestamps with shape (len(io),) float64, or None if the source has no timestamps.
+
+        """
+        timestamps_path = os.path.join(io.pcd_dir, 'timestamps.txt')
+        if archive_io.exists(timestamps_path):
+            with archive_io.open(timestamps_path) as f: lines = [line.strip() for line in f if len(line.strip()) > 0][:len(io)]
+            try: return np.array(lines, dtype=np.float64)
+            except ValueError: return np.array(lines, dtype='datetime64[ns]').astype(np.int64) * 1e-9
+        try: return np.array([float(basename) for basename in io.files_basenames], dtype=np.float64)
+        except ValueError: return None
+
+    def __read_source__(self, source_index: int, idx: int):
+        """
+        Read the point cloud of a source for a reference frame.
+
+        Args:
+            source_index (int): Index of the source.
+            idx (int): Index of the reference frame.
+
+        Returns:
+            np.ndarray: Point cloud of the source, empty if the source has no frame close enough in time.
+
+        """
+        frame_index = self.frame_indices[idx, source_index] if idx < len(self.frame_indices) else idx
+        if frame_index < 0: return np.zeros((0, 4), dtype=np.float32)
+        return self.ios[source_index][frame_index][1]
+
+    def __transform_source__(self, source_index: int, points: np.ndarray, out: np.ndarray):
+        """
+        Transform the point cloud of a source to the reference frame and write it with its sensor_id into its rows of the fused point cloud.
+
+        Args:
+            source_index (int): Index of the source.
+            points (np.ndarray): Point cloud of the source.
+            out (np.ndarray): Rows of the source in the fused point cloud.
+
+        """
+        extrinsic = self.extrinsics[source_index].astype(out.dtype)
+        np.matmul(points[:, :3], extrinsic[:3, :3].T, out=out[:, :3])
+        out[:, :3] += extrinsic[:3, 3]
+        out[:, 3:points.shape[1]] = points[:, 3:]
+        out[:, points.shape[1]:-1] = 0
+        out[:, -1] = source_index
+
+    def __len__(self):
+        """
+        Get the number of fused frames (the frames of the reference source).
+
+        Returns:
+            int: Number of frames.
+
+        """
+        return len(self.ios[0])
+
+    def __getitem__(self, idx):
+        """
+        Get the fused point cloud of a frame.
+
+        Args:
+            idx (int): Index of the frame.
+
+        Returns:
+            tuple: Tuple containing the path of the reference point cloud and the fused point cloud with the sensor_id column last.
+
+        """
+        # read all the sources in parallel, then transform them in parallel into their rows of one preallocated array
+        point_clouds = list(self.executor.map(lambda source_index: self.__read_source__(source_index, idx), range(len(self.ios))))
+        num_columns = max(point_cloud.shape[1] for point_cloud in point_clouds) + 1
+        offsets = np.cumsum([0] + [len(point_cloud) for point_cloud in point_clouds])
+        fused = np.empty((offsets[-1], num_columns), dtype=np.float32)
+        list(self.executor.map(lambda source_index: self.__transform_source__(source_index, point_clouds[source_index], fused[offsets[source_index]:offsets[source_index + 1]]), range(len(self.ios))))
+        path = self.ios[0].get_abs_path(idx) if hasattr(self.ios[0], 'get_abs_path') else None
+        return path, fused
+
+    def close(self):
+        """
+        Close the sources and the threads.
+
+        """
+        for io in self.ios: io.close()
+        self.executor.shutdown(wait=False)
@@ -52,6 +52,16 @@ class SensorIO:
             self.pcd_intensity_np = next(self.reader)
             self.idx = idx
         return None, self.pcd_intensity_np
+    
+    @property
+    def organized_shape(self):
+        """
+        Returns the shape (rows, columns) of the organized range image the point clouds of the sensor are laid out in (row-major), or None if the sensor does not provide one.
+
+        Returns:
+            tuple: Organized shape or None.
+        """
+        return getattr(self.handle, 'organized_shape', None)
         
     def __len__(self):
         """
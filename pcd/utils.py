@@ -1,3 +1,4 @@
+import io
 import open3d as o3d
 import numpy as np
 
@@ -56,4 +57,63 @@ def get_fixed_sized_point_cloud(point_cloud: np.ndarray, number_of_points: int)
     # crop if more points
     elif point_cloud.shape[0] > number_of_points:
         point_cloud = point_cloud[:number_of_points]
-    return point_cloud
\ No newline at end of file
+    return point_cloud
+
+def read_pcd_fields(buffer) -> dict:
+    """
+    Read all the fields (e.g. x, y, z, intensity, t) of an ascii or binary PCD file at once, open3d only reads the points and colors.
+
+    Args:
+        buffer (bytes or memoryview): Content of the PCD file.
+
+    Returns:
+        dict: Field names mapped to arrays with shape (N,) (or (N, COUNT) for fields with COUNT > 1), None for binary_compressed files.
+
+    """
+    buffer = memoryview(buffer)
+    header, offset = dict(), 0
+    while True:
+        end = bytes(buffer[offset:offset + 1024]).find(b'\n')
+        if end < 0: raise ValueError('Invalid PCD header.')
+        line = bytes(buffer[offset:offset + end]).decode('ascii').strip()
+        offset += end + 1
+        if len(line) == 0 or line.startswith('#'): continue
+        key, *values = line.split()
+        header[key.upper()] = values
+        if key.upper() == 'DATA': break
+    data_type = header['DATA'][0].lower()
+    if data_type not in ['ascii', 'binary']: return None
+    
+    names = header['FIELDS']
+    counts = [int(count) for count in header.get('COUNT', ['1'] * len(names))]
+    num_points = int(header['POINTS'][0])
+    if data_type == 'binary':
+        type_chars = {'F': 'f', 'U': 'u', 'I': 'i'}
+        dtype = np.dtype([(f'{name}_{i}', '<' + type_chars[type_char] + size, (count,)) for i, (name, size, type_char, count) in enumerate(zip(names, header['SIZE'], header['TYPE'], counts))])
+        data = np.frombuffer(buffer, dtype=dtype, count=num_points, offset=offset)
+        columns = [data[f'{name}_{i}'] for i, name in enumerate(names)]
+    else:
+        data = np.loadtxt(io.StringIO(bytes(buffer[offset:]).decode('ascii')), dtype=np.float64, ndmin=2)[:num_points]
+        splits = np.cumsum(counts)[:-1]
+        columns = [column.astype(np.int64) if type_char in 'UI' else column for column, type_char in zip(np.split(data, splits, axis=1), header['TYPE'])]
+    return {name: column[:, 0] if column.shape[1] == 1 else column for name, column in zip(names, columns)}
+
+def get_point_times(fields: dict) -> np.ndarray:
+    """
+    Get the per-point time in seconds since the first point of the scan from the time field of a point cloud (t, time, or timestamp), integer fields are in nanoseconds.
+
+    Args:
+        fields (dict): Field names mapped to arrays, see `read_pcd_fields`.
+
+    Returns:
+        np.ndarray: Times with shape (N,) float32, or None if there is no time field.
+
+    """
+    for name in ['t', 'time', 'timestamp']:
+        if name not in fields: continue
+        times = fields[name]
+        if len(times) == 0: return np.zeros(0, dtype=np.float32)
+        times = times - times.min()
+        if np.issubdtype(times.dtype, np.integer): return (times * 1e-9).astype(np.float32)
+        return times.astype(np.float32)
+    return None
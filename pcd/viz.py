@@ -2,6 +2,7 @@ import open3d as o3d
 import numpy as np
 
 from pcd.utils import create_pcd
+from lbl.label_list import LabelList, get_bbox_corners, bbox_corner_edges, get_track_colors
 
 from gui.logger_gui import Logger
 
@@ -65,7 +66,16 @@ class PointCloudVisualizer:
 
         # if crop enabled, remove default bound and add bound according to crop params
         if self.cfg['proc']['lidar']['crop']['enabled']:
-            crop_bound = o3d.geometry.AxisAlignedBoundingBox(self.cfg['proc']['lidar']['crop']['min_xyz'], self.cfg['proc']['lidar']['crop']['max_xyz'])
+            crop_cfg = self.cfg['proc']['lidar']['crop']
+            crop_mode = crop_cfg.get('mode', 'box')
+            if crop_mode == 'oriented_box':
+                min_xyz, max_xyz = np.array(crop_cfg['min_xyz'], dtype=np.float64), np.array(crop_cfg['max_xyz'], dtype=np.float64)
+                crop_bound = o3d.geometry.OrientedBoundingBox((min_xyz + max_xyz) / 2.0, o3d.geometry.get_rotation_matrix_from_xyz([0, 0, crop_cfg.get('yaw', 0.0)]), max_xyz - min_xyz)
+            elif crop_mode == 'cylinder':
+                max_range = crop_cfg['max_range']
+                crop_bound = o3d.geometry.AxisAlignedBoundingBox([-max_range, -max_range, crop_cfg['min_xyz'][2]], [max_range, max_range, crop_cfg['max_xyz'][2]])
+            else:
+                crop_bound = o3d.geometry.AxisAlignedBoundingBox(crop_cfg['min_xyz'], crop_cfg['max_xyz'])
             crop_bound.color = self.cfg['visualization']['lidar']['bound_color']
             self.__add_geometry__('bound', crop_bound, reset_bounding_box)
         else:
@@ -126,41 +136,44 @@ class PointCloudVisualizer:
             self.point_cloud.colors = o3d.utility.Vector3dVector(data_dict['current_point_cloud_point_colors'][:, 0:3])
         else:
             self.point_cloud.paint_uniform_color([1,1,1])
-        self.__update_geometry__('point_cloud', self.point_cloud)
         
         self.__clear_bboxes__()
-        if "current_label_list" not in data_dict:
-            return
-        for lbl in data_dict['current_label_list']:
-            self.__add_bbox__(lbl)
-            self.__add_cluster__(lbl)
+        if "current_label_list" in data_dict:
+            label_list = LabelList.from_labels(data_dict['current_label_list'])
+            self.__add_bboxes__(label_list)
+            self.__add_clusters__(label_list)
+        self.__update_geometry__('point_cloud', self.point_cloud)
 
-    def __add_bbox__(self, label_dict: dict):
+    def __add_bboxes__(self, label_list: LabelList):
         """
-        Adds a bounding box to the visualizer.
+        Adds the bounding boxes of all the labels to the visualizer as a single line set.
 
         Args:
-            label_dict: A dictionary containing the label information.
+            label_list: A LabelList containing the label information.
         """
-        if 'lidar_bbox' not in label_dict:
+        has_lidar_bbox = label_list.has_lidar_bbox
+        if not np.any(has_lidar_bbox):
             return
         # bbox params
-        lidar_bbox_dict = label_dict['lidar_bbox']
-        lidar_xyz_center = lidar_bbox_dict['lidar_xyz_center']
-        lidar_xyz_extent = lidar_bbox_dict['lidar_xyz_extent']
-        lidar_xyz_euler_angles = lidar_bbox_dict['lidar_xyz_euler_angles']
-        if lidar_bbox_dict['predicted']:
-            color = lidar_bbox_dict['rgb_bbox_color']
-        else:
-            color = lidar_bbox_dict['rgb_bbox_color'] * 0.5 # darken the color for ground truth
-
-        # calculating bbox
-        rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(lidar_xyz_euler_angles)
-        lidar_xyz_bbox = o3d.geometry.OrientedBoundingBox(lidar_xyz_center, rotation_matrix, lidar_xyz_extent)
-        lidar_xyz_bbox.color = color
+        lidar_xyz_centers = label_list.centers[has_lidar_bbox]
+        lidar_xyz_extents = label_list.extents[has_lidar_bbox]
+        lidar_xyz_euler_angles = label_list.euler_angles[has_lidar_bbox]
+        colors = label_list.colors[has_lidar_bbox].astype(np.float64)
+        # tracked boxes keep the color of their track across frames
+        track_ids = label_list.track_ids[has_lidar_bbox]
+        is_tracked = track_ids >= 0
+        colors[is_tracked] = get_track_colors(track_ids[is_tracked])
+        colors[~label_list.predicted[has_lidar_bbox]] *= 0.5 # darken the color for ground truth
+
+        # calculating bbox corners and their edges, with the corner indices offset per box
+        corners = get_bbox_corners(lidar_xyz_centers, lidar_xyz_extents, lidar_xyz_euler_angles)
+        num_bboxes = corners.shape[0]
+        edges = np.asarray(bbox_corner_edges, dtype=np.int32)[None, :, :] + (np.arange(num_bboxes, dtype=np.int32) * 8)[:, None, None]
+        lidar_xyz_bboxes = o3d.geometry.LineSet(o3d.utility.Vector3dVector(corners.reshape(-1, 3)), o3d.utility.Vector2iVector(edges.reshape(-1, 2)))
+        lidar_xyz_bboxes.colors = o3d.utility.Vector3dVector(np.repeat(colors, len(bbox_corner_edges), axis=0))
         
-        self.bboxes.append(lidar_xyz_bbox)
-        self.__add_geometry__(f'bbox_{str(len(self.bboxes)+1).zfill(4)}', lidar_xyz_bbox, False)
+        self.bboxes.append(lidar_xyz_bboxes)
+        self.__add_geometry__('bboxes', lidar_xyz_bboxes, False)
         
     def __clear_bboxes__(self):
         """
@@ -170,22 +183,27 @@ class PointCloudVisualizer:
             self.viz.remove_geometry(bbox, False)
         self.bboxes.clear()
 
-    def __add_cluster__(self, label_dict: dict):
+    def __add_clusters__(self, label_list: LabelList):
         """
-        Adds a cluster to the visualizer.
+        Colors the points of all the clusters in the visualizer.
 
         Args:
-            label_dict: A dictionary containing the label information.
+            label_list: A LabelList containing the label information.
         """
-        if 'lidar_cluster' not in label_dict:
+        cluster_labels = [lbl for lbl in label_list if 'lidar_cluster' in lbl]
+        if len(cluster_labels) == 0:
             return
         # cluster params
-        lidar_cluster_dict = label_dict['lidar_cluster']
-        point_indices = lidar_cluster_dict['point_indices']
+        cluster_point_indices = [lbl['lidar_cluster']['point_indices'] for lbl in cluster_labels]
         colors = np.asarray(self.point_cloud.colors)
-        if colors.shape[0] != point_indices.shape[0]:
-            colors = np.zeros_like(self.point_cloud.points)
-        colors[point_indices] = np.random.rand(3) # ToDO: use consistent color if tracking is enabled
+        if colors.shape[0] != len(self.point_cloud.points):
+            colors = np.zeros_like(np.asarray(self.point_cloud.points))
+        # tracked clusters keep the color of their track across frames, the others get random colors
+        track_ids = np.array([lbl.get('track_id', -1) for lbl in cluster_labels], dtype=np.int64)
+        cluster_colors = np.random.rand(len(cluster_labels), 3)
+        cluster_colors[track_ids >= 0] = get_track_colors(track_ids[track_ids >= 0])
+        for point_indices, cluster_color in zip(cluster_point_indices, cluster_colors):
+            colors[point_indices] = cluster_color
         self.point_cloud.colors = o3d.utility.Vector3dVector(colors)
         
     def redraw(self):
@@ -110,4 +110,100 @@ def test_project_point_cloud_points():
     # check the number of non-black pixels
     pixel_that_are_not_black_indices = np.where(np.any(data_dict['current_image_numpy'] != 0, axis=-1))
     number_of_non_black_pixels = len(pixel_that_are_not_black_indices[0])
-    assert number_of_non_black_pixels == 0, f'Expected 0 non-black pixels, got {number_of_non_black_pixels}'
\ No newline at end of file
+    assert number_of_non_black_pixels == 0, f'Expected 0 non-black pixels, got {number_of_non_black_pixels}'
+
+def test_create_depth_image():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.camera', fromlist=['create_depth_image']).create_depth_image
+    cfg_dict['proc'] = {'camera': {'create_depth_image': {'index_image': True, 'visualize': True, 'dilation': 3, 'max_depth': 80.0}}}
+    
+    # create dummy calibration data, pixels are x / z and y / z
+    data_dict['current_calib_data'] = {'P2': np.eye(3, 4), 'R0_rect': np.eye(4), 'Tr_velo_to_cam': np.eye(4)}
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    data_dict['current_image_numpy'] = image
+    
+    # points 1, 2, and 3 land on pixel (2, 1), point 4 on pixel (5, 5), point 0 is behind the camera
+    data_dict['current_point_cloud_numpy'] = np.array([[2, 1, -1], [4, 2, 2], [2, 1, 1], [8, 4, 4], [15, 15, 3]], dtype=np.float32)
+    
+    # run the function
+    func(data_dict, cfg_dict)
+    
+    # the nearest point wins
+    depth_image = data_dict['current_depth_image']
+    assert depth_image.dtype == np.float32 and depth_image.shape == (10, 10)
+    assert depth_image[1, 2] == 1 and depth_image[5, 5] == 3
+    assert np.count_nonzero(depth_image) == 2
+    assert data_dict['current_depth_index_image'][1, 2] == 2 and data_dict['current_depth_index_image'][5, 5] == 4
+    assert np.count_nonzero(data_dict['current_depth_index_image'] >= 0) == 2
+    
+    # visualization is drawn on a copy of the image
+    assert np.all(image == 0) and np.any(data_dict['current_image_numpy'][0:3, 1:4] != 0)
+
+def test_undistort_image():
+    import cv2
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.camera', fromlist=['undistort_image']).undistort_image
+    
+    # a camera with barrel distortion and a random image
+    camera_matrix = [400.0, 0.0, 160.0, 0.0, 400.0, 120.0, 0.0, 0.0, 1.0]
+    distortion_coeffs = [-0.3, 0.1, 0.0, 0.0, 0.0]
+    cfg_dict['sensors'] = {'camera': {'camera_matrix': camera_matrix, 'distortion_coeffs': distortion_coeffs}}
+    cfg_dict['proc'] = {'camera': {'undistort_image': {'alpha': 0.0, 'update_calib': True}}}
+    cfg_dict['data'] = {'camera': {'enabled': True, 'preview_scale': 1}}
+    image = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    calib = {'P2': np.array([[400.0, 0.0, 160.0, 10.0], [0.0, 400.0, 120.0, 0.0], [0.0, 0.0, 1.0, 0.0]]), 'Tr_velo_to_cam': np.eye(4)}
+    
+    for i in range(2):
+        data_dict['current_image_numpy'] = image
+        data_dict['current_calib_data'] = calib
+        func(data_dict, cfg_dict)
+        if i == 0: maps = data_dict['undistort_maps']
+    
+    # the remap tables are computed once, and the result matches cv2.undistort with the same new camera matrix
+    assert data_dict['undistort_maps'] is maps
+    K, D = np.array(camera_matrix).reshape(3, 3), np.array(distortion_coeffs)
+    new_K = maps['new_camera_matrix']
+    expected = cv2.undistort(image, K, D, None, new_K)
+    assert np.abs(data_dict['current_image_numpy'].astype(np.int16) - expected).max() <= 2
+    
+    # the calibration is an updated copy, the original is not modified
+    updated = data_dict['current_calib_data']
+    assert updated is not calib and np.allclose(calib['P2'][:, :3], K)
+    assert np.allclose(updated['P2'][:, :3], new_K) and np.allclose(updated['P2'][:, 3], new_K @ np.linalg.inv(K) @ [10.0, 0.0, 0.0])
+    
+    # images decoded at a reduced preview scale are undistorted with K scaled by the same factor
+    cfg_dict['data']['camera']['preview_scale'] = 2
+    small_image = np.ascontiguousarray(image[::2, ::2])
+    data_dict['current_image_numpy'] = small_image
+    data_dict['current_calib_data'] = None
+    func(data_dict, cfg_dict)
+    small_K = K / np.array([[2.0], [2.0], [1.0]])
+    expected = cv2.undistort(small_image, small_K, D, None, data_dict['undistort_maps']['new_camera_matrix'])
+    assert np.abs(data_dict['current_image_numpy'].astype(np.int16) - expected).max() <= 2
+    
+    # a camera matrix that does not match the image size is reported and the image is left as it is
+    cfg_dict['data']['camera']['preview_scale'] = 1
+    cropped_image = image[:100, :100]
+    data_dict['current_image_numpy'] = cropped_image
+    func(data_dict, cfg_dict)
+    assert data_dict['current_image_numpy'] is cropped_image
@@ -44,3 +44,56 @@ def test_remove_out_of_bound_labels():
     # check if the label list is updated
     assert len(data_dict['current_label_list']) == 3, f'Expected 3 labels, got {len(data_dict["current_label_list"])}'
 
+
+def test_track():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.label', fromlist=['track']).track
+
+    cfg_dict['proc'] = {'label': {'track': {'cost': 'distance', 'max_distance': 2.0, 'match_class': True, 'max_misses': 3}}}
+
+    def box(x, y, class_name='Car'):
+        return {'lidar_bbox': {'lidar_xyz_center': [x, y, 0.0], 'lidar_xyz_extent': [4.0, 2.0, 1.5], 'lidar_xyz_euler_angles': [0.0, 0.0, 0.0]}, 'class': class_name}
+
+    # two boxes moving in opposite directions keep their track ids
+    for frame_index in range(5):
+        data_dict['current_frame_index'] = frame_index
+        data_dict['current_label_list'] = [box(0.5 * frame_index, 0.0), box(10.0 - 0.5 * frame_index, 5.0)]
+        func(data_dict, cfg_dict)
+        track_ids = [label['track_id'] for label in data_dict['current_label_list']]
+        assert track_ids == [0, 1], f'Expected track ids [0, 1], got {track_ids}'
+    
+    # a new box starts a new track
+    data_dict['current_frame_index'] = 5
+    data_dict['current_label_list'] = [box(10.0 - 2.5, 5.0), box(2.5, 0.0), box(20.0, 20.0, 'Pedestrian')]
+    func(data_dict, cfg_dict)
+    track_ids = [label['track_id'] for label in data_dict['current_label_list']]
+    assert track_ids == [1, 0, 2], f'Expected track ids [1, 0, 2], got {track_ids}'
+    assert data_dict['current_label_list'].track_ids.tolist() == [1, 0, 2], 'Expected the track ids in the label columns'
+
+    # a frame that does not follow the previous one restarts the tracks
+    data_dict['current_frame_index'] = 10
+    labels = [box(2.5, 0.0)]
+    data_dict['current_label_list'] = labels
+    func(data_dict, cfg_dict)
+    assert data_dict['current_label_list'][0]['track_id'] == 3, f'Expected track id 3, got {data_dict["current_label_list"][0]["track_id"]}'
+    # the track ids are written to copies, the label dictionaries (cached by the label FileIO) are not modified
+    assert 'track_id' not in labels[0], 'Expected the original label dictionary to be left unmodified'
+
+    # association by the bird's-eye-view IoU of the axis-aligned enclosing rectangles
+    cfg_dict['proc']['label']['track'] = {'cost': 'aabb_iou', 'min_aabb_iou': 0.1, 'match_class': True, 'max_misses': 3}
+    data_dict.pop('tracker')
+    for frame_index in range(3):
+        data_dict['current_frame_index'] = frame_index
+        data_dict['current_label_list'] = [box(0.5 * frame_index, 0.0), box(10.0 - 0.5 * frame_index, 5.0)]
+        func(data_dict, cfg_dict)
+    assert [label['track_id'] for label in data_dict['current_label_list']] == [0, 1]
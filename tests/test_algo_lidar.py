@@ -40,6 +40,233 @@ def test_crop():
     # check if the point cloud is updated
     assert data_dict['current_point_cloud_numpy'].shape[0] == 3, f'Expected 3 points, got {data_dict["current_point_cloud_numpy"].shape[0]}'
 
+def test_crop_modes():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['crop']).crop
+
+    # points on the x-axis, the y-axis, and the diagonal
+    points = np.array([[4, 0, 0, 1], [0, 4, 0, 2], [3, 3, 0, 3], [1, 1, 0, 4], [1, 1, 5, 5]], dtype=np.float32)
+
+    # a 2 x 10 box along the x-axis rotated by 45 degrees covers the diagonal only
+    cfg_dict['proc'] = {'lidar': {'crop': {'min_xyz': [-5, -1, -1], 'max_xyz': [5, 1, 1], 'mode': 'oriented_box', 'yaw': np.pi / 4, 'keep_mask': True}}}
+    data_dict['current_point_cloud_numpy'] = points
+    func(data_dict, cfg_dict)
+    assert data_dict['current_point_cloud_numpy'][:, 3].tolist() == [3, 4]
+    assert data_dict['current_point_cloud_crop_indices'].tolist() == [2, 3]
+    assert data_dict['current_point_cloud_crop_mask'].tolist() == [False, False, True, True, False]
+    assert data_dict['current_point_cloud_point_colors'].shape == (2, 3)
+
+    # a ring between 2 and 4.5 meters around the sensor, with reused output buffers
+    cfg_dict['proc']['lidar']['crop'] = {'min_xyz': [0, 0, -1], 'max_xyz': [0, 0, 1], 'mode': 'cylinder', 'min_range': 2, 'max_range': 4.5, 'reuse_buffers': True}
+    for _ in range(2):
+        data_dict['current_point_cloud_numpy'] = points
+        func(data_dict, cfg_dict)
+        assert data_dict['current_point_cloud_numpy'][:, 3].tolist() == [1, 2, 3]
+
+def test_learn_and_remove_background():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the functions
+    learn = __import__('algo.lidar', fromlist=['learn_background']).learn_background
+    remove = __import__('algo.lidar', fromlist=['remove_background']).remove_background
+
+    # a static wall seen with noise in every frame, and an object moving along it
+    rng = np.random.default_rng(0)
+    cfg_dict['proc'] = {'lidar': {'learn_background': {'num_frames': 3, 'voxel_size': 0.2, 'min_xyz': [-10, -10, -2], 'max_xyz': [10, 10, 2], 'min_occupancy': 0.5, 'dilation': 1}, 'remove_background': {'keep_mask': True}}}
+    def get_frame(i):
+        wall = np.column_stack([np.linspace(-5, 5, 5000), np.full(5000, 5.0), rng.uniform(-1, 1, 5000)]) + rng.normal(0, 0.02, (5000, 3))
+        moving = rng.normal([-5 + 3 * i, 0, 0], 0.1, (50, 3))
+        outside = np.array([[20, 20, 0]])
+        return np.hstack([np.vstack([wall, moving, outside]), np.zeros((5051, 1))]).astype(np.float32)
+    
+    for i in range(4):
+        data_dict['current_frame_index'] = i
+        data_dict['current_point_cloud_numpy'] = get_frame(i)
+        learn(data_dict, cfg_dict)
+        learn(data_dict, cfg_dict) # repeated calls on the same frame are not learned twice
+        remove(data_dict, cfg_dict)
+        if i < 2: assert data_dict['background_model']['background_keys'] is None and len(data_dict['current_point_cloud_numpy']) == 5051
+    
+    # only the moving object and the point outside the grid are left
+    assert data_dict['background_model']['learned_frames'] == {0, 1, 2}
+    assert data_dict['current_point_cloud_background_mask'][:5000].mean() > 0.99 and not data_dict['current_point_cloud_background_mask'][5000:].any()
+    assert data_dict['current_point_cloud_numpy'].shape[0] >= 51 and data_dict['current_point_cloud_point_colors'].shape == (data_dict['current_point_cloud_numpy'].shape[0], 3)
+    # the model keeps only the occupied voxels (and their neighbors), not the 100 x 100 x 20 grid of the region
+    assert len(data_dict['background_model']['background_keys']) < 20000
+    
+    # a different voxel size relearns the model
+    cfg_dict['proc']['lidar']['learn_background']['voxel_size'] = 0.4
+    data_dict['current_point_cloud_numpy'] = get_frame(4)
+    learn(data_dict, cfg_dict)
+    assert data_dict['background_model']['voxel_size'] == [0.4, 0.4, 0.4] and data_dict['background_model']['learned_frames'] == {3}
+
+def test_voxel_downsample():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['voxel_downsample']).voxel_downsample
+
+    # three points in the first voxel, one in the second, and two in the third
+    points = np.array([[0.1, 0.1, 0.1, 1], [0.3, 0.3, 0.3, 5], [0.2, 0.2, 0.2, 3], [1.5, 0.1, 0.1, 2], [-0.5, 0.1, 0.1, 4], [-0.1, 0.1, 0.1, 6]], dtype=np.float32)
+    colors = np.array([[0, 0, 0], [1, 1, 1], [0.5, 0.5, 0.5], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+
+    expected = {'centroid': [5, 3, 2], 'first': [4, 1, 2], 'max_intensity': [6, 5, 2]}
+    for mode, intensities in expected.items():
+        cfg_dict['proc'] = {'lidar': {'voxel_downsample': {'voxel_size': [1, 1, 1], 'mode': mode, 'keep_map': True}}}
+        data_dict['current_point_cloud_numpy'] = points
+        data_dict['current_point_cloud_point_colors'] = colors
+        func(data_dict, cfg_dict)
+        assert data_dict['current_point_cloud_numpy'][:, 3].tolist() == intensities, mode
+        assert data_dict['current_point_cloud_point_colors'].shape == (3, 3)
+        assert data_dict['current_point_cloud_voxel_ids'].tolist() == [1, 1, 1, 2, 0, 0]
+    assert np.allclose(data_dict['current_point_cloud_point_colors'][0], [0, 0, 1])
+
+    # centroids average xyz and intensity only, the time and sensor_id columns come from the first point of the voxel
+    cfg_dict['proc'] = {'lidar': {'voxel_downsample': {'voxel_size': [1, 1, 1], 'mode': 'centroid'}}}
+    data_dict['current_point_cloud_numpy'] = np.column_stack([points, np.arange(6) * 0.01, [0, 1, 1, 0, 1, 0]]).astype(np.float32)
+    data_dict.pop('current_point_cloud_point_colors')
+    func(data_dict, cfg_dict)
+    assert np.allclose(data_dict['current_point_cloud_numpy'][:, 3], [5, 3, 2])
+    assert np.allclose(data_dict['current_point_cloud_numpy'][:, 4], [0.04, 0.0, 0.03]) and data_dict['current_point_cloud_numpy'][:, 5].tolist() == [1, 0, 0]
+
+def test_segment_ground():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['segment_ground']).segment_ground
+
+    # a noisy flat ground 1.73 m below the sensor sampled like a scan (denser near the sensor), slightly raised far away, and a box standing on the ground
+    rng = np.random.default_rng(0)
+    ranges, angles = rng.uniform(2, 40, 100000), rng.uniform(-np.pi, np.pi, 100000)
+    ground = np.column_stack([ranges * np.cos(angles), ranges * np.sin(angles), rng.normal(-1.73, 0.02, 100000)])
+    ground[ranges > 30, 2] += 0.1
+    box = rng.uniform([10, -1, -1.4], [14, 1, 0], (2000, 3))
+    points = np.hstack([np.vstack([ground, box]), np.zeros((102000, 1))]).astype(np.float32)
+    data_dict['current_point_cloud_numpy'] = points
+    
+    for method in ['polar', 'ransac']:
+        cfg_dict['proc'] = {'lidar': {'segment_ground': {'method': method, 'height_threshold': 0.2}}}
+        func(data_dict, cfg_dict)
+        mask = data_dict['current_point_cloud_ground_mask']
+        assert mask.shape == (102000,) and data_dict['current_point_cloud_numpy'] is points
+        assert mask[:100000].mean() > 0.99 and not mask[100000:].any(), method
+    assert np.allclose(data_dict['current_ground_plane'], [0, 0, 1, 1.73], atol=0.05)
+
+def test_cluster():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['cluster']).cluster
+
+    # a 4 x 1 x 1 box rotated by 0.5 rad, a small blob, a few isolated points, and a ground plane below all of them
+    rng = np.random.default_rng(0)
+    box = rng.uniform([-2, -0.5, 0], [2, 0.5, 1], (2000, 3))
+    box = box @ np.array([[np.cos(0.5), np.sin(0.5), 0], [-np.sin(0.5), np.cos(0.5), 0], [0, 0, 1]]) + [10, 10, 0]
+    blob = rng.normal([-10, 5, 0.5], 0.1, (200, 3))
+    isolated = np.array([[0, 0, 0.5], [30, 30, 0.5], [-30, 30, 0.5]])
+    ground = np.column_stack([rng.uniform(-40, 40, (5000, 2)), np.full(5000, -0.5)])
+    points = np.hstack([np.vstack([box, blob, isolated, ground]), np.zeros((7203, 1))]).astype(np.float32)
+    data_dict['current_point_cloud_numpy'] = points
+    data_dict['current_point_cloud_ground_mask'] = np.arange(7203) >= 2203
+    data_dict['current_label_list'] = [{'class': 'Car'}]
+    
+    for method in ['grid', 'dbscan']:
+        cfg_dict['proc'] = {'lidar': {'cluster': {'method': method, 'tolerance': 0.3, 'min_points': 10}}}
+        data_dict['current_label_list'] = data_dict['current_label_list'][:1]
+        func(data_dict, cfg_dict)
+        label_list = data_dict['current_label_list']
+        assert len(label_list) == 3 and label_list[0] == {'class': 'Car'}, method
+        assert label_list[1]['lidar_cluster']['point_indices'].tolist() == list(range(2000))
+        assert label_list[2]['lidar_cluster']['point_indices'].tolist() == list(range(2000, 2200))
+        assert np.allclose(label_list[1]['lidar_bbox']['lidar_xyz_center'], [10, 10, 0.5], atol=0.05)
+        assert np.allclose(label_list[1]['lidar_bbox']['lidar_xyz_extent'], [4, 1, 1], atol=0.05)
+        assert np.isclose(np.tan(label_list[1]['lidar_bbox']['lidar_xyz_euler_angles'][2]), np.tan(0.5), atol=0.02)
+
+def test_register_frames():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['register_frames']).register_frames
+
+    # a scene with a ground, two walls, and boxes, seen from a sensor moving 1 m forward, 0.2 m sideways, and turning 0.02 rad per frame
+    rng = np.random.default_rng(0)
+    ground = np.column_stack([rng.uniform(-60, 60, (30000, 2)), np.full(30000, -1.7)])
+    walls = np.vstack([np.column_stack([rng.uniform(-60, 60, 8000), np.full(8000, 12.0), rng.uniform(-1.7, 3, 8000)]), np.column_stack([np.full(8000, -20.0), rng.uniform(-60, 60, 8000), rng.uniform(-1.7, 3, 8000)])])
+    boxes = np.vstack([rng.uniform([-1, -1, -1.7], [1, 1, 0.5], (400, 3)) + [x, y, 0] for x, y in rng.uniform(-40, 40, (30, 2))])
+    scene = np.vstack([ground, walls, boxes])
+    def get_pose(i):
+        pose = np.eye(4)
+        pose[:3, :3] = [[np.cos(0.02 * i), -np.sin(0.02 * i), 0], [np.sin(0.02 * i), np.cos(0.02 * i), 0], [0, 0, 1]]
+        pose[:3, 3] = [1.0 * i, 0.2 * i, 0]
+        return pose
+    
+    for mode in ['scan_to_scan', 'scan_to_map']:
+        cfg_dict['proc'] = {'lidar': {'register_frames': {'mode': mode}}}
+        data_dict.pop('registration', None)
+        for i in range(5):
+            pose = get_pose(i)
+            points = (scene - pose[:3, 3]) @ pose[:3, :3]
+            data_dict['current_point_cloud_numpy'] = np.hstack([points, np.zeros((len(points), 1))]).astype(np.float32)
+            data_dict['current_frame_index'] = i
+            func(data_dict, cfg_dict)
+            assert np.allclose(data_dict['current_pose'], pose, atol=0.1), mode
+        assert len(data_dict['registration_poses']) == 5 and data_dict['registration_map'].shape[1] == 3
+        
+        # registered frames are not registered again
+        data_dict['current_frame_index'] = 2
+        func(data_dict, cfg_dict)
+        assert data_dict['current_pose'] is data_dict['registration_poses'][2]
+
 def test_project_image_pixel_colors():
     # create dummy configuration and data dictionaries
     cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
@@ -109,4 +336,172 @@ def test_project_image_pixel_colors():
     number_of_green_points = np.sum(np.all(data_dict['current_point_cloud_point_colors'] == [0,1,0], axis=1))
     assert number_of_green_points == 81, f'Expected 81 green points, got {number_of_green_points}'
 
+    # images read in bgr order give rgb point colors, a blue bgr image colors the points blue
+    cfg_dict['data'] = {'camera': {'enabled': True, 'color_order': 'bgr'}}
+    data_dict['current_image_numpy'] = np.zeros((100, 100, 3), dtype=np.uint8)
+    data_dict['current_image_numpy'][:, :, 0] = 255
+    func(data_dict, cfg_dict)
+    number_of_blue_points = np.sum(np.all(data_dict['current_point_cloud_point_colors'] == [0,0,1], axis=1))
+    assert number_of_blue_points == 81, f'Expected 81 blue points, got {number_of_blue_points}'
+
+
+
+def test_create_range_image():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['create_range_image']).create_range_image
+    
+    # an organized 16 x 360 scan of a cylinder around the sensor, one pixel without a return
+    height, width = 16, 360
+    elevations = np.radians(np.linspace(14.5, -15.5, height))[:, None].repeat(width, axis=1)
+    azimuths = -np.radians(np.arange(width) - 179.5)[None, :].repeat(height, axis=0)
+    ranges = np.full((height, width), 10.0)
+    points = np.stack([ranges * np.cos(elevations) * np.cos(azimuths), ranges * np.cos(elevations) * np.sin(azimuths), ranges * np.sin(elevations), np.ones_like(ranges)], axis=2).reshape(-1, 4).astype(np.float32)
+    points[5 * width + 7] = 0
+    data_dict['current_point_cloud_numpy'] = points
+    cfg_dict['proc'] = {'lidar': {'create_range_image': {'height': height, 'width': width, 'fov_up': 15.5, 'fov_down': -16.5}}}
+    
+    # projected and kept from the sensor layout, both give the same organized image
+    for organized_shape in [None, (height, width)]:
+        if organized_shape is not None: data_dict['current_point_cloud_organized_shape'] = organized_shape
+        func(data_dict, cfg_dict)
+        index_image, pixels = data_dict['current_range_index_image'], data_dict['current_point_cloud_pixels']
+        expected = np.arange(height * width).reshape(height, width)
+        expected[5, 7] = -1
+        assert np.array_equal(index_image, expected), organized_shape
+        assert np.allclose(data_dict['current_range_image'][index_image >= 0], 10.0, atol=1e-4) and data_dict['current_range_image'][5, 7] == 0
+        assert np.array_equal(pixels[5 * width + 8], [5, 8]) and np.array_equal(pixels[5 * width + 7], [-1, -1])
+    
+    # neighbors wrap around in azimuth
+    get_range_image_neighbors = __import__('algo.utils', fromlist=['get_range_image_neighbors']).get_range_image_neighbors
+    neighbors = get_range_image_neighbors(index_image, np.array([0]), np.array([0]))
+    assert neighbors.tolist() == [[-1, -1, -1, width - 1, 0, 1, 2 * width - 1, width, width + 1]]
+    
+    # cropping after the range image keeps the maps consistent with the cropped point cloud
+    crop = __import__('algo.lidar', fromlist=['crop']).crop
+    cfg_dict['proc']['lidar']['crop'] = {'min_xyz': [0, -20, -20], 'max_xyz': [20, 20, 20]}
+    crop(data_dict, cfg_dict)
+    points, index_image, pixels = data_dict['current_point_cloud_numpy'], data_dict['current_range_index_image'], data_dict['current_point_cloud_pixels']
+    assert len(pixels) == len(points) and np.all(points[:, 0] >= 0)
+    valid = pixels[:, 0] >= 0
+    assert np.array_equal(index_image[pixels[valid, 0], pixels[valid, 1]], np.flatnonzero(valid))
+    assert np.count_nonzero(index_image >= 0) == np.count_nonzero(valid) and np.all(data_dict['current_range_image'][index_image < 0] == 0)
+
+def test_create_bev_grids():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['create_bev_grids']).create_bev_grids
+    
+    # two points in one cell, one point in another cell, one point above the region
+    points = np.array([[0.05, 0.05, -1.0, 0.2], [0.02, 0.08, 0.5, 0.6], [-0.95, 1.95, -3.0, 1.0], [0.05, 0.05, 3.0, 1.0]], dtype=np.float32)
+    data_dict['current_point_cloud_numpy'] = points
+    cfg_dict['proc'] = {'lidar': {'create_bev_grids': {'min_xyz': [-1, -1, -4], 'max_xyz': [1, 2, 2], 'cell_size': 0.1, 'density_normalization': 4.0, 'reuse_buffers': True}}}
+    func(data_dict, cfg_dict)
+    
+    grids = data_dict['current_bev_grids']
+    assert grids.shape == (5, 20, 30) and data_dict['current_bev_grid_names'] == ['occupancy', 'max_height', 'min_height', 'intensity', 'density']
+    assert np.allclose(grids[:, 10, 10], [1, 4.5, 3.0, 0.4, np.log(3) / np.log(4)])
+    assert np.allclose(grids[:, 0, 29], [1, 1.0, 1.0, 1.0, np.log(2) / np.log(4)])
+    assert grids[0].sum() == 2 and grids[1:, grids[0] == 0].max() == 0
+    
+    # the grids are written into the same buffer in the next frame
+    func(data_dict, cfg_dict)
+    assert data_dict['current_bev_grids'] is not grids and np.shares_memory(data_dict['current_bev_grids'], grids)
+
+def test_remove_outliers():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
 
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the functions
+    func = __import__('algo.lidar', fromlist=['remove_outliers']).remove_outliers
+    create_range_image = __import__('algo.lidar', fromlist=['create_range_image']).create_range_image
+    
+    # a dense wall 10 m in front of the sensor and sparse speckle between the wall and the sensor
+    rng = np.random.default_rng(0)
+    wall = np.column_stack([np.full(20000, 10.0), rng.uniform(-5, 5, 20000), rng.uniform(-1, 1, 20000)])
+    speckle = rng.uniform([2, -5, -1], [8, 5, 1], (50, 3))
+    points = np.hstack([np.vstack([wall, speckle]), np.zeros((20050, 1))]).astype(np.float32)
+    
+    for method, backend in [('statistical', 'kdtree'), ('radius', 'kdtree'), ('radius', 'range_image')]:
+        cfg_dict['proc'] = {'lidar': {'remove_outliers': {'method': method, 'backend': backend, 'radius': 0.3, 'min_neighbors': 2, 'keep_mask': True},
+                                      'create_range_image': {'height': 64, 'width': 1024, 'fov_up': 10, 'fov_down': -10}}}
+        data_dict['current_point_cloud_numpy'] = points
+        data_dict['current_point_cloud_point_colors'] = np.ones((20050, 3), dtype=np.float32)
+        if backend == 'range_image': create_range_image(data_dict, cfg_dict)
+        func(data_dict, cfg_dict)
+        outlier_mask = data_dict['current_point_cloud_outlier_mask']
+        assert outlier_mask[20000:].all() and outlier_mask[:20000].mean() < 0.05, (method, backend)
+        assert len(data_dict['current_point_cloud_numpy']) == len(data_dict['current_point_cloud_point_colors']) == (~outlier_mask).sum()
+    
+    # the outliers are only colored if they are not removed
+    cfg_dict['proc']['lidar']['remove_outliers'].update({'backend': 'kdtree', 'remove': False})
+    data_dict['current_point_cloud_numpy'] = points
+    func(data_dict, cfg_dict)
+    assert data_dict['current_point_cloud_numpy'] is points and np.all(data_dict['current_point_cloud_point_colors'][20000:] == [1, 0, 0])
+
+def test_deskew():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['deskew']).deskew
+    
+    # a sensor moving forward at 10 m/s while turning at 1 rad/s scans a static wall at x = 20 over 0.1 s
+    rng = np.random.default_rng(0)
+    scan_period, velocity, yaw_rate = 0.1, 10.0, 1.0
+    times = np.sort(rng.uniform(0, scan_period, 5000))
+    wall = np.column_stack([np.full(5000, 20.0), rng.uniform(-10, 10, 5000), rng.uniform(-1, 1, 5000)])
+    # the world is the sensor frame at the start of the scan, each point is measured in the sensor frame at its time
+    yaws, positions = yaw_rate * times, np.column_stack([velocity * times, np.zeros(5000), np.zeros(5000)])
+    cos, sin = np.cos(yaws), np.sin(yaws)
+    relative = wall - positions
+    measured = np.column_stack([cos * relative[:, 0] + sin * relative[:, 1], -sin * relative[:, 0] + cos * relative[:, 1], relative[:, 2]])
+    points = np.column_stack([measured, np.ones(5000), times]).astype(np.float32)
+    
+    # motion from the end of the scan to its start, as register_frames would estimate it
+    motion = np.eye(4)
+    motion[:2, :2] = [[np.cos(yaw_rate * scan_period), -np.sin(yaw_rate * scan_period)], [np.sin(yaw_rate * scan_period), np.cos(yaw_rate * scan_period)]]
+    motion[0, 3] = velocity * scan_period
+    data_dict['registration'] = {'pose': np.eye(4), 'motion': motion}
+    data_dict['current_point_cloud_numpy'] = points
+    cfg_dict['data'] = {'lidar': {'point_time': True}}
+    cfg_dict['proc'] = {'lidar': {'deskew': {'source': 'registration', 'scan_period': scan_period}}}
+    func(data_dict, cfg_dict)
+    
+    # the deskewed wall is flat in the sensor frame at the end of the scan
+    deskewed = data_dict['current_point_cloud_numpy']
+    expected = (np.column_stack([wall, np.ones(5000)]) @ np.linalg.inv(motion).T)[:, :3]
+    assert deskewed.shape == points.shape and np.abs(deskewed[:, :3] - expected).max() < 1e-3
+    assert np.abs(points[:, :3] - expected).max() > 0.5 # the skew that was removed
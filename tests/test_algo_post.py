@@ -93,5 +93,61 @@ def test_create_pcdet_dataset():
     assert len(point_cloud_files) == 10 # input point clouds = output point clouds
     assert len(label_files) == 10 # each point cloud has one label file containing 3 labels
     
+    # delete the output directories
+    shutil.rmtree(os.path.join(cfg_dict['data']['path']))
+
+def test_create_depth_dataset():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'},
+                'data': {'path': './test_output'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # import the function
+    func = __import__('algo.post', fromlist=['create_depth_dataset']).create_depth_dataset
+
+    # outputs are named after the image file (or the video frame) instead of the frame index
+    data_dict['current_depth_image'] = np.full((4, 6), 2.5, dtype=np.float32)
+    data_dict['current_frame_index'] = 3
+    for image_path, file_basename in [(os.path.join('data', 'camera', '1617181920.png'), '1617181920'), (os.path.join('data', 'camera', 'drive.mp4#7'), 'drive_7')]:
+        data_dict['current_image_path'] = image_path
+        func(data_dict, cfg_dict)
+        assert os.path.exists(os.path.join(cfg_dict['data']['path'], 'output', 'post', 'depth_dataset', 'depth', file_basename + '.png'))
+    
+    # delete the output directories
+    shutil.rmtree(os.path.join(cfg_dict['data']['path']))
+
+def test_create_bev_dataset():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'},
+                'data': {'path': './test_output'},
+                'proc': {'post': {'create_bev_dataset': {'float16': False}}}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # import the function
+    func = __import__('algo.post', fromlist=['create_bev_dataset']).create_bev_dataset
+    output_path = os.path.join(cfg_dict['data']['path'], 'output', 'post', 'bev_dataset')
+
+    # the grids are named after the point cloud file, and the grid names follow the grids
+    data_dict['current_frame_index'] = 0
+    for point_cloud_path, grid_names in [('1617181920.bin', ['occupancy', 'density']), ('1617181921.bin', ['max_height'])]:
+        data_dict['current_point_cloud_path'] = os.path.join('data', 'lidar', point_cloud_path)
+        data_dict['current_bev_grid_names'] = grid_names
+        data_dict['current_bev_grids'] = np.zeros((len(grid_names), 4, 4), dtype=np.float32)
+        func(data_dict, cfg_dict)
+        assert np.load(os.path.join(output_path, 'bev', point_cloud_path.replace('.bin', '.npy'))).shape == (len(grid_names), 4, 4)
+        with open(os.path.join(output_path, 'grid_names.txt')) as f: assert f.read().split() == grid_names
+
     # delete the output directories
     shutil.rmtree(os.path.join(cfg_dict['data']['path']))
\ No newline at end of file
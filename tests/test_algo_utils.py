@@ -39,3 +39,68 @@ def test_gather_skip_gather_combine():
     assert len(data_dict['global_skip']) == 4 # 2 for skip_1 and 2 for skip_2
     combine(data_dict, cfg_dict, 'combined', ['set_1', 'set_2'])
     assert len(data_dict['combined']) == 6 # 3 for set_1 and 3 for set_2
+
+def test_point_cloud_gather():
+    PointCloudGather = __import__('algo.utils', fromlist=['PointCloudGather']).PointCloudGather
+
+    # frames of different sizes, each filled with its frame index
+    frames = [np.full((10 + i, 4), i, dtype=np.float32) for i in range(8)]
+    gather = PointCloudGather()
+    for i in range(4): gather.append(frames[i], i)
+    assert len(gather) == 4 and 2 in gather and 5 not in gather
+    assert gather.points.shape == (46, 4) and gather.offsets.tolist() == [0, 10, 21, 33, 46]
+    assert [frame[0, 0] for frame in gather] == [0, 1, 2, 3] and gather[-1].shape == (13, 4) and len(gather[1:3]) == 2
+
+    # the sliding window keeps the last 3 frames in one contiguous buffer
+    window = PointCloudGather(max_frames=3)
+    for i in range(8): window.append(frames[i], i)
+    assert window.frame_indices == [5, 6, 7] and 4 not in window
+    assert np.array_equal(window.points, np.concatenate(frames[5:]))
+    assert np.array_equal(window.points[window.offsets[1]:window.offsets[2]], frames[6])
+
+    # extending copies the other gather at once
+    gather.extend(window)
+    assert gather.frame_indices == [0, 1, 2, 3, 5, 6, 7] and np.array_equal(gather.points, np.concatenate(frames[:4] + frames[5:]))
+
+def test_project_points():
+    project_points = __import__('algo.utils', fromlist=['project_points']).project_points
+
+    # identity projection, pixels are x / z and y / z
+    Tr_velo_to_pixel = np.eye(3, 4, dtype=np.float32)
+    points = np.array([[1, 2, 1], [10, 10, 2], [5, 5, -1], [-1, 5, 1], [19.9, 9.9, 1], [20, 5, 1]], dtype=np.float32)
+    pixels, depths, valid = project_points(points, Tr_velo_to_pixel, (10, 20, 3))
+    assert valid.tolist() == [True, True, False, False, True, False]
+    assert pixels[valid].tolist() == [[1, 2], [5, 5], [19, 9]]
+    assert np.allclose(depths, [1, 2, -1, 1, 1, 1])
+
+    # the translation column is applied and preallocated outputs are filled in place
+    Tr_velo_to_pixel[:, 3] = [1, 1, 0]
+    out_pixels, out_depths, out_valid = np.empty((6, 2), dtype=np.int32), np.empty(6, dtype=np.float32), np.empty(6, dtype=bool)
+    pixels, _, _ = project_points(points, Tr_velo_to_pixel, (10, 20, 3), out_pixels, out_depths, out_valid)
+    assert pixels is out_pixels and out_pixels[0].tolist() == [2, 3]
+
+def test_spatial_index():
+    get_spatial_index = __import__('algo.utils', fromlist=['get_spatial_index']).get_spatial_index
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 10, (2000, 4)).astype(np.float32)
+    data_dict = {'current_point_cloud_numpy': points, 'current_frame_index': 0}
+    index = get_spatial_index(data_dict)
+
+    # neighbors match a brute force search
+    distances = np.linalg.norm(points[:5, None, :3].astype(np.float64) - points[None, :, :3], axis=2)
+    knn_distances, knn_indices = index.query_knn(points[:5, :3], 4)
+    assert np.allclose(knn_distances, np.sort(distances, axis=1)[:, :4]) and np.array_equal(knn_indices[:, 0], np.arange(5))
+    assert index.count_radius(points[:5, :3], 1.0).tolist() == (distances <= 1.0).sum(axis=1).tolist()
+    assert [sorted(indices.tolist()) for indices in index.query_radius(points[:5, :3], 1.0)] == [np.flatnonzero(row <= 1.0).tolist() for row in distances]
+
+    # the voxel hash groups the points by voxel
+    voxel_keys, voxel_starts, order, point_voxel_ids = index.get_voxel_hash(2.0)
+    voxel_points = order[voxel_starts[point_voxel_ids[0]]:voxel_starts[point_voxel_ids[0] + 1]]
+    assert sorted(voxel_points.tolist()) == np.flatnonzero(np.all(np.floor(points[:, :3] / 2.0) == np.floor(points[0, :3] / 2.0), axis=1)).tolist()
+    assert np.array_equal(index.query_voxels(points[:, :3], 2.0), point_voxel_ids) and index.query_voxels([[50, 50, 50]], 2.0).tolist() == [-1]
+
+    # the index is shared until the point cloud is replaced
+    assert get_spatial_index(data_dict) is index
+    data_dict['current_point_cloud_numpy'] = points[:100]
+    assert get_spatial_index(data_dict) is not index and len(get_spatial_index(data_dict)) == 100
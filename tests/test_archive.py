@@ -0,0 +1,53 @@
+import os, shutil, zipfile, tarfile
+
+import numpy as np
+
+def test_archive_file_io():
+    from archive import file_io as archive_io
+
+    # create dummy dataset
+    src_dir = os.path.join('test_output', 'src')
+    os.makedirs(os.path.join(src_dir, 'lidar'), exist_ok=True)
+    os.makedirs(os.path.join(src_dir, 'label'), exist_ok=True)
+    point_clouds = [np.random.rand(100, 4).astype(np.float32) for _ in range(3)]
+    for i, point_cloud in enumerate(point_clouds):
+        point_cloud.tofile(os.path.join(src_dir, 'lidar', str(i).zfill(6) + '.bin'))
+        with open(os.path.join(src_dir, 'label', str(i).zfill(6) + '.txt'), 'w') as f: f.write(f'label {i}\n')
+
+    # pack it as zip (stored point clouds, deflated labels) and as tar
+    zip_path = os.path.join('test_output', 'dataset.zip')
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for i in range(3):
+            zf.write(os.path.join(src_dir, 'lidar', str(i).zfill(6) + '.bin'), f'lidar/{str(i).zfill(6)}.bin', compress_type=zipfile.ZIP_STORED)
+            zf.write(os.path.join(src_dir, 'label', str(i).zfill(6) + '.txt'), f'label/{str(i).zfill(6)}.txt', compress_type=zipfile.ZIP_DEFLATED)
+    tar_path = os.path.join('test_output', 'dataset.tar')
+    with tarfile.open(tar_path, 'w') as tf: tf.add(src_dir, arcname='.')
+
+    for archive_path in [zip_path, tar_path]:
+        # glob only lists the members of the requested directory
+        files = archive_io.glob(os.path.join(archive_path, 'lidar', '*.bin'))
+        assert len(files) == 3, f'Expected 3 files, got {len(files)}'
+        assert archive_io.exists(os.path.join(archive_path, 'label', '000001.txt'))
+        assert not archive_io.exists(os.path.join(archive_path, 'label', '000003.txt'))
+        # members are read without extraction
+        for i, point_cloud in enumerate(point_clouds):
+            buffer = archive_io.read_buffer(os.path.join(archive_path, 'lidar', str(i).zfill(6) + '.bin'))
+            assert np.array_equal(np.frombuffer(buffer, dtype=np.float32).reshape(-1, 4), point_cloud)
+            with archive_io.open(os.path.join(archive_path, 'label', str(i).zfill(6) + '.txt')) as f: assert f.read() == f'label {i}\n'
+        # the index is persisted next to the archive
+        assert os.path.exists(archive_path + '.index.json')
+        # point clouds read from the archive are writable copies
+        from pcd.file_io import FileIO
+        pcd_io = FileIO({'data': {'path': archive_path, 'lidar_subdir': 'lidar', 'size': 3, 'lidar': {'pcd_type': '.bin'}}, 'threads': {'io_sleep': 0.0}})
+        _, point_cloud = pcd_io[0]
+        pcd_io.close()
+        assert point_cloud.flags.writeable and np.array_equal(point_cloud, point_clouds[0])
+
+    # regular paths fall through to the file system
+    assert len(archive_io.glob(os.path.join(src_dir, 'lidar', '*.bin'))) == 3
+    assert archive_io.exists(os.path.join(src_dir, 'label', '000000.txt'))
+
+    # release the memory-mapped archives and delete the output directories
+    del buffer
+    archive_io.close_indices()
+    shutil.rmtree('test_output')
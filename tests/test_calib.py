@@ -11,4 +11,97 @@ def test_handler_validity():
             # check if the handler has a calib_file_extension attribute
             assert handler_calib_file_extension[0] == '.', f"calib_file_extension is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler), f"{handler} is not callable"
\ No newline at end of file
+            assert callable(handler), f"{handler} is not callable"
+
+def test_add_derived_matrices():
+    import numpy as np
+    from calib.utils import add_derived_matrices
+
+    # create dummy calibration data
+    P2 = np.array([[700, 0, 600, 45], [0, 700, 180, -0.3], [0, 0, 1, 0.005]], dtype=np.float32)
+    R0_rect = np.eye(4, dtype=np.float32)
+    R0_rect[:3, :3] = [[1, 0.01, 0], [-0.01, 1, 0], [0, 0, 1]]
+    Tr_velo_to_cam = np.array([[0, -1, 0, 0.1], [0, 0, -1, -0.08], [1, 0, 0, -0.27], [0, 0, 0, 1]], dtype=np.float32)
+    calib = {'P2': P2, 'R0_rect': R0_rect, 'Tr_velo_to_cam': Tr_velo_to_cam}
+
+    # the derived matrices are added to a copy, the given dictionary may be shared among the frames
+    derived = add_derived_matrices(calib)
+    assert derived is not calib and 'Tr_velo_to_pixel' not in calib
+    calib = derived
+    assert np.allclose(calib['Tr_velo_to_pixel'], P2 @ R0_rect @ Tr_velo_to_cam, atol=1e-4)
+    assert np.allclose(calib['Tr_cam_to_velo'] @ Tr_velo_to_cam, np.eye(4), atol=1e-6)
+    assert calib['Tr_velo_to_pixel_f32'].dtype == np.float32 and calib['Tr_cam_to_velo_f32'].dtype == np.float32
+
+    # the derived matrices are computed only once
+    assert add_derived_matrices(calib) is calib
+
+    # R0_rect is optional
+    calib = add_derived_matrices({'P2': P2, 'Tr_velo_to_cam': Tr_velo_to_cam})
+    assert np.allclose(calib['Tr_velo_to_pixel'], P2 @ Tr_velo_to_cam, atol=1e-4)
+
+def test_preview_scaled_calib():
+    import shutil
+    import numpy as np
+    from calib.file_io import FileIO
+
+    # a kitti calibration file
+    calib_dir = os.path.join('test_output', 'calib')
+    os.makedirs(calib_dir, exist_ok=True)
+    with open(os.path.join(calib_dir, '000000.txt'), 'w') as f:
+        f.write('P2: 700 0 600 45 0 700 180 -0.3 0 0 1 0.005\n')
+        f.write('R0_rect: 1 0 0 0 1 0 0 0 1\n')
+        f.write('Tr_velo_to_cam: 0 -1 0 0.1 0 0 -1 -0.08 1 0 0 -0.27\n')
+
+    def read_calib(camera_cfg):
+        cfg = {'data': {'path': 'test_output', 'calib_subdir': 'calib', 'size': 1, 'camera': camera_cfg, 'calib': {'clb_type': 'kitti'}}, 'threads': {'io_sleep': 0.0}}
+        clb_io = FileIO(cfg)
+        try: return clb_io[0][1]
+        finally: clb_io.close()
+
+    try:
+        full = read_calib({'enabled': True, 'preview_scale': 1})
+        reduced = read_calib({'enabled': True, 'preview_scale': 4})
+        # P2 and the projection follow the images decoded at the preview scale
+        assert np.allclose(reduced['P2'][:2], full['P2'][:2] / 4) and np.allclose(reduced['P2'][2], full['P2'][2])
+        assert np.allclose(reduced['Tr_velo_to_pixel'][:2], full['Tr_velo_to_pixel'][:2] / 4, atol=1e-6)
+        # the preview scale is ignored if the images are not read
+        assert np.allclose(read_calib({'enabled': False, 'preview_scale': 4})['P2'], full['P2'])
+    finally:
+        shutil.rmtree('test_output')
+
+def test_interned_calib():
+    import time
+    import shutil
+    from calib.file_io import FileIO
+    from archive import file_io as archive_io
+
+    # two identical kitti calibration files and a different one
+    calib_dir = os.path.join('test_output', 'calib')
+    os.makedirs(calib_dir, exist_ok=True)
+    for file_name, P2 in [('000000.txt', '700 0 600 45'), ('000001.txt', '700 0 600 45'), ('000002.txt', '710 0 600 45')]:
+        with open(os.path.join(calib_dir, file_name), 'w') as f:
+            f.write(f'P2: {P2} 0 700 180 -0.3 0 0 1 0.005\n')
+            f.write('R0_rect: 1 0 0 0 1 0 0 0 1\n')
+            f.write('Tr_velo_to_cam: 0 -1 0 0.1 0 0 -1 -0.08 1 0 0 -0.27\n')
+
+    # count the file reads
+    read_paths = []
+    read_buffer = archive_io.read_buffer
+    def counting_read_buffer(path):
+        read_paths.append(path)
+        return read_buffer(path)
+    archive_io.read_buffer = counting_read_buffer
+
+    cfg = {'data': {'path': 'test_output', 'calib_subdir': 'calib', 'size': 3, 'camera': {'enabled': False}, 'calib': {'clb_type': 'kitti'}}, 'threads': {'io_sleep': 0.0}}
+    try:
+        clb_io = FileIO(cfg)
+        while len(clb_io.data) < len(clb_io): time.sleep(0.01)
+        clb_io.close()
+        calibs = [clb_io[idx][1] for idx in range(3)]
+        # each file is read once, and identical files share one dictionary holding the derived matrices
+        assert sorted(read_paths) == sorted(set(read_paths)) and len(read_paths) == 3
+        assert calibs[0] is calibs[1] and calibs[0] is not calibs[2]
+        assert all('Tr_velo_to_pixel_f32' in calib for calib in calibs)
+    finally:
+        archive_io.read_buffer = read_buffer
+        shutil.rmtree('test_output')
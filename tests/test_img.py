@@ -10,4 +10,66 @@ def test_handler_validity():
             assert isinstance(handler, type), f"{handler} is not a class"
             # handler must have a close method
             assert hasattr(handler, 'close'), f"{handler} does not have a close method"
-            
\ No newline at end of file
+            
+
+def test_video_file_io():
+    import shutil
+    import cv2
+    import numpy as np
+    from img.file_io import FileIO
+    
+    # a 50 frame video, every frame filled with a distinct gray level
+    video_dir = os.path.join('test_output', 'video', 'camera')
+    os.makedirs(video_dir, exist_ok=True)
+    writer = cv2.VideoWriter(os.path.join(video_dir, 'video.avi'), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for idx in range(50): writer.write(np.full((48, 64, 3), idx * 5, dtype=np.uint8))
+    writer.release()
+    
+    cfg = {'data': {'path': os.path.join('test_output', 'video'), 'camera_subdir': 'camera', 'size': 50, 'camera': {'img_type': '.avi'}}, 'threads': {'io_sleep': 0.0, 'io_workers': 1}}
+    img_io = FileIO(cfg)
+    try:
+        assert len(img_io) == 50
+        # a frame far ahead of the sequential decoder is seeked to by its index
+        file_abs_path, img = img_io[40]
+        assert file_abs_path.endswith('video.avi#40')
+        assert img.shape == (48, 64, 3)
+        assert abs(float(img.mean()) - 200) < 5
+    finally:
+        img_io.close()
+        shutil.rmtree('test_output')
+
+
+def test_image_file_io():
+    import time
+    import shutil
+    import cv2
+    import numpy as np
+    from img.file_io import FileIO
+    
+    # images with a distinct blue level each, red and green are fixed so that the channel order can be checked
+    image_dir = os.path.join('test_output', 'images', 'camera')
+    os.makedirs(image_dir, exist_ok=True)
+    for idx in range(7): cv2.imwrite(os.path.join(image_dir, str(idx).zfill(6) + '.png'), np.dstack([np.full((48, 64), idx * 30, dtype=np.uint8), np.full((48, 64), 100, dtype=np.uint8), np.full((48, 64), 250, dtype=np.uint8)]))
+    
+    def read_all(preview_scale, color_order, io_workers):
+        cfg = {'data': {'path': os.path.join('test_output', 'images'), 'camera_subdir': 'camera', 'size': 7, 'camera': {'img_type': '.png', 'preview_scale': preview_scale, 'color_order': color_order}}, 'threads': {'io_sleep': 0.0, 'io_workers': io_workers}}
+        img_io = FileIO(cfg)
+        try:
+            # wait for the asynchronous reader, so that the frames come from its batches
+            while len(img_io.data) < len(img_io): time.sleep(0.01)
+            return [img_io[idx] for idx in range(len(img_io))]
+        finally: img_io.close()
+    
+    try:
+        # batches decoded in parallel are appended in frame order
+        frames = read_all(1, 'rgb', 3)
+        assert [os.path.basename(file_abs_path) for file_abs_path, _ in frames] == [str(idx).zfill(6) + '.png' for idx in range(7)]
+        assert all(img.shape == (48, 64, 3) and img[0, 0, 2] == idx * 30 and img[0, 0, 0] == 250 for idx, (_, img) in enumerate(frames))
+        # bgr skips the color conversion
+        frames = read_all(1, 'bgr', 1)
+        assert all(img[0, 0, 0] == idx * 30 and img[0, 0, 2] == 250 for idx, (_, img) in enumerate(frames))
+        # reduced decoding
+        frames = read_all(2, 'rgb', 2)
+        assert all(img.shape == (24, 32, 3) and img[0, 0, 2] == idx * 30 for idx, (_, img) in enumerate(frames))
+    finally:
+        shutil.rmtree('test_output')
@@ -15,4 +15,158 @@ def test_handler_validity():
             # label_file_extension must start with a period
             assert handler.label_file_extension[0] == '.', f"{handler.label_file_extension} is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler.Handler), f"{handler.Handler} is not callable"
\ No newline at end of file
+            assert callable(handler.Handler), f"{handler.Handler} is not callable"
+def test_label_list():
+    import numpy as np
+    import open3d as o3d
+    from lbl.label_list import LabelList
+
+    # create dummy columns
+    centers = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype=np.float32)
+    extents = np.array([[1, 2, 3], [2, 2, 2], [3, 2, 1]], dtype=np.float32)
+    euler_angles = np.array([[0, 0, 0.5], [0.1, 0.2, 0.3], [0, 0, -1]], dtype=np.float32)
+    colors = np.array([[0, 1, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float32)
+    label_list = LabelList.from_columns(centers, extents, euler_angles, colors, ['Car', 'Pedestrian', 'Car'], camera_colors=colors * 255)
+
+    # the dictionaries are views into the columns
+    assert len(label_list) == 3
+    assert np.shares_memory(label_list[1]['lidar_bbox']['lidar_xyz_center'], label_list.centers)
+    assert label_list[2]['camera_bbox']['rgb_bbox_color'].tolist() == [0, 255, 0]
+    assert label_list.get_class_names().tolist() == ['Car', 'Pedestrian', 'Car']
+    assert np.allclose(label_list.yaws, [0.5, 0.3, -1])
+
+    # corners match the ones of open3d's oriented bounding box
+    corners = label_list.get_corners()
+    for i in range(3):
+        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(euler_angles[i].astype(np.float64))
+        bbox = o3d.geometry.OrientedBoundingBox(centers[i].astype(np.float64), R, extents[i].astype(np.float64))
+        assert np.allclose(np.sort(corners[i], axis=0), np.sort(np.asarray(bbox.get_box_points()), axis=0), atol=1e-5)
+
+    # selection slices the columns
+    selected = label_list.select(label_list.class_ids == label_list.class_names.index('Car'))
+    assert len(selected) == 2 and np.allclose(selected.centers, centers[[0, 2]])
+
+    # columns are rebuilt from the dictionaries after the list is modified, missing fields are zeros
+    selected.append({'class': 'Cyclist', 'lidar_bbox': {'lidar_xyz_center': [0, 0, 1]}})
+    selected.append({'class': 'DontCare'})
+    assert selected.centers.shape == (4, 3) and np.allclose(selected.centers[2], [0, 0, 1])
+    assert selected.has_lidar_bbox.tolist() == [True, True, True, False]
+
+    # plain lists are converted, label lists are passed through
+    assert isinstance(LabelList.from_labels([]), LabelList)
+    assert LabelList.from_labels(label_list) is label_list
+
+def test_bulk_label_parsers():
+    import shutil
+    import numpy as np
+    from lbl import handler_kitti, handler_openpcdet
+
+    os.makedirs('test_output', exist_ok=True)
+
+    # kitti labels, with an empty line that must be skipped
+    kitti_path = os.path.join('test_output', 'kitti.txt')
+    with open(kitti_path, 'w') as f:
+        f.write('Car 0.00 0 -1.58 587.01 173.33 614.12 200.12 1.65 1.67 3.64 -0.65 1.71 46.70 -1.59\n\n')
+        f.write('Pedestrian 0.50 1 0.21 0 0 10 10 1.80 0.60 0.80 2.00 1.50 10.00 0.50\n')
+    Tr_velo_to_cam = np.array([[0, -1, 0, 0.1], [0, 0, -1, -0.1], [1, 0, 0, -0.3], [0, 0, 0, 1]], dtype=np.float64)
+    labels = handler_kitti.Handler(kitti_path, {'P2': np.eye(3, 4), 'Tr_velo_to_cam': Tr_velo_to_cam})
+    assert len(labels) == 2
+    assert labels[1]['class'] == 'Pedestrian' and labels[1]['occlusion'] == 1 and labels[1]['image_0_ry'] == 0.5
+    # centers are moved to the lidar frame and lifted by half the height
+    expected_center = (np.linalg.inv(Tr_velo_to_cam) @ [2.0, 1.5, 10.0, 1])[:3] + [0, 0, 0.9]
+    assert np.allclose(labels.centers[1], expected_center, atol=1e-5)
+    # the transform is done in float64, only the result is rounded to float32
+    c, s = np.cos(0.3), np.sin(0.3)
+    Tr_velo_to_cam = np.array([[s, -c, 0, 0.0234], [0, 0, -1, -0.0731], [c, s, 0, -0.2718], [0, 0, 0, 1]], dtype=np.float64)
+    labels = handler_kitti.Handler(kitti_path, {'P2': np.eye(3, 4), 'Tr_velo_to_cam': Tr_velo_to_cam})
+    expected_center = ((np.linalg.inv(Tr_velo_to_cam) @ [-0.65, 1.71, 46.70, 1])[:3] + [0, 0, 1.65 / 2]).astype(np.float32)
+    assert labels.centers.dtype == np.float32 and np.array_equal(labels.centers[0], expected_center)
+    assert np.allclose(labels.extents[1], [0.6, 0.8, 1.8]) and np.isclose(labels.yaws[1], -0.5)
+
+    # openpcdet labels, with a trailing score column that must be ignored
+    openpcdet_path = os.path.join('test_output', 'openpcdet.txt')
+    with open(openpcdet_path, 'w') as f: f.write('1 2 3 4 5 6 0.5 Car\n7 8 9 1 1 1 -0.5 Cyclist 0.9\n')
+    labels = handler_openpcdet.Handler(openpcdet_path, None)
+    assert labels.get_class_names().tolist() == ['Car', 'Cyclist']
+    assert np.allclose(labels.centers, [[1, 2, 3], [7, 8, 9]]) and np.allclose(labels.yaws, [0.5, -0.5])
+    assert labels[1]['heading_angle'] == -0.5
+
+    # lines of different widths whose token count is still a multiple of the line count are not reshaped as a whole
+    from lbl.utils import read_text_table
+    ragged_path = os.path.join('test_output', 'ragged.txt')
+    with open(ragged_path, 'w') as f: f.write('a b c\nd e f g\nh i\n')
+    try: read_text_table(ragged_path, 3); assert False, 'a short line must raise'
+    except ValueError: pass
+    with open(ragged_path, 'w') as f: f.write('a b c\nd e f g\nh i j\n')
+    assert read_text_table(ragged_path, 3).tolist() == [['a', 'b', 'c'], ['d', 'e', 'f'], ['h', 'i', 'j']]
+
+    shutil.rmtree('test_output')
+
+def test_label_index():
+    import time
+    import shutil
+    import numpy as np
+    from lbl.file_io import FileIO as LBL_File_IO
+    from pcd.file_io import FileIO as PCD_File_IO
+    from lbl.label_index import LabelIndex
+
+    # create a dummy dataset with 3 frames of openpcdet labels and point clouds
+    cfg = {'data': {'path': os.path.join('test_output', 'dataset'), 'lidar_subdir': 'lidar', 'label_subdir': 'label', 'size': 3, 'lidar': {'pcd_type': '.bin'}, 'label': {'lbl_type': 'openpcdet'}}, 'threads': {'io_sleep': 0.0, 'io_workers': 2}}
+    os.makedirs(os.path.join(cfg['data']['path'], 'lidar'), exist_ok=True)
+    os.makedirs(os.path.join(cfg['data']['path'], 'label'), exist_ok=True)
+    frames = ['5 0 0 4 2 2 0 Car\n30 30 0 1 1 2 0 Cyclist\n', '10 0 0 2 1 2 0 Cyclist\n', '-50 40 0 4 2 2 0.5 Car\n']
+    for i, frame in enumerate(frames):
+        with open(os.path.join(cfg['data']['path'], 'label', f'{str(i).zfill(6)}.txt'), 'w') as f: f.write(frame)
+        # 10 points inside the first box of each frame
+        center = np.array(frame.split()[0:3], dtype=np.float32)
+        points = np.hstack([center + np.random.uniform(-0.4, 0.4, (10, 3)), np.zeros((10, 1))]).astype(np.float32)
+        points.tofile(os.path.join(cfg['data']['path'], 'lidar', f'{str(i).zfill(6)}.bin'))
+
+    lbl_io = LBL_File_IO(cfg, None)
+    pcd_io = PCD_File_IO(cfg)
+    index = LabelIndex.get_or_build(cfg, lbl_io, pcd_io)
+    assert len(index) == 4 and os.path.exists(LabelIndex.get_index_path(cfg))
+
+    # class, radius, extent, and point count queries
+    assert index.query(class_name='Cyclist').tolist() == [0, 1]
+    assert index.query(class_name='Cyclist', radius=20).tolist() == [1]
+    assert index.query(radius=20).tolist() == [0, 1]
+    assert index.query(center=(-50, 40), radius=1).tolist() == [2]
+    assert index.query(min_extent=[3, 0, 0]).tolist() == [0, 2]
+    assert index.query(min_points=10).tolist() == [0, 1, 2]
+    assert index.query(class_name='Cyclist', min_points=1).tolist() == [1]
+
+    # the persisted index is loaded back
+    loaded = LabelIndex.get_or_build(cfg, lbl_io)
+    assert loaded.class_names == index.class_names and np.array_equal(loaded.centers, index.centers)
+
+    # an edited label file, with the same frame names, invalidates the persisted index
+    with open(os.path.join(cfg['data']['path'], 'label', '000001.txt'), 'w') as f: f.write('10 0 0 2 1 2 0 Car\n')
+    rebuilt = LabelIndex.get_or_build(cfg, lbl_io)
+    assert rebuilt.query(class_name='Cyclist').tolist() == [0] and rebuilt.query(class_name='Car').tolist() == [0, 1, 2]
+
+    lbl_io.close()
+    pcd_io.close()
+    time.sleep(0.1)
+    shutil.rmtree('test_output')
+
+def test_points_in_bboxes():
+    import numpy as np
+    from lbl.label_list import get_points_in_bboxes
+
+    # two overlapping axis-aligned boxes and a box rotated by 45 degrees around z
+    centers = np.array([[0, 0, 0], [1, 0, 0], [10, 10, 0]], dtype=np.float32)
+    extents = np.array([[2, 2, 2], [2, 2, 2], [4, 0.5, 2]], dtype=np.float32)
+    euler_angles = np.array([[0, 0, 0], [0, 0, 0], [0, 0, np.pi / 4]], dtype=np.float32)
+    points = np.array([[0.5, 0, 0, 0], [-0.5, 0, 0, 0], [1.5, 0, 0, 0], [11, 11, 0, 0], [11, 10, 0, 0], [0, 0, 5, 0], [50, 50, 0, 0]], dtype=np.float32)
+
+    point_bbox_ids, bbox_point_indices = get_points_in_bboxes(points, centers, extents, euler_angles)
+    # the first box wins for the point inside both boxes, points outside all the boxes are -1
+    assert point_bbox_ids.tolist() == [0, 0, 1, 2, -1, -1, -1]
+    assert [indices.tolist() for indices in bbox_point_indices] == [[0, 1], [0, 2], [3]]
+
+    # no boxes or no points
+    point_bbox_ids, bbox_point_indices = get_points_in_bboxes(points, np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3)))
+    assert point_bbox_ids.tolist() == [-1] * len(points) and bbox_point_indices == []
+    point_bbox_ids, bbox_point_indices = get_points_in_bboxes(points[:0], centers, extents, euler_angles)
+    assert len(point_bbox_ids) == 0 and all(len(indices) == 0 for indices in bbox_point_indices)
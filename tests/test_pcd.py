@@ -9,4 +9,45 @@ def test_handler_validity():
             # handler must be a class not a function
             assert isinstance(handler, type), f"{handler} is not a class"
             # handler must have a close method
-            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
\ No newline at end of file
+            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
+
+
+def test_multi_io():
+    import shutil
+    import numpy as np
+    from pcd.multi_io import MultiIO
+
+    # two lidars, the second one 1 m to the left of the first, with frames 5 ms and 30 ms after the first and one missing frame
+    root = os.path.join('test_output', 'multi_lidar')
+    point_clouds = {'lidar_front': [np.random.rand(100 + i, 4).astype(np.float32) for i in range(3)], 'lidar_left': [np.random.rand(50, 4).astype(np.float32) for _ in range(2)]}
+    timestamps = {'lidar_front': [0.0, 0.1, 0.2], 'lidar_left': [0.005, 0.23]}
+    for subdir in point_clouds:
+        os.makedirs(os.path.join(root, subdir), exist_ok=True)
+        for i, point_cloud in enumerate(point_clouds[subdir]): point_cloud.tofile(os.path.join(root, subdir, str(i).zfill(6) + '.bin'))
+        with open(os.path.join(root, subdir, 'timestamps.txt'), 'w') as f: f.write('\n'.join(str(timestamp) for timestamp in timestamps[subdir]) + '\n')
+    T_left = np.eye(4)
+    T_left[1, 3] = 1.0
+    cfg = {'data': {'path': root, 'lidar_subdir': 'lidar', 'size': 3, 'lidar': {'enabled': True, 'pcd_type': '.bin', 'max_time_offset': 0.05,
+                                                                          'sources': [{'subdir': 'lidar_front'}, {'subdir': 'lidar_left', 'T_sensor_to_reference': T_left.tolist()}]}},
+           'threads': {'io_sleep': 0.0}}
+    multi_io = MultiIO(cfg)
+    assert len(multi_io) == 3 and multi_io.frame_indices.tolist() == [[0, 0], [1, -1], [2, 1]]
+
+    # the fused point cloud has the transformed points of both lidars and a sensor_id column
+    _, fused = multi_io[0]
+    assert fused.shape == (150, 5) and np.array_equal(fused[:, 4], [0] * 100 + [1] * 50)
+    assert np.allclose(fused[:100, :4], point_clouds['lidar_front'][0]) and np.allclose(fused[100:, :4], point_clouds['lidar_left'][0] + [0, 1, 0, 0])
+    _, fused = multi_io[1]
+    assert fused.shape == (101, 5) and not fused[:, 4].any()
+    _, fused = multi_io[2]
+    assert fused.shape == (152, 5) and np.allclose(fused[102:, :4], point_clouds['lidar_left'][1] + [0, 1, 0, 0])
+
+    multi_io.close()
+
+    # without timestamps.txt and with basenames that are not numbers, the second lidar is aligned by index
+    os.remove(os.path.join(root, 'lidar_left', 'timestamps.txt'))
+    for i in range(2): os.rename(os.path.join(root, 'lidar_left', str(i).zfill(6) + '.bin'), os.path.join(root, 'lidar_left', 'left_' + str(i).zfill(6) + '.bin'))
+    multi_io = MultiIO(cfg)
+    assert multi_io.frame_indices.tolist() == [[0, 0], [1, 1], [2, 2]]
+    multi_io.close()
+    shutil.rmtree('test_output')
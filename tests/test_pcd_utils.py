@@ -63,4 +63,22 @@ def test_get_fixed_sized_point_cloud():
     number_of_points = 2
     fixed_sized_point_cloud = get_fixed_sized_point_cloud(point_cloud, number_of_points)
     assert fixed_sized_point_cloud.shape == (number_of_points, 3)
-    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
\ No newline at end of file
+    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
+def test_read_pcd_fields():
+    from pcd.utils import read_pcd_fields, get_point_times
+    header = 'VERSION 0.7\nFIELDS x y z intensity t\nSIZE 4 4 4 4 4\nTYPE F F F F U\nCOUNT 1 1 1 1 1\nWIDTH 3\nHEIGHT 1\nVIEWPOINT 0 0 0 1 0 0 0\nPOINTS 3\nDATA {}\n'
+    points = np.array([[1, 2, 3, 10], [4, 5, 6, 20], [7, 8, 9, 30]], dtype=np.float32)
+    times = np.array([1000000, 51000000, 101000000], dtype=np.uint32)
+
+    # binary
+    data = np.zeros(3, dtype=[('xyzi', '<f4', (4,)), ('t', '<u4')])
+    data['xyzi'], data['t'] = points, times
+    fields = read_pcd_fields(header.format('binary').encode('ascii') + data.tobytes())
+    assert np.allclose(np.column_stack([fields['x'], fields['y'], fields['z'], fields['intensity']]), points)
+    assert np.allclose(get_point_times(fields), [0.0, 0.05, 0.1])
+
+    # ascii
+    lines = ''.join(' '.join(str(value) for value in point) + f' {time}\n' for point, time in zip(points.tolist(), times.tolist()))
+    fields = read_pcd_fields((header.format('ascii') + lines).encode('ascii'))
+    assert np.allclose(fields['y'], [2, 5, 8]) and np.allclose(get_point_times(fields), [0.0, 0.05, 0.1])
+    assert read_pcd_fields(header.format('binary_compressed').encode('ascii')) is None